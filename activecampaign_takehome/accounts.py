@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+
+"""
+Several accounts at once.
+
+Accounts are named profiles in an INI file, one section per account. Keys
+in `[DEFAULT]` apply to every section::
+
+    [DEFAULT]
+    domain = api-us1.com
+    rate = 5
+
+    [acme-eu]
+    account = acme-eu
+    api_key = ...
+
+    [acme-us]
+    account = acme-us
+    api_key = ...
+    max_connections = 20
+
+Keys: `api_key`, `account`, `domain`, `api_output` (json), `base_url`,
+`rate` (calls per second, unlimited if missing), `burst`,
+`max_connections` (10) and `timeout` (seconds).
+
+`Accounts` reads the file once and builds one `Client` per account, each
+with its own connection pool (`Urllib3Transport`) and rate limit
+(`RateLimitedTransport`). `Accounts.fan_out` runs an operation against all
+of them concurrently; `merge` tags the records it returns with the account.
+
+Example::
+
+    with Accounts.from_file() as accounts:
+        results = accounts.fan_out(
+            lambda client: client.lists.get(normalize=True))
+        for record in merge(results):
+            print(record['account'], record['name'])
+"""
+
+import configparser
+import os
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from activecampaign_takehome.activecampaign_takehome import (
+    Client, ConfigurationError, FrozenConfig)
+from activecampaign_takehome.responses import (ApiResultError, Normalizer,
+                                               checked, iter_pages)
+from activecampaign_takehome.transport import (RateLimitedTransport,
+                                               Urllib3Transport)
+
+
+PROFILES_ENV = 'AC_PROFILES'
+DEFAULT_PROFILES_PATH = os.path.join('~', '.activecampaign', 'profiles.ini')
+
+Profile = namedtuple('Profile', ['name', 'config', 'rate', 'burst',
+                                 'max_connections', 'timeout'])
+
+# Outcome of an operation on one account: its result or the raised exception.
+AccountResult = namedtuple('AccountResult', ['account', 'ok', 'result',
+                                             'error', 'elapsed'])
+
+
+def profiles_path(path=None):
+    """
+    `path`, else `$AC_PROFILES`, else `~/.activecampaign/profiles.ini`.
+    """
+    return os.path.expanduser(path or os.getenv(PROFILES_ENV)
+                              or DEFAULT_PROFILES_PATH)
+
+
+def load_profiles(path=None):
+    """
+    Read the profiles file (see `profiles_path`) into an OrderedDict of name ->
+    `Profile`.
+    """
+    path = profiles_path(path)
+    if not os.path.exists(path):
+        raise ConfigurationError("Missing profiles file {}".format(path))
+    parser = configparser.ConfigParser(interpolation=None)
+    parser.read(path)
+    profiles = OrderedDict()
+    for name in parser.sections():
+        section = parser[name]
+        config = FrozenConfig(
+            API_KEY=section.get('api_key'),
+            ACCOUNT=section.get('account'),
+            DOMAIN=section.get('domain'),
+            API_OUTPUT=section.get('api_output', 'json'),
+            BASE_URL=section.get('base_url'),
+        )
+        profiles[name] = Profile(
+            name=name,
+            config=config,
+            rate=section.getfloat('rate'),
+            burst=section.getint('burst'),
+            max_connections=section.getint('max_connections', 10),
+            timeout=section.getfloat('timeout'),
+        )
+    if not profiles:
+        raise ConfigurationError("No profiles in {}".format(path))
+    return profiles
+
+
+def make_client(profile):
+    """
+    A `Client` for `profile` with its own connection pool and rate limit.
+    """
+    transport = Urllib3Transport(maxsize=profile.max_connections)
+    if profile.rate:
+        transport = RateLimitedTransport(transport, profile.rate,
+                                         burst=profile.burst)
+    return Client(profile.config, transport=transport, timeout=profile.timeout)
+
+
+class Accounts:
+    """
+    One `Client` per profile, built once and shared by every fan-out.
+
+    Parameters
+    ----------
+    profiles:
+        OrderedDict of name -> `Profile`, see `load_profiles`.
+    make_client:
+        Builds the `Client` of a profile; defaults to `make_client`.
+    """
+    def __init__(self, profiles, make_client=make_client):
+        self.profiles = profiles
+        self.clients = OrderedDict((name, make_client(profile))
+                                   for name, profile in profiles.items())
+
+    @classmethod
+    def from_file(cls, path=None, **kwargs):
+        return cls(load_profiles(path), **kwargs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        for client in self.clients.values():
+            client.close()
+
+    def names(self, names=None):
+        """
+        The given profile names (all by default), checked to exist.
+        """
+        if not names:
+            return list(self.clients)
+        unknown = [name for name in names if name not in self.clients]
+        if unknown:
+            raise KeyError('Unknown profile(s): {}'.format(', '.join(unknown)))
+        return list(names)
+
+    def fan_out(self, fn, names=None, max_workers=None):
+        """
+        Call `fn(client)` for every account at the same time.
+
+        Parameters
+        ----------
+        fn:
+            Called with each account's `Client`, in a thread per account.
+        names:
+            Profiles to run on; all by default.
+        max_workers:
+            Accounts running at the same time; defaults to all of them.
+
+        Returns
+        -------
+        list
+            `AccountResult` per account, in profile order. Exceptions raised
+            by `fn` are caught and kept in `error`.
+        """
+        names = self.names(names)
+        if not names:
+            return []
+
+        def call(name):
+            start = time.perf_counter()
+            try:
+                result = fn(self.clients[name])
+            except Exception as e:
+                return AccountResult(name, False, None, e,
+                                     time.perf_counter() - start)
+            return AccountResult(name, True, result, None,
+                                 time.perf_counter() - start)
+
+        results = {}
+        workers = max_workers or len(names)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(call, name) for name in names]
+            for future in as_completed(futures):
+                result = future.result()
+                results[result.account] = result
+        return [results[name] for name in names]
+
+
+def merge(results, key='account'):
+    """
+    The records of successful `AccountResult`s, each copied with its account
+    name under `key`.
+    """
+    for result in results:
+        if not result.ok:
+            continue
+        for record in result.result:
+            tagged = {key: result.account}
+            tagged.update(record)
+            yield tagged
+
+
+# Raised by `checked` when an account answers with an error (an alias of
+# `responses.ApiResultError`).
+AccountError = ApiResultError
+
+
+def all_pages(get, **params):
+    """
+    Every record of a paginated `get` method; see `responses.iter_pages`.
+    """
+    return list(iter_pages(get, normalize=Normalizer(stream=True), **params))
+
+
+def fetch_contacts(client):
+    return all_pages(client.contacts.get)
+
+
+def fetch_lists(client):
+    return checked(client.lists.get(normalize=True))
+
+
+def fetch_messages(client):
+    return all_pages(client.messages.get_many)
+
+
+def fetch_campaigns(client):
+    return all_pages(client.campaigns.get)
+
+
+# Operations of the `fan_out` command.
+OPERATIONS = OrderedDict([
+    ('contacts', fetch_contacts),
+    ('lists', fetch_lists),
+    ('messages', fetch_messages),
+    ('campaigns', fetch_campaigns),
+])
@@ -3,11 +3,18 @@
 """Main module."""
 
 import os
-import requests
+import time
 import textwrap
+from collections import OrderedDict, namedtuple
 
 from dotenv import load_dotenv
-from activecampaign_takehome import schemas
+from activecampaign_takehome import bulk, schemas
+from activecampaign_takehome.circuitbreaker import CircuitOpenError
+from activecampaign_takehome.concurrency import imap_bounded
+from activecampaign_takehome.responses import get_normalizer
+from activecampaign_takehome.transport import (
+    RequestsTransport, StreamingForm, ThreadLocalRequestsTransport,
+    is_stream_source)
 
 
 THIS_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -16,7 +23,7 @@ THIS_DIR = os.path.dirname(os.path.abspath(__file__))
 class Config:
     def __init__(self):
         self.configure()
-        self.keys = ['API_KEY', 'ACCOUNT', 'DOMAIN', 'API_OUTPUT']
+        self.keys = ['API_KEY', 'ACCOUNT', 'DOMAIN', 'API_OUTPUT', 'BASE_URL']
 
     def configure(self):
         env_path = os.path.join(THIS_DIR, '.env')
@@ -27,20 +34,67 @@ class Config:
         self.ACCOUNT = os.getenv("AC_ACCOUNT")
         self.DOMAIN = os.getenv("AC_DOMAIN")
         self.API_OUTPUT = os.getenv("AC_API_OUTPUT") or 'json'
+        # Optional override of 'https://<ACCOUNT>.<DOMAIN>', e.g. for a stub.
+        self.BASE_URL = os.getenv("AC_BASE_URL") or None
 
     def __repr__(self):
         return "\n".join("{}: {}".format(k, getattr(self, k)) for k in self.keys)
 
 
+# Read-only account settings with the same attributes as `Config`; safe to
+# share between threads and picklable for worker processes.
+FrozenConfig = namedtuple('FrozenConfig', ['API_KEY', 'ACCOUNT', 'DOMAIN',
+                                           'API_OUTPUT', 'BASE_URL'])
+
+
 class ConfigurationError(Exception):
     pass
 
 
+def _has_records(result):
+    return (isinstance(result, dict)
+            and str(result.get('result_code')) == '1'
+            and any(k.isdigit() for k in result))
+
+
+def _nothing_returned(api_output):
+    return {'result_code': 0, 'result_message': 'Failed: Nothing is returned',
+            'result_output': api_output}
+
+
 class Api:
+    """
+    Base class for the API resources.
+
+    Parameters
+    ----------
+    config:
+        Account configuration (see `Config`).
+    breakers:
+        Optional `CircuitBreakerRegistry`. When given, every call goes through
+        the breaker of its `api_action` and raises `CircuitOpenError` instead
+        of calling a degraded action. Share one registry between resources.
+    timeout:
+        Optional timeout in seconds for each HTTP call.
+    transport:
+        Transport making the HTTP calls (see `transport`). Defaults to a
+        `RequestsTransport`.
+    cache:
+        Optional `ResponseCache` answering the resource's `cached_actions`
+        (reference data such as lists and campaigns). Share one cache
+        between resources.
+    limiter:
+        Optional `adaptive.AdaptiveLimit`. When given, every call waits for
+        a slot under the limit, and its latency and outcome adjust the
+        limit. Share one limiter between the resources of an account.
+    """
     base_path = '/admin/api.php'
     accepted_api_outputs = ['json']
+    # GET actions answered from `cache`, when there is one.
+    cached_actions = frozenset()
 
-    def __init__(self, config):
+    def __init__(self, config, breakers=None, timeout=None, transport=None,
+                 cache=None, limiter=None):
         self.api_key = config.API_KEY
         if not self.api_key:
             raise ConfigurationError("Unsupported API_KEY value: {}.".format(self.api_output))
@@ -51,8 +105,16 @@ class Api:
             raise ConfigurationError("Unsupported ACCOUNT value: {}.".format(config.ACCOUNT))
         if not config.DOMAIN:
             raise ConfigurationError("Unsupported DOMAIN value: {}.".format(config.ACCOUNT))
-        self.base_url = 'https://{}.{}'.format(config.ACCOUNT, config.DOMAIN)
+        self.base_url = (getattr(config, 'BASE_URL', None)
+                         or 'https://{}.{}'.format(config.ACCOUNT,
+                                                   config.DOMAIN))
         self.url = self.base_url + self.base_path
+        self.breakers = breakers
+        self.timeout = timeout
+        self.transport = (transport if transport is not None
+                          else RequestsTransport())
+        self.cache = cache
+        self.limiter = limiter
 
     def parse_response(self, resp):
         if self.api_output == 'json':
@@ -60,12 +122,22 @@ class Api:
         else:
             raise Exception("Cannot parse data in specified format: {}".format(self.api_output))
 
+    def normalized(self, api_action, result, normalize):
+        """
+        `result` as records when `normalize` is True or a `Normalizer`; see
+        `responses`.
+        """
+        normalizer = get_normalizer(normalize)
+        if normalizer is None:
+            return result
+        return normalizer(result, api_action)
+
     def _prepare_params(self, api_action, params):
         """
         Ensure correct params have been added
         """
-        if params is None:
-            params = {}
+        # Copy, so callers' dicts are never modified and can be shared.
+        params = dict(params or {})
         params.update({
             'api_action': api_action,
             'api_key': self.api_key,
@@ -76,25 +148,82 @@ class Api:
     def do_post(self, api_action, data, params=None, headers=None):
         url = self.url
         params = self._prepare_params(api_action, params)
-        if headers is None:
-            headers = {}
+        headers = dict(headers or {})
         # Ensure the correct content type
         headers.update({
             'content-type': 'application/x-www-form-urlencoded'
         })
-        resp = requests.post(
-            url, headers=headers, params=params, data=data
-        )
+        resp = self._call(api_action, lambda: self.transport.request(
+            'POST', url, params=params, data=data, headers=headers,
+            timeout=self.timeout
+        ))
         return self.parse_response(resp)
 
     def do_get(self, api_action, params):
         url = self.url
         params = self._prepare_params(api_action, params)
-        resp = requests.get(url, params=params)
-        return self.parse_response(resp)
+
+        def get():
+            resp = self._call(api_action, lambda: self.transport.request(
+                'GET', url, params=params, timeout=self.timeout
+            ))
+            return self.parse_response(resp)
+
+        if self.cache is not None and api_action in self.cached_actions:
+            return self.cache.get(self.cache.key(url, api_action, params), get)
+        return get()
+
+    def _call(self, api_action, send):
+        """
+        Make an HTTP call within the concurrency limiter, if any.
+
+        429 responses count as throttling; exceptions and 5xx responses as
+        failures. Calls refused by an open circuit breaker never reach the
+        API, so they free their slot without moving the limit.
+        """
+        if self.limiter is None:
+            return self._guarded_call(api_action, send)
+        self.limiter.acquire()
+        start = time.perf_counter()
+        try:
+            resp = self._guarded_call(api_action, send)
+        except CircuitOpenError:
+            self.limiter.cancel()
+            raise
+        except Exception:
+            self.limiter.release(time.perf_counter() - start, failed=True)
+            raise
+        status_code = getattr(resp, 'status_code', 200)
+        self.limiter.release(time.perf_counter() - start,
+                             throttled=status_code == 429,
+                             failed=status_code >= 500)
+        return resp
+
+    def _guarded_call(self, api_action, send):
+        """
+        Make an HTTP call through the circuit breaker of `api_action`, if any.
+
+        Exceptions (connection errors, timeouts) and 5xx responses count as
+        failures; the breaker's latency threshold applies to all calls.
+        """
+        if self.breakers is None:
+            return send()
+        breaker = self.breakers.get(api_action)
+        breaker.before_call()
+        start = time.perf_counter()
+        try:
+            resp = send()
+        except Exception:
+            breaker.record(time.perf_counter() - start, failed=True)
+            raise
+        breaker.record(time.perf_counter() - start,
+                       failed=getattr(resp, 'status_code', 200) >= 500)
+        return resp
 
 
 class CampaignResource(Api):
+    cached_actions = frozenset(['campaign_list'])
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.schema = None
@@ -123,11 +252,14 @@ class CampaignResource(Api):
         result = self.do_post(api_action=api_action, data=post_data)
         return result
 
-    def get(self, ids=None, full=None, sort=None, sort_direction=None, page=None):
+    def get(self, ids=None, full=None, sort=None, sort_direction=None,
+            page=None, normalize=False):
         """
         View campaign settings and information.
 
-        TODO: Pagination
+        Results are paginated; pass `page` to request pages after the first.
+        Pass `normalize` (True or a `Normalizer`) to get the campaigns as a
+        `RecordList` instead of the raw payload.
         """
         api_action = "campaign_list"
 
@@ -152,7 +284,10 @@ class CampaignResource(Api):
             params['sort'] = sort
         if sort_direction is not None:
             params['sort_direction'] = sort_direction
-        return self.do_get(api_action=api_action, params=params)
+        if page is not None:
+            params['page'] = page
+        result = self.do_get(api_action=api_action, params=params)
+        return self.normalized(api_action, result, normalize)
 
     def send(self, email, campaign_id, message_id, _type, action):
         """
@@ -212,15 +347,31 @@ class CampaignResource(Api):
 
 
 class MessageResource(Api):
+    streamable_fields = ['text', 'message_upload_text']
+    cached_actions = frozenset(['message_view'])
+    # Set once `message_list` answered nothing for messages that exist.
+    message_list_broken = False
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-    def get_many(self, ids=None, page=None):
+    def get_many(self, ids=None, page=None, normalize=False, max_workers=8):
         """
         View many email messages with a single API call.
 
         Note: The name of this endpoint differs from the other API calls.
 
+        Pass `normalize` (True or a `Normalizer`) to get the messages as a
+        `RecordList` instead of the raw payload.
+
+        `message_list` answers "Nothing is returned" on some accounts. When
+        it returns no messages for explicit `ids`, they are fetched with
+        `message_view` instead, `max_workers` at a time, and merged into
+        the `message_list` shape (messages not found are left out). The
+        resource then skips `message_list` for explicit IDs. Pass a
+        `ResponseCache` to the resource to cache the fetched messages and
+        share concurrent fetches of the same message.
+
         To Do: Handle pagination
         """
         api_action = 'message_list'
@@ -236,8 +387,46 @@ class MessageResource(Api):
         }
         if page is not None:
             params['page'] = page
-        print(params)
-        result = self.do_get(api_action=api_action, params=params)
+        requested = None
+        if ids.lower() != 'all':
+            requested = list(
+                OrderedDict.fromkeys(i.strip() for i in ids.split(',')
+                                     if i.strip()))
+        if requested and self.message_list_broken:
+            result = self._view_many(requested, page, max_workers)
+        else:
+            result = self.do_get(api_action=api_action, params=params)
+            if requested and not _has_records(result):
+                result = self._view_many(requested, page, max_workers)
+                if _has_records(result):
+                    self.message_list_broken = True
+        return self.normalized(api_action, result, normalize)
+
+    def _view_many(self, ids, page, max_workers):
+        """
+        `message_list`-shaped payload of the messages `ids`, fetched
+        concurrently with `get_one`.
+        """
+        if page is not None and str(page) != '1':
+            # Every message is on the first page.
+            return _nothing_returned(self.api_output)
+        messages = {}
+        for _id, future in imap_bounded(self.get_one, ids,
+                                        max_workers=max_workers):
+            result = future.result()
+            if (isinstance(result, dict)
+                    and str(result.get('result_code')) == '1'):
+                messages[_id] = {k: v for k, v in result.items()
+                                 if not k.startswith('result_')}
+        records = [messages[_id] for _id in ids if _id in messages]
+        if not records:
+            return _nothing_returned(self.api_output)
+        result = {str(i): record for i, record in enumerate(records)}
+        result.update({
+            'result_code': 1,
+            'result_message': 'Success: Something is returned',
+            'result_output': self.api_output,
+        })
         return result
 
     def get_one(self, _id):
@@ -265,14 +454,32 @@ class MessageResource(Api):
             priority:   Examples: 1 = high, 3 = medium/default, 5 = low
             charset:    Character set used. Example: 'utf-8'
             encoding:   Encoding used. Example: 'quoted-printable'
+            text:   Body, for textconstructor 'editor'.
+            message_upload_text:    Body, for textconstructor 'upload'.
+
+        The body (`text` or `message_upload_text`) may also be a path
+        (`pathlib.Path`) or a file object. It is then read and URL-encoded in
+        chunks while the request is sent, so memory use does not grow with
+        the size of the body.
 
         Note: Only supports text messages currently
 
         """
         api_action = 'message_add'
         schema = schemas.TextMessageSchema()
+        streams = {k: data[k] for k in self.streamable_fields
+                   if is_stream_source(data.get(k))}
+        if not streams:
+            post_data = schema.dump(data).data
+            return self.do_post(api_action=api_action, data=post_data)
+        # Validate with placeholders, then stream the bodies after the rest.
+        data = dict(data)
+        data.update({k: '<streamed>' for k in streams})
         post_data = schema.dump(data).data
-        result = self.do_post(api_action=api_action, data=post_data)
+        for k in streams:
+            post_data.pop(k)
+        result = self.do_post(api_action=api_action,
+                              data=StreamingForm(post_data, streams))
         return result
 
     def delete(self, _id):
@@ -283,6 +490,23 @@ class MessageResource(Api):
         result = self.do_get(api_action=api_action, params=params)
         return result
 
+    def delete_many(self, ids, max_workers=8, batch_size=100, dry_run=False,
+                    imap=imap_bounded):
+        """
+        Delete many messages, `batch_size` IDs per `message_delete_list` call;
+        see `bulk.delete_many`.
+        """
+        return bulk.delete_many(ids, self.delete, self._delete_list,
+                                batch_size=batch_size, max_workers=max_workers,
+                                dry_run=dry_run, imap=imap)
+
+    def _delete_list(self, ids):
+        api_action = 'message_delete_list'
+        params = {
+            'ids': ','.join(ids),
+        }
+        return self.do_get(api_action=api_action, params=params)
+
 
 class ContactsResource(Api):
 
@@ -299,6 +523,19 @@ class ContactsResource(Api):
         result = self.do_post(api_action=api_action, data=post_data)
         return result
 
+    def edit(self, contact_data):
+        """
+        Edit an existing contact.
+
+        `contact_data` takes the same values as `create`, plus the contact's
+        `id`. Lists and fields not passed are kept unless `overwrite` is '1'.
+        """
+        api_action = 'contact_edit'
+        schema = schemas.ContactEditSchema()
+        post_data = schema.dump(contact_data).data
+        result = self.do_post(api_action=api_action, data=post_data)
+        return result
+
     def delete(self, _id):
         api_action = 'contact_delete'
         params = {
@@ -307,11 +544,33 @@ class ContactsResource(Api):
         result = self.do_get(api_action=api_action, params=params)
         return result
 
-    def get(self, ids=None, filters=None, full=None, sort=None, sort_direction=None, page=None):
+    def delete_many(self, ids, max_workers=8, batch_size=100, dry_run=False,
+                    imap=imap_bounded):
+        """
+        Delete many contacts, `batch_size` IDs per `contact_delete_list` call;
+        see `bulk.delete_many`.
+        """
+        return bulk.delete_many(ids, self.delete, self._delete_list,
+                                batch_size=batch_size, max_workers=max_workers,
+                                dry_run=dry_run, imap=imap)
+
+    def _delete_list(self, ids):
+        api_action = 'contact_delete_list'
+        params = {
+            'ids': ','.join(ids),
+        }
+        return self.do_get(api_action=api_action, params=params)
+
+    def get(self, ids=None, filters=None, full=None, sort=None,
+            sort_direction=None, page=None, normalize=False):
         """
         View many (or all) contacts by including their ID's or various filters. This is useful for searching for contacts that match certain criteria - such as being part of a certain list, or having a specific custom field value. Contacts that are not subscribed to at least one list will not be viewable via this endpoint.
 
-        To Do: Handle pagination
+        Results are paginated (20 contacts per page); pass `page` to request
+        pages after the first. Pass `normalize` (True or a `Normalizer`) to get
+        the contacts as a `RecordList` instead of the raw payload. With a
+        `Normalizer(fields=...)`, `full` defaults to the lightest mode
+        returning those fields (see `Normalizer.full`).
         """
         api_action = "contact_list"
 
@@ -330,6 +589,9 @@ class ContactsResource(Api):
         params = {
             'ids': ids,
         }
+        normalizer = get_normalizer(normalize)
+        if full is None and normalizer is not None:
+            full = normalizer.full(api_action)
         if filters is not None:
             params['filters'] = filters
         if full is not None:
@@ -338,21 +600,27 @@ class ContactsResource(Api):
             params['sort'] = sort
         if sort_direction is not None:
             params['sort_direction'] = sort_direction
+        if page is not None:
+            params['page'] = page
         result = self.do_get(api_action=api_action, params=params)
-        # TBD: Paginate
-        return result
+        return self.normalized(api_action, result, normalize)
 
 
 class ListResource(Api):
+    cached_actions = frozenset(['list_list'])
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
     def create(self):
         raise NotImplementedError
 
-    def get(self, ids=None, global_fields=None, full=None):
+    def get(self, ids=None, global_fields=None, full=None, normalize=False):
         """
         View multiple mailing lists in the system, including all information associated with each.
+
+        Pass `normalize` (True or a `Normalizer`) to get the lists as a
+        `RecordList` instead of the raw payload.
         """
         api_action = "list_list"
 
@@ -375,7 +643,7 @@ class ListResource(Api):
             params['global_fields'] = sort
         result = self.do_get(api_action=api_action, params=params)
         # TBD: Paginate
-        return result
+        return self.normalized(api_action, result, normalize)
 
 
 class AddressResource(Api):
@@ -395,17 +663,38 @@ class AddressResource(Api):
         return result
 
     def delete(self, _id):
-        api_action = 'contact_delete'
+        api_action = 'address_delete'
         params = {
             'id': _id,
         }
         result = self.do_get(api_action=api_action, params=params)
         return result
 
-    def get(self, ids=None, filters=None, full=None, sort=None, sort_direction=None, page=None):
+    def delete_many(self, ids, max_workers=8, batch_size=100, dry_run=False,
+                    imap=imap_bounded):
+        """
+        Delete many addresses, `batch_size` IDs per `address_delete_list` call;
+        see `bulk.delete_many`.
+        """
+        return bulk.delete_many(ids, self.delete, self._delete_list,
+                                batch_size=batch_size, max_workers=max_workers,
+                                dry_run=dry_run, imap=imap)
+
+    def _delete_list(self, ids):
+        api_action = 'address_delete_list'
+        params = {
+            'ids': ','.join(ids),
+        }
+        return self.do_get(api_action=api_action, params=params)
+
+    def get(self, ids=None, filters=None, full=None, sort=None,
+            sort_direction=None, page=None, normalize=False):
         """
         View many (or all) contacts by including their ID's or various filters. This is useful for searching for contacts that match certain criteria - such as being part of a certain list, or having a specific custom field value. Contacts that are not subscribed to at least one list will not be viewable via this endpoint.
 
+        Pass `normalize` (True or a `Normalizer`) to get the contacts as a
+        `RecordList` instead of the raw payload.
+
         To Do: Handle pagination
         """
         api_action = "contact_list"
@@ -435,5 +724,58 @@ class AddressResource(Api):
             params['sort_direction'] = sort_direction
         result = self.do_get(api_action=api_action, params=params)
         # TBD: Paginate
-        return result
-
+        return self.normalized(api_action, result, normalize)
+
+
+class Client:
+    """
+    Resources sharing one configuration and transport, safe to use from many
+    threads.
+
+    The configuration is frozen (`FrozenConfig`), the resources are built
+    once, and calls build their query parameters, form data and headers
+    without modifying any shared state. Connections are per thread
+    (`ThreadLocalRequestsTransport`) unless another transport is given;
+    `Urllib3Transport` is thread-safe as well, with a shared pool.
+
+    Example::
+
+        client = Client(Config())
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            results = list(executor.map(client.contacts.create, contacts))
+        client.close()
+
+    Parameters
+    ----------
+    config:
+        `Config`, `FrozenConfig` or any object with the same attributes.
+    transport, breakers, timeout, cache, limiter:
+        As for `Api`; shared by all the resources.
+    """
+    def __init__(self, config, transport=None, breakers=None, timeout=None,
+                 cache=None, limiter=None):
+        self.config = FrozenConfig(*(getattr(config, k, None)
+                                     for k in FrozenConfig._fields))
+        self.transport = (transport if transport is not None
+                          else ThreadLocalRequestsTransport())
+        self.cache = cache
+        self.limiter = limiter
+        kwargs = {'breakers': breakers, 'timeout': timeout,
+                  'transport': self.transport, 'cache': cache,
+                  'limiter': limiter}
+        self.contacts = ContactsResource(self.config, **kwargs)
+        self.campaigns = CampaignResource(self.config, **kwargs)
+        self.messages = MessageResource(self.config, **kwargs)
+        self.lists = ListResource(self.config, **kwargs)
+        self.addresses = AddressResource(self.config, **kwargs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self.cache is not None:
+            self.cache.close()
+        self.transport.close()
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+
+"""
+Adaptive (AIMD) concurrency limit for the API calls of one account.
+
+Pass an `AdaptiveLimit` to the resources (or to `Client`) and every
+`do_get`/`do_post` waits for a free slot before calling, then reports its
+latency and outcome. The limit moves like TCP congestion control:
+
+- additive increase: each successful call raises the limit by `1 / limit`,
+  about one more slot per round of calls, but only while all the slots
+  are in use;
+- multiplicative decrease: a 429, a 5xx, an exception or a latency
+  (moving average) above `tolerance` times the lowest recent one cuts the
+  limit by `backoff`, at most once per average round trip, since the calls
+  in flight at that moment report the same congestion.
+
+Calls an open circuit breaker refuses never reach the API; `cancel` frees
+their slot without counting them.
+
+Run a bulk operation with as many threads as the highest acceptable limit
+and the limit settles near the concurrency the account sustains; the other
+threads wait. `metrics()` reports the current limit.
+
+Example::
+
+    limit = AdaptiveLimit(initial=4, max_limit=64)
+    client = Client(Config(), limiter=limit)
+    import_contacts(client.contacts, contacts, max_workers=64)
+    print(limit.metrics()['limit'])
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class AdaptiveLimit:
+    """
+    AIMD limit on the calls in flight, shared by the threads of one account.
+
+    Parameters
+    ----------
+    initial:
+        Starting limit.
+    min_limit, max_limit:
+        Bounds of the limit.
+    backoff:
+        Factor applied to the limit on throttling, errors or slow calls.
+    tolerance:
+        Calls count as slow while the moving average latency is above this
+        multiple of the lowest latency of the last `window` calls.
+    window:
+        Successful calls kept to find the lowest latency.
+    smoothing:
+        Weight of the latest call in the moving average latency.
+    """
+    def __init__(self, initial=4, min_limit=1, max_limit=64, backoff=0.5,
+                 tolerance=2.0, window=100, smoothing=0.1,
+                 clock=time.monotonic):
+        if not min_limit <= initial <= max_limit:
+            raise ValueError('initial must be between min_limit and max_limit')
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.clock = clock
+        self.cond = threading.Condition()
+        self.in_flight = 0
+        self.latencies = deque(maxlen=window)
+        self.latency = None
+        self.last_decrease = None
+        self.counts = OrderedDict([
+            ('calls', 0), ('throttled', 0), ('errors', 0), ('slow', 0),
+            ('increases', 0), ('decreases', 0), ('max_in_flight', 0),
+            ('waited', 0.0),
+        ])
+
+    def acquire(self):
+        """
+        Wait for a free slot; returns the seconds waited.
+        """
+        with self.cond:
+            start = self.clock()
+            while self.in_flight >= int(self.limit):
+                self.cond.wait()
+            self.in_flight += 1
+            self.counts['max_in_flight'] = max(self.counts['max_in_flight'],
+                                               self.in_flight)
+            waited = self.clock() - start
+            self.counts['waited'] += waited
+        return waited
+
+    def release(self, latency, throttled=False, failed=False):
+        """
+        Free the slot of a call that took `latency` seconds; adjust the limit.
+
+        `throttled` is a 429 answer; `failed` an exception or a 5xx answer.
+        """
+        with self.cond:
+            saturated = self.in_flight >= int(self.limit)
+            self.in_flight -= 1
+            self.counts['calls'] += 1
+            if throttled or failed:
+                self.counts['throttled' if throttled else 'errors'] += 1
+                self._decrease()
+            else:
+                if self.latency is None:
+                    self.latency = latency
+                else:
+                    self.latency = (self.smoothing * latency
+                                    + (1 - self.smoothing) * self.latency)
+                self.latencies.append(latency)
+                if self.latency > min(self.latencies) * self.tolerance:
+                    self.counts['slow'] += 1
+                    self._decrease()
+                elif saturated and self.limit < self.max_limit:
+                    self.limit = min(self.max_limit,
+                                     self.limit + 1 / self.limit)
+                    self.counts['increases'] += 1
+            self.cond.notify_all()
+
+    def cancel(self):
+        """
+        Free the slot of a call that was never sent (e.g. refused by an open
+        circuit breaker), leaving the limit and the counts as they are.
+        """
+        with self.cond:
+            self.in_flight -= 1
+            self.cond.notify_all()
+
+    def _decrease(self):
+        now = self.clock()
+        if (self.last_decrease is not None
+                and now - self.last_decrease < (self.latency or 0)):
+            return
+        self.last_decrease = now
+        self.limit = max(self.min_limit, self.limit * self.backoff)
+        self.counts['decreases'] += 1
+
+    def metrics(self):
+        with self.cond:
+            metrics = OrderedDict([('limit', round(self.limit, 2)),
+                                   ('in_flight', self.in_flight)])
+            metrics.update(self.counts)
+            metrics['waited'] = round(metrics['waited'], 3)
+            metrics['latency'] = (None if self.latency is None
+                                  else round(self.latency, 4))
+            metrics['min_latency'] = (round(min(self.latencies), 4)
+                                      if self.latencies else None)
+        return metrics
@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+
+"""
+Throughput benchmarks for the `Api` hot paths.
+
+Every benchmark runs the resource classes against a fresh local
+`StubServer`, so the numbers measure client-side cost (schema handling,
+request building, HTTP round trips on localhost and JSON decoding).
+
+Example::
+
+    python -m activecampaign_takehome.benchmark --output baseline.json
+    python -m activecampaign_takehome.benchmark --baseline baseline.json
+"""
+
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+import requests
+
+from activecampaign_takehome import __version__, schemas
+from activecampaign_takehome import activecampaign_takehome as act
+from activecampaign_takehome.responses import Normalizer, iter_pages
+from activecampaign_takehome.stubserver import (StubBackend, StubServer,
+                                                make_contact)
+from activecampaign_takehome.transport import (
+    InMemoryTransport, RequestsTransport, ThreadLocalRequestsTransport,
+    Urllib3Transport)
+
+
+BENCHMARKS = OrderedDict()
+
+
+def benchmark(name, **backend_kwargs):
+    """
+    Register a benchmark function.
+
+    The function receives a running `StubServer` and the workload size and
+    returns the number of operations it performed. `backend_kwargs` may
+    contain callables taking the workload size, to size the stub account.
+    """
+    def decorator(fn):
+        BENCHMARKS[name] = (fn, backend_kwargs)
+        return fn
+    return decorator
+
+
+@benchmark('contact_create', contacts=lambda size: 0)
+def bench_contact_create(server, size):
+    """Sequential `ContactsResource.create` calls."""
+    resource = act.ContactsResource(server.config())
+    for i in range(size):
+        resource.create({
+            'email': 'bench{}@example.com'.format(i),
+            'first_name': 'Bench',
+            'last_name': str(i),
+            'tags': ['bench'],
+            'list_id': ['1'],
+        })
+    return size
+
+
+@benchmark('contact_export', contacts=lambda size: size)
+def bench_contact_export(server, size):
+    """Page through every contact with `full=1`; counts records."""
+    resource = act.ContactsResource(server.config())
+    return sum(1 for _ in iter_pages(resource.get, full=1))
+
+
+@benchmark('contact_export_fields', contacts=lambda size: size)
+def bench_contact_export_fields(server, size):
+    """Page through every contact keeping four fields (`full=0`); counts."""
+    resource = act.ContactsResource(server.config())
+    normalizer = Normalizer(fields=['id', 'email', 'name', 'listid'])
+    return sum(1 for _ in iter_pages(resource.get, normalize=normalizer))
+
+
+@benchmark('campaign_fanout', contacts=lambda size: 0,
+           campaigns=lambda size: 1)
+def bench_campaign_fanout(server, size, workers=8):
+    """`CampaignResource.send` (action=test) to many recipients, threaded."""
+    resource = act.CampaignResource(server.config())
+
+    def send(i):
+        return resource.send('bench{}@example.com'.format(i), '1', '1', 'text',
+                             'test')
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for _ in executor.map(send, range(size)):
+            pass
+    return size
+
+
+@benchmark('schema_dump_load', contacts=lambda size: 0)
+def bench_schema_dump_load(server, size):
+    """`ContactSchema.dump` and `ContactResponseSchema.load`; no HTTP."""
+    dump_schema = schemas.ContactSchema()
+    load_schema = schemas.ContactResponseSchema()
+    record = make_contact(1)
+    for i in range(size):
+        dump_schema.dump({
+            'email': 'bench{}@example.com'.format(i),
+            'first_name': 'Bench',
+            'last_name': str(i),
+            'tags': ['bench', 'schema'],
+            'list_id': ['1', '2'],
+        })
+        load_schema.load(record)
+    return size
+
+
+@benchmark('normalize_page', contacts=lambda size: 0)
+def bench_normalize_page(server, size):
+    """`Normalizer` coercing and projecting `contact_list` pages; no HTTP."""
+    payload = {str(i): make_contact(i + 1) for i in range(20)}
+    payload.update({'result_code': 1,
+                    'result_message': 'Success: Something is returned',
+                    'result_output': 'json'})
+    normalizer = Normalizer(coerce=True,
+                            fields=['id', 'email', 'sdate', 'sentcnt',
+                                    'bounced_hard', 'bounced_soft'])
+    records = 0
+    for _ in range(max(size // 20, 1)):
+        records += len(normalizer(payload, 'contact_list'))
+    return records
+
+
+TRANSPORTS = OrderedDict([
+    ('requests', lambda server: RequestsTransport()),
+    ('requests_session', lambda server: RequestsTransport(requests.Session())),
+    ('requests_threadlocal', lambda server: ThreadLocalRequestsTransport()),
+    ('urllib3', lambda server: Urllib3Transport()),
+    ('inmemory', lambda server: InMemoryTransport(server.backend.handle)),
+])
+
+
+def _transport_benchmark(make_transport):
+    def bench(server, size):
+        """Sequential one-contact `ContactsResource.get` calls; overhead."""
+        transport = make_transport(server)
+        resource = act.ContactsResource(server.config(), transport=transport)
+        for _ in range(size):
+            resource.get(ids='1')
+        transport.close()
+        return size
+    return bench
+
+
+for _name, _make_transport in TRANSPORTS.items():
+    _bench = _transport_benchmark(_make_transport)
+    benchmark('transport_{}'.format(_name), contacts=lambda size: 1)(_bench)
+
+
+def run_benchmark(name, size, repeat=3, latency=0.0):
+    """
+    Run one registered benchmark `repeat` times, each on a fresh stub account.
+
+    Returns a dict of timings; `ops_per_sec` is computed from the median run.
+    """
+    fn, backend_kwargs = BENCHMARKS[name]
+    wall_times = []
+    cpu_times = []
+    ops = 0
+    for _ in range(repeat):
+        kwargs = {k: v(size) for k, v in backend_kwargs.items()}
+        backend = StubBackend(latency=latency, **kwargs)
+        with StubServer(backend) as server:
+            wall_start = time.perf_counter()
+            cpu_start = time.process_time()
+            ops = fn(server, size)
+            cpu_times.append(time.process_time() - cpu_start)
+            wall_times.append(time.perf_counter() - wall_start)
+    median = statistics.median(wall_times)
+    return {
+        'ops': ops,
+        'repeat': repeat,
+        'wall_seconds': wall_times,
+        'cpu_seconds': cpu_times,
+        'min': min(wall_times),
+        'median': median,
+        'mean': statistics.mean(wall_times),
+        'ops_per_sec': ops / median if median else None,
+    }
+
+
+def _git_revision():
+    try:
+        out = subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=act.THIS_DIR,
+            stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.decode('ascii').strip()
+
+
+def machine_metadata():
+    """
+    Describe the machine and software the benchmarks ran on.
+    """
+    import marshmallow
+    return {
+        'timestamp': datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'hostname': platform.node(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version(),
+        'python_implementation': platform.python_implementation(),
+        'package_version': __version__,
+        'git_revision': _git_revision(),
+        'dependencies': {
+            'requests': requests.__version__,
+            'marshmallow': marshmallow.__version__,
+        },
+    }
+
+
+def run_suite(names=None, size=200, repeat=3, latency=0.0):
+    """
+    Run the named benchmarks (all of them by default).
+    """
+    names = names or list(BENCHMARKS)
+    results = OrderedDict()
+    for name in names:
+        results[name] = run_benchmark(name, size, repeat=repeat,
+                                      latency=latency)
+    return {
+        'metadata': machine_metadata(),
+        'parameters': {'size': size, 'repeat': repeat, 'latency': latency},
+        'benchmarks': results,
+    }
+
+
+def compare(results, baseline, tolerance=0.1):
+    """
+    Compare median timings against a baseline result set.
+
+    Returns one row per benchmark present in both sets. `change` is the
+    relative change in median wall time (positive is slower) and `regressed`
+    is set when it exceeds `tolerance`.
+    """
+    rows = []
+    for name, current in results['benchmarks'].items():
+        previous = baseline.get('benchmarks', {}).get(name)
+        if previous is None:
+            continue
+        change = (current['median'] - previous['median']) / previous['median']
+        rows.append({
+            'name': name,
+            'baseline_ops_per_sec': previous['ops_per_sec'],
+            'ops_per_sec': current['ops_per_sec'],
+            'change': change,
+            'regressed': change > tolerance,
+        })
+    return rows
+
+
+@click.command()
+@click.option('-b', '--benchmark', 'names', multiple=True,
+              type=click.Choice(list(BENCHMARKS)),
+              help='Benchmark to run (repeatable). Defaults to all.')
+@click.option('--size', default=200, help='Operations (or contacts) per run.')
+@click.option('--repeat', default=3, help='Runs per benchmark.')
+@click.option('--latency', default=0.0,
+              help='Simulated server latency per call, in seconds.')
+@click.option('--output', type=click.Path(dir_okay=False),
+              help='Write results as JSON to this file.')
+@click.option('--baseline', type=click.Path(exists=True, dir_okay=False),
+              help='Baseline JSON to compare against.')
+@click.option('--tolerance', default=0.1,
+              help='Allowed slowdown relative to the baseline.')
+def main(names, size, repeat, latency, output, baseline, tolerance):
+    """
+    Run the throughput benchmarks against a local stub server.
+    """
+    results = run_suite(list(names), size=size, repeat=repeat, latency=latency)
+    for name, result in results['benchmarks'].items():
+        click.echo('{:<28} {:>12.1f} ops/s  (median {:.4f}s over {} runs)'
+                   .format(name, result['ops_per_sec'], result['median'],
+                           result['repeat']))
+    if output:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if baseline:
+        with open(baseline, 'r') as f:
+            baseline_data = json.load(f)
+        rows = compare(results, baseline_data, tolerance=tolerance)
+        click.echo('')
+        for row in rows:
+            status = 'REGRESSION' if row['regressed'] else 'ok'
+            click.echo('{:<28} {:>+8.1%}  {}'.format(row['name'],
+                                                     row['change'], status))
+        if any(row['regressed'] for row in rows):
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
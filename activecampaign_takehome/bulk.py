@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+
+"""
+Bulk deletes.
+
+`delete_many` removes many records by ID, in batches through the API's
+list-delete action (e.g. `contact_delete_list`) where there is one, and
+with concurrent single deletes otherwise. IDs of a batch the API did not
+delete are retried one by one, so every ID gets its own result. The
+resources' `delete_many` methods are built on it.
+"""
+
+import time
+from collections import OrderedDict
+
+from activecampaign_takehome.concurrency import imap_bounded, outcome
+
+
+DRY_RUN_MESSAGE = 'Dry run: not deleted'
+
+
+class DeleteReport:
+    """
+    Outcome of a bulk delete: `results` maps every ID, in the order given,
+    to `(ok, message)`.
+    """
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.results = OrderedDict()
+        self.calls = 0
+        self.batches = 0
+        self.elapsed = 0.0
+
+    @property
+    def deleted(self):
+        if self.dry_run:
+            return 0
+        return sum(1 for ok, _ in self.results.values() if ok)
+
+    @property
+    def failed(self):
+        return sum(1 for ok, _ in self.results.values() if not ok)
+
+    @property
+    def per_second(self):
+        """IDs handled per second."""
+        return len(self.results) / self.elapsed if self.elapsed else None
+
+    def failures(self):
+        return [(_id, message) for _id, (ok, message) in self.results.items()
+                if not ok]
+
+    def as_dict(self):
+        return OrderedDict([
+            ('ids', len(self.results)),
+            ('deleted', self.deleted),
+            ('failed', self.failed),
+            ('dry_run', self.dry_run),
+            ('calls', self.calls),
+            ('batches', self.batches),
+            ('elapsed', round(self.elapsed, 3)),
+            ('per_second', (None if self.per_second is None
+                            else round(self.per_second, 1))),
+        ])
+
+    def __repr__(self):
+        return "\n".join("{}: {}".format(k, v)
+                         for k, v in self.as_dict().items())
+
+
+def _unique(ids):
+    if isinstance(ids, str):
+        ids = ids.split(',')
+    return list(OrderedDict.fromkeys(str(_id).strip() for _id in ids
+                                     if str(_id).strip()))
+
+
+def delete_many(ids, delete_one, delete_list=None, batch_size=100,
+                max_workers=8, dry_run=False, imap=imap_bounded):
+    """
+    Delete every ID of `ids`.
+
+    Parameters
+    ----------
+    ids:
+        IDs, as a list or a comma separated string; repeated IDs are
+        deleted once.
+    delete_one:
+        Called with one ID; returns the API result.
+    delete_list:
+        Called with a list of up to `batch_size` IDs; returns the API
+        result for the whole batch. Batches that fail are retried with
+        `delete_one`.
+    max_workers:
+        Calls in flight at the same time.
+    dry_run:
+        Make no call; report what would be deleted, and in how many calls.
+    imap:
+        Runs the calls; `concurrency.imap_bounded` or `runner.Runner.imap`.
+        If it stops early (an interrupted `Runner`), the IDs not tried are
+        left out of the report.
+
+    Returns
+    -------
+    DeleteReport
+    """
+    ids = _unique(ids)
+    report = DeleteReport(dry_run=dry_run)
+    start = time.perf_counter()
+    if dry_run:
+        if delete_list is not None:
+            batches = (len(ids) + batch_size - 1) // batch_size
+            report.batches = report.calls = batches
+        else:
+            report.calls = len(ids)
+        for _id in ids:
+            report.results[_id] = (True, DRY_RUN_MESSAGE)
+        return report
+
+    results = {}
+    remaining = ids
+    if delete_list is not None:
+        batches = [ids[i:i + batch_size]
+                   for i in range(0, len(ids), batch_size)]
+        remaining = []
+        for batch, future in imap(delete_list, batches,
+                                  max_workers=max_workers):
+            report.calls += 1
+            report.batches += 1
+            ok, result, message = outcome(future)
+            if ok:
+                results.update((_id, (True, message)) for _id in batch)
+            else:
+                remaining.extend(batch)
+    for _id, future in imap(delete_one, remaining, max_workers=max_workers):
+        report.calls += 1
+        ok, result, message = outcome(future)
+        results[_id] = (ok, message)
+    for _id in ids:
+        if _id in results:
+            report.results[_id] = results[_id]
+    report.elapsed = time.perf_counter() - start
+    return report
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+
+"""
+Response cache for reference data (lists, campaigns, messages).
+
+Pass a `ResponseCache` to the resources (or to `Client`) and the read-only
+calls of `ListResource.get`, `CampaignResource.get` and
+`MessageResource.get_one` are answered from it. Entries younger than `ttl`
+are returned as they are. Older entries are handled per `mode`:
+
+- 'strict': the caller fetches a fresh copy and waits for it.
+- 'swr' (stale-while-revalidate): the stale copy is returned at once and a
+  background thread refreshes it. Only entries older than `ttl + max_stale`
+  make the caller wait.
+
+Whatever the mode, concurrent callers missing the same entry share a single
+API call (single flight), and at most one background refresh per entry runs
+at a time. Failed calls (exceptions, and answers other than `result_code` 1
+by default) are not cached; a failed background refresh keeps the stale
+entry until it is too old to serve.
+
+Example::
+
+    cache = ResponseCache(ttl=60, mode='swr', max_stale=600)
+    client = Client(Config(), cache=cache)
+    client.lists.get()   # a cold call waits, later ones return at once
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+MODES = ('strict', 'swr')
+
+
+def is_success(value):
+    """
+    True for an API result with `result_code` 1.
+    """
+    return isinstance(value, dict) and str(value.get('result_code')) == '1'
+
+
+class _Flight:
+    """
+    One API call shared by every caller asking for the same entry meanwhile.
+    """
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ResponseCache:
+    """
+    In-memory cache of API responses, with a TTL and stale-while-revalidate.
+
+    Cached payloads are shared by every caller and must not be modified.
+
+    Parameters
+    ----------
+    ttl:
+        Seconds an entry is fresh.
+    mode:
+        'strict' or 'swr', see the module documentation.
+    max_stale:
+        In 'swr' mode, seconds past `ttl` an entry may still be served
+        while it is refreshed.
+    max_entries:
+        Least recently used entries are dropped beyond this number.
+    refresh_workers:
+        Threads running background refreshes.
+    cacheable:
+        Called with a fetched value; only values it accepts are stored.
+        Defaults to `is_success`.
+    """
+    def __init__(self, ttl=60.0, mode='swr', max_stale=300.0, max_entries=1000,
+                 refresh_workers=2, cacheable=is_success,
+                 clock=time.monotonic):
+        if mode not in MODES:
+            raise ValueError('mode must be one of {}'.format(', '.join(MODES)))
+        self.ttl = ttl
+        self.mode = mode
+        self.max_stale = max_stale
+        self.max_entries = max_entries
+        self.refresh_workers = refresh_workers
+        self.cacheable = cacheable
+        self.clock = clock
+        self.lock = threading.Lock()
+        # key -> (value, fetched_at), least recently used first.
+        self.entries = OrderedDict()
+        self.flights = {}
+        self.refreshing = set()
+        self.executor = None
+        self.counts = OrderedDict([
+            ('hits', 0), ('stale_hits', 0), ('misses', 0), ('coalesced', 0),
+            ('refreshes', 0), ('refresh_errors', 0), ('evictions', 0),
+        ])
+
+    @staticmethod
+    def key(url, api_action, params):
+        """
+        Cache key of a call; `params` are the query parameters (with API key).
+        """
+        return (url, api_action,
+                tuple(sorted((k, str(v)) for k, v in params.items())))
+
+    def get(self, key, fetch):
+        """
+        The cached value of `key`, calling `fetch()` when none can be served.
+        """
+        now = self.clock()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                value, fetched_at = entry
+                age = now - fetched_at
+                if age < self.ttl:
+                    self.entries.move_to_end(key)
+                    self.counts['hits'] += 1
+                    return value
+                if self.mode == 'swr' and age < self.ttl + self.max_stale:
+                    self.entries.move_to_end(key)
+                    self.counts['stale_hits'] += 1
+                    self._revalidate(key, fetch)
+                    return value
+            self.counts['misses'] += 1
+        return self._fetch(key, fetch)
+
+    def _fetch(self, key, fetch):
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = _Flight()
+            else:
+                self.counts['coalesced'] += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        try:
+            flight.value = fetch()
+            self._store(key, flight.value)
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.done.set()
+        return flight.value
+
+    def _revalidate(self, key, fetch):
+        # Called with the lock held.
+        if key in self.refreshing or key in self.flights:
+            return
+        self.refreshing.add(key)
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(
+                max_workers=self.refresh_workers,
+                thread_name_prefix='cache-refresh')
+        self.executor.submit(self._refresh, key, fetch)
+
+    def _refresh(self, key, fetch):
+        try:
+            value = self._fetch(key, fetch)
+        except Exception:
+            with self.lock:
+                self.counts['refresh_errors'] += 1
+        else:
+            with self.lock:
+                if self.cacheable(value):
+                    self.counts['refreshes'] += 1
+                else:
+                    self.counts['refresh_errors'] += 1
+        finally:
+            with self.lock:
+                self.refreshing.discard(key)
+
+    def _store(self, key, value):
+        if not self.cacheable(value):
+            # A failed call or an error page: do not keep it.
+            return
+        with self.lock:
+            self.entries[key] = (value, self.clock())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.counts['evictions'] += 1
+
+    def invalidate(self, key=None):
+        """
+        Drop `key`, or every entry.
+        """
+        with self.lock:
+            if key is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(key, None)
+
+    def stats(self):
+        with self.lock:
+            stats = OrderedDict(self.counts)
+            stats['entries'] = len(self.entries)
+        return stats
+
+    def close(self, wait=True):
+        """
+        Stop the background refresh threads.
+        """
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+
+"""
+Record API interactions once and replay them offline.
+
+`RecordingTransport` wraps a real transport (against an account or a
+`StubServer`) and adds every call to a `Cassette`: method, query
+parameters (without the API key), form data, status, body and latency.
+Saved cassettes are JSON lines, gzip-compressed when the file name ends in
+`.gz`. `ReplayTransport` answers the same calls from a loaded cassette,
+either at memory speed or with the recorded latencies, so a workload can be
+re-run without a network and its client-side CPU time
+(`time.process_time`) compared between versions.
+
+Example::
+
+    cassette = Cassette()
+    recording = RecordingTransport(Urllib3Transport(), cassette)
+    with Client(config, transport=recording) as client:
+        run_workload(client)
+    cassette.save('workload.jsonl.gz')
+
+    replay = ReplayTransport(Cassette.load('workload.jsonl.gz'))
+    with Client(config, transport=replay) as client:
+        start = time.process_time()
+        run_workload(client)
+        print(time.process_time() - start)
+"""
+
+import gzip
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from activecampaign_takehome.transport import (Response, StreamingForm,
+                                               Transport)
+
+
+# Query parameters left out of cassettes and of request matching.
+SECRET_PARAMS = frozenset(['api_key'])
+
+# Placeholder recorded for streamed form fields, whose content is not kept.
+STREAMED = '<streamed>'
+
+
+class CassetteMiss(LookupError):
+    """
+    `ReplayTransport` got a call that is not in its cassette.
+    """
+
+
+def _form(data):
+    if data is None:
+        return None
+    if isinstance(data, StreamingForm):
+        form = dict(data.fields)
+        form.update((name, STREAMED) for name in data.streams)
+        return form
+    if isinstance(data, dict):
+        return {k: (v if isinstance(v, (str, int, float, bool)) or v is None
+                    else str(v))
+                for k, v in data.items()}
+    return data.decode('utf-8') if isinstance(data, bytes) else str(data)
+
+
+def request_key(method, params, data):
+    """
+    Identity of a call for replay: method, query parameters (minus secrets)
+    and form data.
+    """
+    params = {k: str(v) for k, v in (params or {}).items()
+              if k not in SECRET_PARAMS}
+    return json.dumps([method, params, data], sort_keys=True,
+                      separators=(',', ':'))
+
+
+class Cassette:
+    """
+    Recorded interactions, in call order.
+
+    Each interaction is a dict with `method`, `params`, `data`, `status`,
+    `body` (text) and `elapsed` (seconds).
+    """
+    def __init__(self, interactions=None):
+        self.interactions = list(interactions or [])
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.interactions)
+
+    def record(self, method, params, data, status, body, elapsed):
+        interaction = OrderedDict([
+            ('method', method),
+            ('params', {k: str(v) for k, v in (params or {}).items()
+                        if k not in SECRET_PARAMS}),
+            ('data', _form(data)),
+            ('status', status),
+            ('body', body),
+            ('elapsed', round(elapsed, 6)),
+        ])
+        with self.lock:
+            self.interactions.append(interaction)
+        return interaction
+
+    def save(self, path):
+        """
+        Write the interactions as JSON lines, gzip-compressed if `path` ends
+        in `.gz`.
+        """
+        opener = gzip.open if str(path).endswith('.gz') else open
+        with opener(path, 'wt', encoding='utf-8') as f:
+            for interaction in self.interactions:
+                f.write(json.dumps(interaction, separators=(',', ':')))
+                f.write('\n')
+
+    @classmethod
+    def load(cls, path):
+        opener = gzip.open if str(path).endswith('.gz') else open
+        with opener(path, 'rt', encoding='utf-8') as f:
+            return cls(json.loads(line) for line in f if line.strip())
+
+
+class RecordingTransport(Transport):
+    """
+    Pass every call on to `transport` and record it in `cassette`.
+    """
+    def __init__(self, transport, cassette=None):
+        self.transport = transport
+        self.cassette = cassette if cassette is not None else Cassette()
+
+    def request(self, method, url, params=None, data=None, headers=None,
+                timeout=None):
+        start = time.perf_counter()
+        resp = self.transport.request(method, url, params=params, data=data,
+                                      headers=headers, timeout=timeout)
+        elapsed = time.perf_counter() - start
+        self.cassette.record(method, params, data, resp.status_code,
+                             resp.content.decode('utf-8'), elapsed)
+        return resp
+
+    def close(self):
+        self.transport.close()
+
+
+class ReplayTransport(Transport):
+    """
+    Answer calls from a `Cassette` instead of the network.
+
+    Calls are matched on method, query parameters and form data; the URL,
+    API key and headers are ignored. Identical calls get the recorded
+    answers in their recorded order.
+
+    Parameters
+    ----------
+    cassette:
+        `Cassette` (or a path to load one from).
+    latency_scale:
+        Sleep this multiple of each call's recorded latency; 0 (default)
+        replays at memory speed.
+    repeat:
+        Once the recorded answers to a call are used up, keep returning the
+        last one. Without it, further calls raise `CassetteMiss`.
+    """
+    def __init__(self, cassette, latency_scale=0.0, repeat=True,
+                 sleep=time.sleep):
+        if not isinstance(cassette, Cassette):
+            cassette = Cassette.load(cassette)
+        self.latency_scale = latency_scale
+        self.repeat = repeat
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self.answers = {}
+        for interaction in cassette.interactions:
+            key = request_key(interaction['method'], interaction['params'],
+                              interaction['data'])
+            body = interaction['body'].encode('utf-8')
+            answer = (interaction['status'], body, interaction['elapsed'])
+            self.answers.setdefault(key, []).append(answer)
+        self.positions = dict.fromkeys(self.answers, 0)
+        self.replayed = 0
+
+    def request(self, method, url, params=None, data=None, headers=None,
+                timeout=None):
+        key = request_key(method, params, _form(data))
+        with self.lock:
+            answers = self.answers.get(key)
+            if answers is None:
+                raise CassetteMiss(
+                    'No recorded answer for {} {}'.format(method, key))
+            position = self.positions[key]
+            if position >= len(answers):
+                if not self.repeat:
+                    raise CassetteMiss('Recorded answers used up for {} {}'
+                                       .format(method, key))
+                position = len(answers) - 1
+            self.positions[key] = position + 1
+            self.replayed += 1
+        status, body, elapsed = answers[position]
+        if self.latency_scale:
+            self.sleep(elapsed * self.latency_scale)
+        return Response(status, body)
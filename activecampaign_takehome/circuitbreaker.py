@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+
+"""
+Circuit breakers for API actions.
+
+A breaker watches the outcome and latency of recent calls. When too many of
+them fail or are too slow it opens, and further calls fail fast with
+`CircuitOpenError` instead of tying up a worker. After `reset_timeout` it
+lets a few probe calls through (half-open) and closes again once they
+succeed.
+"""
+
+import threading
+import time
+from collections import deque
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of making a call while the breaker for its action is open.
+    """
+    def __init__(self, api_action, retry_after):
+        super().__init__(
+            "Circuit for API action '{}' is open; retry in {:.1f}s.".format(
+                api_action, retry_after))
+        self.api_action = api_action
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Failure-rate and latency based circuit breaker.
+
+    Parameters
+    ----------
+    name:
+        Label used in errors, usually the API action.
+    failure_rate:
+        Fraction of failed calls in the window that opens the circuit.
+    slow_call_duration:
+        Calls taking longer than this many seconds count as slow. None
+        disables the latency threshold.
+    slow_call_rate:
+        Fraction of slow calls in the window that opens the circuit.
+    window:
+        Number of most recent calls considered.
+    min_calls:
+        Calls needed in the window before the rates are evaluated.
+    reset_timeout:
+        Seconds to stay open before allowing probe calls.
+    half_open_calls:
+        Probe calls allowed (and required to succeed) while half-open.
+    """
+    def __init__(self, name='', failure_rate=0.5, slow_call_duration=None,
+                 slow_call_rate=0.5, window=20, min_calls=10,
+                 reset_timeout=30.0, half_open_calls=1, clock=time.monotonic):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.slow_call_duration = slow_call_duration
+        self.slow_call_rate = slow_call_rate
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+        self.clock = clock
+        self._calls = deque(maxlen=window)
+        self._state = CLOSED
+        self._opened_at = None
+        self._probes_started = 0
+        self._probes_succeeded = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if (self._state == OPEN
+                and self.clock() - self._opened_at >= self.reset_timeout):
+            self._state = HALF_OPEN
+            self._probes_started = 0
+            self._probes_succeeded = 0
+        return self._state
+
+    def _open(self):
+        self._state = OPEN
+        self._opened_at = self.clock()
+        self._calls.clear()
+
+    def before_call(self):
+        """
+        Reserve permission for a call; raises `CircuitOpenError` to fail fast.
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return
+            if (state == HALF_OPEN
+                    and self._probes_started < self.half_open_calls):
+                self._probes_started += 1
+                return
+            if state == OPEN:
+                elapsed = self.clock() - self._opened_at
+                retry_after = self.reset_timeout - elapsed
+            else:
+                retry_after = 0.0
+            raise CircuitOpenError(self.name, max(retry_after, 0.0))
+
+    def record(self, duration, failed=False):
+        """
+        Record the outcome of a call allowed by `before_call`.
+        """
+        slow = (self.slow_call_duration is not None
+                and duration > self.slow_call_duration)
+        with self._lock:
+            state = self._current_state()
+            if state == HALF_OPEN:
+                if failed or slow:
+                    self._open()
+                else:
+                    self._probes_succeeded += 1
+                    if self._probes_succeeded >= self.half_open_calls:
+                        self._state = CLOSED
+                        self._calls.clear()
+                return
+            if state == OPEN:
+                # A call that started before the circuit opened.
+                return
+            self._calls.append((failed, slow))
+            n = len(self._calls)
+            if n < self.min_calls:
+                return
+            failures = sum(1 for f, _ in self._calls if f)
+            slow_calls = sum(1 for _, s in self._calls if s)
+            if failures / n >= self.failure_rate or (
+                    self.slow_call_duration is not None
+                    and slow_calls / n >= self.slow_call_rate):
+                self._open()
+
+
+class CircuitBreakerRegistry:
+    """
+    One `CircuitBreaker` per API action, created on first use.
+
+    Share a single registry between all the resources of a worker so that a
+    degraded action trips for everyone while other actions keep flowing.
+    Keyword arguments are passed on to each `CircuitBreaker`; `overrides`
+    maps an API action to settings specific to it.
+    """
+    def __init__(self, overrides=None, **settings):
+        self.settings = settings
+        self.overrides = overrides or {}
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, api_action):
+        breaker = self._breakers.get(api_action)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(api_action)
+                if breaker is None:
+                    settings = dict(self.settings)
+                    settings.update(self.overrides.get(api_action, {}))
+                    breaker = CircuitBreaker(name=api_action, **settings)
+                    self._breakers[api_action] = breaker
+        return breaker
+
+    def states(self):
+        return {name: b.state for name, b in self._breakers.items()}
@@ -1,32 +1,209 @@
 # -*- coding: utf-8 -*-
 
 """Console script for activecampaign_takehome."""
+import time
+# Taken before the other imports so that --profile can report their cost
+# (E402 is ignored in setup.cfg).
+_IMPORT_START = time.perf_counter()
+
+import os
 import sys
+import csv
+import json
+import pathlib
 import datetime
+from collections import OrderedDict
 from pprint import pformat
 
 import click
 from dateutil.parser import parse as date_parse
 
+from activecampaign_takehome import accounts
+from activecampaign_takehome import adaptive
 from activecampaign_takehome import activecampaign_takehome as act
+from activecampaign_takehome import export
+from activecampaign_takehome import importer
+from activecampaign_takehome import loadtest as lt
+from activecampaign_takehome import output
+from activecampaign_takehome import profiling
+from activecampaign_takehome import runner
+from activecampaign_takehome import sync
+from activecampaign_takehome import validation
+from activecampaign_takehome import workqueue
+from activecampaign_takehome.responses import Normalizer, iter_pages
+
+_IMPORT_SECONDS = time.perf_counter() - _IMPORT_START
 
 
 @click.group()
-def main(args=None):
+@click.option('--profile', is_flag=True,
+              help='Report the time spent in imports, config loading, '
+                   'schemas, HTTP and output on stderr.')
+@click.option('--profile-stats', type=click.Path(dir_okay=False),
+              help='Also write cProfile statistics (pstats) to this file; '
+                   'implies --profile.')
+@click.option('--profile-memory', is_flag=True,
+              help='Also report the tracemalloc peak memory; implies '
+                   '--profile.')
+@click.option('--format', 'output_format',
+              type=click.Choice(['pretty'] + output.FORMATS),
+              default='pretty', show_default=True,
+              help='Output of the get_* commands. Other than pretty, all '
+                   'pages are fetched and the records are streamed to stdout '
+                   'as they arrive.')
+@click.option('--progress/--no-progress', default=None,
+              help='Show live progress of imports, exports, syncs and bulk '
+                   'deletes on stderr (default: when stderr is a terminal).')
+@click.pass_context
+def main(ctx, profile, profile_stats, profile_memory, output_format, progress):
     """Console script for activecampaign_takehome."""
+    if profile or profile_stats or profile_memory:
+        profiler = profiling.Profiler(
+            stats_path=profile_stats, memory=profile_memory,
+            import_seconds=_IMPORT_SECONDS)
+        profiler.start()
+
+        def report():
+            profiler.stop()
+            click.echo(profiling.format_report(profiler.report()), err=True)
+        ctx.call_on_close(report)
+
+
+# Columns of `--format table` per command; the other formats include every
+# field.
+TABLE_COLUMNS = {
+    'contacts': ['id', 'email', 'first_name', 'last_name', 'sdate'],
+    'lists': ['id', 'name', 'stringid', 'subscribers'],
+    'messages': ['id', 'subject', 'fromemail', 'format'],
+    'campaigns': ['id', 'name', 'type', 'status', 'sdate'],
+    'jobs': ['job', 'kind', 'chunks', 'pending', 'leased', 'expired', 'done',
+             'failed', 'items_done', 'items_failed'],
+}
+
+
+def _output_format():
+    params = click.get_current_context().find_root().params
+    return params.get('output_format', 'pretty')
+
+
+def _progress(total=None, label='calls', limiter=None):
+    """
+    A `runner.Progress` on stderr, or None if `--no-progress` (or stderr is
+    not a terminal).
+    """
+    show = click.get_current_context().find_root().params.get('progress')
+    if show is None:
+        show = sys.stderr.isatty()
+    if not show:
+        return None
+
+    def status():
+        return 'limit {:.1f}'.format(limiter.limit)
+    return runner.Progress(total=total, label=label,
+                           status=status if limiter is not None else None)
+
+
+# Help of the --adaptive option of the commands making concurrent calls.
+ADAPTIVE_HELP = ('Adapt the calls in flight (AIMD) to latency and throttling, '
+                 'up to --workers.')
+
+
+def _limiter(adaptive_limit, workers):
+    """
+    An `adaptive.AdaptiveLimit` of at most `workers` calls in flight, or None.
+    """
+    if not adaptive_limit:
+        return None
+    return adaptive.AdaptiveLimit(initial=min(4, workers), max_limit=workers)
+
+
+def _report_limiter(limiter):
+    if limiter is not None:
+        click.echo('Concurrency limit {limit} (max {max_in_flight} in '
+                   'flight, {throttled} throttled, {errors} errors, {slow} '
+                   'slow, {decreases} decreases)'.format(**limiter.metrics()),
+                   err=True)
+
+
+def _exit_if_interrupted(run):
+    if run.interrupted:
+        click.echo('Interrupted: stopped before the end', err=True)
+        sys.exit(130)
+
+
+def _write_records(records, fmt, table, columns=None):
+    """
+    Stream `records` to stdout in `fmt`.
+    """
+    if columns is None and fmt == 'table':
+        columns = TABLE_COLUMNS[table]
+    try:
+        output.write_records(records, fmt, sys.stdout, columns=columns)
+    except BrokenPipeError:
+        # The reader went away (e.g. `| head`); stop quietly.
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        sys.exit(1)
 
 
 @main.command()
-def get_contacts():
+@click.option('--fields', default=None,
+              help='Comma separated contact fields to keep, e.g. '
+                   'id,email,name.')
+def get_contacts(fields):
     """
     List all contacts
     """
     config = act.Config()
     resource = act.ContactsResource(config)
-    json_data = resource.get()
+    fmt = _output_format()
+    if fields is not None:
+        fields = [f.strip() for f in fields.split(',') if f.strip()]
+    if fmt != 'pretty':
+        records = iter_pages(
+            resource.get, normalize=Normalizer(fields=fields, stream=True))
+        return _write_records(records, fmt, 'contacts', columns=fields)
+    json_data = resource.get(
+        normalize=Normalizer(fields=fields) if fields else False)
     click.echo(pformat(json_data))
 
 
+@main.command()
+@click.argument('output', type=click.Path(dir_okay=False, allow_dash=True))
+@click.option('-p', '--processes', type=int, default=None,
+              help='Worker processes (default: number of CPUs).')
+@click.option('--pages-per-shard', default=10, show_default=True,
+              help='contact_list pages per worker task.')
+@click.option('--full/--basic', default=True,
+              help='Include lists, actions, etc. (full=1).')
+def export_contacts(output, processes, pages_per_shard, full):
+    """
+    Export all contacts to a JSON lines file, parsing shards in parallel
+    processes.
+
+    Example:
+        activecampaign_takehome export_contacts contacts.jsonl --processes 8
+    """
+    config = act.Config()
+    progress = _progress(label='contacts')
+
+    def on_shard(shard):
+        progress.update(n=shard['records'])
+        progress.draw()
+    try:
+        report = export.export_contacts(
+            config, sys.stdout if output == '-' else output,
+            processes=processes, pages_per_shard=pages_per_shard,
+            full=int(full),
+            on_shard=on_shard if progress is not None else None)
+    finally:
+        if progress is not None:
+            progress.close()
+    click.echo('Exported {records} contacts ({pages} pages, {shards} shards, '
+               '{processes} processes) in {elapsed:.1f}s'.format(**report),
+               err=True)
+
+
 @main.command()
 @click.option('--email', prompt='Email address')
 @click.option('--first_name', prompt='First name')
@@ -50,6 +227,194 @@ def add_contact(email, first_name, last_name, list_id, tags):
     click.echo(pformat(json_data))
 
 
+@main.command()
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--known-export', type=click.Path(exists=True, dir_okay=False),
+              help='Contact export (JSON lines) listing emails already in '
+                   'the account.')
+@click.option('--known-index', type=click.Path(exists=True, dir_okay=False),
+              help='Email index saved by a previous run (--save-index).')
+@click.option('--scan-account', is_flag=True,
+              help='Build the email index by paging through contact_list.')
+@click.option('--save-index', type=click.Path(dir_okay=False),
+              help='Save the email index after the import.')
+@click.option('--skipped', type=click.Path(dir_okay=False),
+              help='Write skipped rows to this CSV file.')
+@click.option('-w', '--workers', default=1, show_default=True,
+              help='Concurrent contact_add calls.')
+@click.option('--adaptive', 'adaptive_limit', is_flag=True,
+              help=ADAPTIVE_HELP)
+def import_contacts(path, known_export, known_index, scan_account, save_index,
+                    skipped, workers, adaptive_limit):
+    """
+    Import contacts from a CSV file, skipping emails already in the account
+    or repeated in the file.
+
+    The CSV needs a header row with any of: email, first_name, last_name,
+    phone, ip4, tags, list_id. Multiple tags or list IDs are separated by
+    ',', ';' or '|'.
+    """
+    config = act.Config()
+    limiter = _limiter(adaptive_limit, workers)
+    resource = act.ContactsResource(config, limiter=limiter)
+    if known_index:
+        index = importer.EmailIndex.load(known_index)
+    else:
+        index = importer.EmailIndex()
+    if known_export:
+        index.update(importer.EmailIndex.from_export(known_export))
+    if scan_account:
+        index.update(importer.EmailIndex.from_account(resource))
+
+    skipped_file = open(skipped, 'w', newline='') if skipped else None
+    writer = None
+    if skipped_file is not None:
+        writer = csv.writer(skipped_file)
+        writer.writerow(['row', 'reason', 'email'])
+
+    def on_skip(row_number, contact, reason):
+        writer.writerow([row_number, reason, contact.get('email', '')])
+    try:
+        progress = _progress(label='contact_add calls', limiter=limiter)
+        with runner.Runner(progress) as run:
+            report = importer.import_contacts(
+                resource, importer.read_contacts_csv(path), index=index,
+                on_skip=on_skip if writer is not None else None,
+                max_workers=workers, imap=run.imap)
+    finally:
+        if skipped_file is not None:
+            skipped_file.close()
+    if save_index:
+        index.save(save_index)
+    click.echo(repr(report))
+    for row_number, email, message in report.failures:
+        click.echo('row {}: {}: {}'.format(row_number, email, message),
+                   err=True)
+    _report_limiter(limiter)
+    _exit_if_interrupted(run)
+
+
+@main.command()
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--clean', 'clean_output', required=True,
+              type=click.Path(dir_okay=False),
+              help='Write the header and the valid rows to this CSV file.')
+@click.option('--errors', 'errors_output', required=True,
+              type=click.Path(dir_okay=False),
+              help='Write one line per error (row, field, message, email) to '
+                   'this CSV file.')
+@click.option('-p', '--processes', type=int, default=None,
+              help='Worker processes (default: number of CPUs).')
+@click.option('--chunk-size', default=10000, show_default=True,
+              help='Rows per worker task.')
+def validate_import(path, clean_output, errors_output, processes, chunk_size):
+    """
+    Check a contact CSV file before importing it, without calling the API.
+
+    Uses the same CSV layout as `import_contacts`. Rows are validated in
+    parallel processes; exits with status 1 if any row is invalid.
+
+    Example:
+
+    \b
+        activecampaign_takehome validate_import contacts.csv \\
+            --clean clean.csv --errors errors.csv
+    """
+    try:
+        report = validation.validate_import(
+            path, clean_output, errors_output, processes=processes,
+            chunk_size=chunk_size)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    click.echo('{rows} rows: {valid} valid, {invalid} invalid ({errors} '
+               'errors) in {elapsed:.1f}s with {processes} '
+               'processes'.format(**report), err=True)
+    for field, count in report['errors_by_field'].items():
+        click.echo('  {}: {}'.format(field, count), err=True)
+    if report['invalid']:
+        sys.exit(1)
+
+
+@main.command()
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--snapshot', required=True, type=click.Path(dir_okay=False),
+              help='SQLite snapshot of the previous sync (created if '
+                   'missing).')
+@click.option('--seed-export', type=click.Path(exists=True, dir_okay=False),
+              help='Seed the snapshot with contact IDs from a JSON lines '
+                   'export first.')
+@click.option('-w', '--workers', default=1, show_default=True,
+              help='Concurrent API calls.')
+@click.option('--adaptive', 'adaptive_limit', is_flag=True,
+              help=ADAPTIVE_HELP)
+@click.option('--dry-run', is_flag=True,
+              help='Only report what would be sent.')
+def sync_contacts(path, snapshot, seed_export, workers, adaptive_limit,
+                  dry_run):
+    """
+    Upsert contacts from a CSV file, sending only new or changed ones.
+
+    Uses the same CSV layout as `import_contacts`.
+    """
+    config = act.Config()
+    limiter = _limiter(adaptive_limit, workers)
+    resource = act.ContactsResource(config, limiter=limiter)
+    store = sync.ContactSnapshot(snapshot)
+    try:
+        if seed_export:
+            seeded = store.seed_from_export(seed_export)
+            click.echo('Seeded {} contacts'.format(seeded), err=True)
+        with runner.Runner(_progress(limiter=limiter)) as run:
+            report = sync.upsert_contacts(
+                resource, importer.read_contacts_csv(path), store,
+                max_workers=workers, dry_run=dry_run, imap=run.imap)
+    finally:
+        store.close()
+    click.echo(repr(report))
+    for row_number, email, message in report.failures:
+        click.echo('row {}: {}: {}'.format(row_number, email, message),
+                   err=True)
+    _report_limiter(limiter)
+    _exit_if_interrupted(run)
+
+
+@main.command()
+@click.option('--export', 'export_path',
+              type=click.Path(exists=True, dir_okay=False),
+              help='Read contacts from a JSON lines export instead of paging '
+                   'through contact_list.')
+@click.option('--freq', type=click.Choice(['D', 'W', 'M', 'Y']), default='M',
+              show_default=True,
+              help='Signup histogram period: day, week, month or year.')
+@click.option('--top', default=10, show_default=True,
+              help='Number of email domains to show.')
+@click.option('--json', 'as_json', is_flag=True,
+              help='Print the statistics as JSON.')
+def contact_stats(export_path, freq, top, as_json):
+    """
+    Per-list bounce rates, email domains, send counts and signup dates
+    (needs NumPy).
+
+    Example:
+        activecampaign_takehome contact_stats --export contacts.jsonl --freq Y
+    """
+    # Imported here so that other commands do not load NumPy.
+    from activecampaign_takehome import stats
+    try:
+        if export_path:
+            columns = stats.ContactColumns.from_export(export_path)
+        else:
+            resource = act.ContactsResource(act.Config())
+            columns = stats.ContactColumns.from_account(resource)
+    except ImportError as e:
+        raise click.ClickException(str(e))
+    result = stats.contact_stats(columns, freq=freq, top=top)
+    if as_json:
+        click.echo(json.dumps(result, indent=2))
+    else:
+        click.echo(stats.format_stats(result, freq=freq))
+
+
 @main.command()
 def get_lists():
     """
@@ -57,6 +422,10 @@ def get_lists():
     """
     config = act.Config()
     resource = act.ListResource(config)
+    fmt = _output_format()
+    if fmt != 'pretty':
+        records = resource.get(full='1', normalize=Normalizer(stream=True))
+        return _write_records(records, fmt, 'lists')
     json_data = resource.get(full='1')
     click.echo(pformat(json_data))
 
@@ -66,10 +435,22 @@ def get_lists():
 @click.option('--page', default=None, type=int)
 def get_messages(ids, page):
     """
-    Get many messages. (Note: This method does not seem to currently work. Use `view_message` instead.)
+    Get many messages.
+
+    If `message_list` returns nothing for the given --ids, the messages are
+    fetched concurrently with `message_view`.
     """
     config = act.Config()
     resource = act.MessageResource(config)
+    fmt = _output_format()
+    if fmt != 'pretty':
+        if page is None:
+            records = iter_pages(resource.get_many,
+                                 normalize=Normalizer(stream=True), ids=ids)
+        else:
+            records = resource.get_many(ids=ids, page=page,
+                                        normalize=Normalizer(stream=True))
+        return _write_records(records, fmt, 'messages')
     json_data = resource.get_many(ids=ids, page=page)
     click.echo(pformat(json_data))
 
@@ -93,14 +474,23 @@ def view_message(id):
 @click.option('--reply2', prompt='Reply-To address')
 @click.option('--priority', prompt='Priority')
 @click.option('--list_id', prompt='List ID')
-@click.option('--text', prompt='Text body')
-def create_message(subject, fromemail, fromname, reply2, priority, list_id, text):
+@click.option('--text', default=None, help='Text body.')
+@click.option('--text-file', type=click.Path(exists=True, dir_okay=False),
+              default=None,
+              help='Read the text body from this file; it is streamed, not '
+                   'loaded into memory.')
+def create_message(subject, fromemail, fromname, reply2, priority, list_id,
+                   text, text_file):
     """
     Create a text message
 
     Example:
         activecampaign_takehome create_message --subject 'Test Message' --fromemail 'sender@example.com' --fromname 'Test Sender 1' --reply2 'receiver@example.com' --priority 5 --list_id 1 --text 'This is a test message'
     """
+    if text_file is not None:
+        text = pathlib.Path(text_file)
+    elif text is None:
+        text = click.prompt('Text body')
     config = act.Config()
     resource = act.MessageResource(config)
     data = {
@@ -130,6 +520,63 @@ def delete_message(id):
     click.echo(pformat(json_data))
 
 
+# Resources of the `delete_many` command.
+DELETABLE = OrderedDict([
+    ('contacts', act.ContactsResource),
+    ('messages', act.MessageResource),
+    ('addresses', act.AddressResource),
+])
+
+
+@main.command()
+@click.argument('resource', type=click.Choice(list(DELETABLE)))
+@click.argument('ids', nargs=-1)
+@click.option('--ids-file', type=click.File('r'), default=None,
+              help='Read IDs from this file, one per line.')
+@click.option('-w', '--workers', default=8, show_default=True,
+              help='Concurrent API calls.')
+@click.option('--adaptive', 'adaptive_limit', is_flag=True,
+              help=ADAPTIVE_HELP)
+@click.option('--dry-run', is_flag=True,
+              help='Only report what would be deleted.')
+def delete_many(resource, ids, ids_file, workers, adaptive_limit, dry_run):
+    """
+    Delete many contacts, messages or addresses by ID.
+
+    IDs are deleted in batches with the list-delete actions; the IDs of a
+    failed batch one call per ID. Prints the counts and throughput; exits
+    with status 1 if any ID could not be deleted. Ctrl-C lets the calls in
+    flight finish and reports them.
+
+    Example:
+        activecampaign_takehome delete_many contacts 12 13 14 --dry-run
+    """
+    ids = list(ids)
+    if ids_file is not None:
+        ids.extend(line.strip() for line in ids_file if line.strip())
+    if not ids:
+        raise click.UsageError('No IDs given')
+    config = act.Config()
+    limiter = _limiter(adaptive_limit, workers)
+    resource = DELETABLE[resource](config, limiter=limiter)
+    if dry_run:
+        report = resource.delete_many(ids, dry_run=True)
+    else:
+        planned = resource.delete_many(ids, dry_run=True).calls
+        with runner.Runner(_progress(total=planned, limiter=limiter)) as run:
+            report = resource.delete_many(ids, max_workers=workers,
+                                          imap=run.imap)
+    click.echo(repr(report))
+    failures = report.failures()
+    for _id, message in failures:
+        click.echo('{}: {}'.format(_id, message), err=True)
+    _report_limiter(limiter)
+    if not dry_run:
+        _exit_if_interrupted(run)
+    if failures:
+        sys.exit(1)
+
+
 
 @main.command()
 @click.option('--name', prompt='Campaign name', default='Test Campaign 2')
@@ -201,5 +648,255 @@ def get_campaigns(ids):
     """
     config = act.Config()
     resource = act.CampaignResource(config)
+    fmt = _output_format()
+    if fmt != 'pretty':
+        records = iter_pages(resource.get, normalize=Normalizer(stream=True),
+                             ids=ids)
+        return _write_records(records, fmt, 'campaigns')
     json_data = resource.get(ids)
     click.echo(pformat(json_data))
+
+
+@main.command()
+@click.argument('operation', type=click.Choice(list(accounts.OPERATIONS)))
+@click.option('--profiles-file', type=click.Path(dir_okay=False),
+              default=None,
+              help='Account profiles (default: $AC_PROFILES or '
+                   '~/.activecampaign/profiles.ini).')
+@click.option('-a', '--account', 'names', multiple=True,
+              help='Profile to query (repeatable; default: all).')
+def fan_out(operation, profiles_file, names):
+    """
+    Fetch contacts, lists, messages or campaigns from several accounts at
+    once.
+
+    Every record is tagged with its account. Exits with status 1 if any
+    account failed.
+
+    Example:
+        activecampaign_takehome fan_out campaigns -a acme-eu -a acme-us
+    """
+    try:
+        with accounts.Accounts.from_file(profiles_file) as accts:
+            results = accts.fan_out(accounts.OPERATIONS[operation],
+                                    names=names)
+    except (act.ConfigurationError, KeyError) as e:
+        raise click.UsageError(str(e).strip("'"))
+    fmt = _output_format()
+    if fmt == 'pretty':
+        click.echo(pformat(OrderedDict(
+            (r.account, r.result) for r in results if r.ok)))
+    else:
+        columns = None
+        if fmt == 'table':
+            columns = ['account'] + TABLE_COLUMNS[operation]
+        _write_records(accounts.merge(results), fmt, operation,
+                       columns=columns)
+    failed = [r for r in results if not r.ok]
+    for result in failed:
+        click.echo('{}: {}: {}'.format(
+            result.account, type(result.error).__name__, result.error),
+            err=True)
+    if failed:
+        sys.exit(1)
+
+
+@main.command()
+@click.argument('kind', type=click.Choice(list(workqueue.HANDLERS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--queue', 'queue_path', required=True,
+              type=click.Path(dir_okay=False),
+              help='SQLite work queue shared by the workers (created if '
+                   'missing).')
+@click.option('--chunk-size', default=500, show_default=True,
+              help='Items per chunk.')
+@click.option('--campaign-id', default=None, help='send: campaign to send.')
+@click.option('--message-id', default=None,
+              help='send: message of the campaign.')
+@click.option('-t', '--type', '_type', default='mime', show_default=True,
+              help='send: message type.')
+@click.option('--action', default='send', show_default=True,
+              help='send: send, copy or test.')
+@click.option('--resource', type=click.Choice(list(DELETABLE)), default=None,
+              help='delete: what the IDs are.')
+def submit_job(kind, path, queue_path, chunk_size, campaign_id, message_id,
+               _type, action, resource):
+    """
+    Split an import, send or delete job into chunks for `worker` processes.
+
+    PATH is a contact CSV for import (same layout as `import_contacts`), and
+    a file with one email (send) or ID (delete) per line otherwise. Prints
+    the job ID.
+
+    Example:
+
+    \b
+        activecampaign_takehome submit_job send emails.txt --queue jobs.db \\
+            --campaign-id 4 --message-id 7
+    """
+    params = {}
+    if kind == 'import':
+        items = workqueue.import_items(path)
+    else:
+        items = workqueue.read_lines(path)
+    if kind == 'send':
+        if not (campaign_id and message_id):
+            raise click.UsageError('send needs --campaign-id and --message-id')
+        params = {
+            'campaign_id': campaign_id,
+            'message_id': message_id,
+            'type': _type,
+            'action': action,
+        }
+    if kind == 'delete':
+        if resource is None:
+            raise click.UsageError('delete needs --resource')
+        params = {'resource': resource}
+    with workqueue.WorkQueue(queue_path) as queue:
+        job_id = queue.submit(kind, items, params=params,
+                              chunk_size=chunk_size)
+        status = queue.status(job_id)[0]
+    click.echo(job_id)
+    click.echo('Job {job}: {items} items in {chunks} chunks'.format(**status),
+               err=True)
+
+
+@main.command()
+@click.option('--queue', 'queue_path', required=True,
+              type=click.Path(exists=True, dir_okay=False),
+              help='SQLite work queue written by `submit_job`.')
+@click.option('-w', '--workers', default=4, show_default=True,
+              help='Concurrent API calls within a chunk.')
+@click.option('--adaptive', 'adaptive_limit', is_flag=True,
+              help=ADAPTIVE_HELP)
+@click.option('--lease', default=300.0, show_default=True,
+              help='Seconds before a silent worker loses its chunk.')
+@click.option('--timeout', type=float, default=None,
+              help='Seconds before an API call is abandoned; must be under '
+                   '--lease (default: a third of it).')
+@click.option('--max-attempts', default=3, show_default=True,
+              help='Claims of a chunk before it fails.')
+@click.option('--name', default=None,
+              help='Worker name in the queue (default: host:pid).')
+@click.option('--forever', is_flag=True,
+              help='Keep polling for new chunks instead of exiting when none '
+                   'is left.')
+def worker(queue_path, workers, adaptive_limit, lease, timeout, max_attempts,
+           name, forever):
+    """
+    Run chunks of the jobs in a work queue.
+
+    Start any number of workers, on this host or on others sharing the queue
+    file. Chunks whose worker stops renewing its lease are retried by the
+    others.
+
+    Example:
+        activecampaign_takehome worker --queue /shared/jobs.db -w 8
+    """
+    if timeout is None:
+        timeout = lease / 3
+    elif timeout >= lease:
+        raise click.BadParameter('must be shorter than --lease',
+                                 param_hint='--timeout')
+    limiter = _limiter(adaptive_limit, workers)
+    with workqueue.WorkQueue(queue_path, lease_seconds=lease,
+                             max_attempts=max_attempts) as queue:
+        with act.Client(act.Config(), timeout=timeout,
+                        limiter=limiter) as client:
+            node = workqueue.Worker(queue, client, name=name,
+                                    max_workers=workers,
+                                    heartbeat_interval=max(lease / 10, 1))
+            counts = node.run(until_empty=not forever)
+    click.echo('{}: {chunks} chunks, {items_done} items done, {items_failed} '
+               'failed, {errors} errors, {lost} lost '
+               'leases'.format(node.name, **counts), err=True)
+    _report_limiter(limiter)
+
+
+@main.command()
+@click.option('--queue', 'queue_path', required=True,
+              type=click.Path(exists=True, dir_okay=False))
+@click.option('--job', 'job_id', type=int, default=None,
+              help='Show this job only, with its failures.')
+def queue_status(queue_path, job_id):
+    """
+    Progress of the jobs in a work queue.
+    """
+    fmt = _output_format()
+    with workqueue.WorkQueue(queue_path) as queue:
+        _write_records(queue.status(job_id),
+                       'table' if fmt == 'pretty' else fmt, 'jobs')
+        if job_id is not None:
+            for item, message in queue.failures(job_id):
+                click.echo('{}: {}'.format(item, message), err=True)
+
+
+@main.command()
+@click.option('--mix',
+              default='contact_list=70,contact_add=20,campaign_send=10',
+              show_default=True,
+              help='Comma-separated operation=weight pairs. Operations: '
+                   '{}.'.format(', '.join(lt.OPERATIONS)))
+@click.option('-u', '--users', default=10, show_default=True,
+              help='Concurrent virtual users.')
+@click.option('-d', '--duration', type=float, default=None,
+              help='Run for this many seconds.')
+@click.option('-n', '--requests', 'total_requests', type=int, default=None,
+              help='Stop after this many requests.')
+@click.option('--email', default=None,
+              help='Recipient for campaign_send (sent with action=test).')
+@click.option('--campaign-id', default='1', show_default=True)
+@click.option('--message-id', default='1', show_default=True)
+@click.option('--list-id', default='1', show_default=True,
+              help='List for contact_add.')
+@click.option('--pages', default=1, show_default=True,
+              help='contact_list reads a random page in 1..PAGES.')
+@click.option('--stub', is_flag=True,
+              help='Run against a local stub server instead of the '
+                   'configured account.')
+@click.option('--json', 'as_json', is_flag=True,
+              help='Print the report as JSON.')
+def loadtest(mix, users, duration, total_requests, email, campaign_id,
+             message_id, list_id, pages, stub, as_json):
+    """
+    Drive a weighted mix of API operations with concurrent virtual users.
+
+    Example:
+
+    \b
+        activecampaign_takehome loadtest \\
+            --mix contact_list=70,contact_add=20,campaign_send=10 \\
+            --users 20 --duration 60 --email qa@example.com
+    """
+    if duration is None and total_requests is None:
+        raise click.UsageError('Pass --duration, --requests, or both.')
+    options = {
+        'email': email,
+        'campaign_id': campaign_id,
+        'message_id': message_id,
+        'list_id': list_id,
+        'pages': pages,
+    }
+    server = None
+    if stub:
+        # Imported here: the stub server needs Python 3.7+
+        # (ThreadingHTTPServer).
+        from activecampaign_takehome.stubserver import StubBackend, StubServer
+        server = StubServer(StubBackend(contacts=20 * pages)).start()
+        config = server.config()
+        options['email'] = email or 'loadtest@example.com'
+    else:
+        config = act.Config()
+    try:
+        test = lt.LoadTest(config, mix, users=users, duration=duration,
+                           requests=total_requests, options=options)
+        report = test.run()
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    finally:
+        if server is not None:
+            server.stop()
+    if as_json:
+        click.echo(json.dumps(report, indent=2))
+    else:
+        click.echo(lt.format_report(report))
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+
+"""
+Helpers for running API calls concurrently.
+"""
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+def imap_bounded(fn, items, max_workers=1):
+    """
+    Call `fn(item)` from a thread pool; yield `(item, future)` as calls finish.
+
+    At most `max_workers` calls are in flight, and `items` is consumed lazily,
+    so long (or endless) iterables do not pile up in memory. Exceptions are
+    left on the futures for the caller to inspect.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {}
+        for item in items:
+            if len(pending) >= max_workers:
+                done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future
+            pending[executor.submit(fn, item)] = item
+        while pending:
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future
+
+
+def outcome(future):
+    """
+    Interpret a finished future holding an API call result.
+
+    Returns `(ok, result, message)`: `ok` is set when the call returned a
+    payload with `result_code` 1; `message` is the API's `result_message`,
+    or the exception raised by the call.
+    """
+    try:
+        result = future.result()
+    except Exception as e:
+        return False, None, '{}: {}'.format(type(e).__name__, e)
+    if not isinstance(result, dict):
+        return False, result, 'Unexpected response: {!r}'.format(result)
+    ok = str(result.get('result_code')) == '1'
+    return ok, result, result.get('result_message')
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+"""
+Sharded full-account contact export.
+
+The account is split into shards of consecutive `contact_list` pages. Each
+shard is fetched, parsed through `ContactResponseSchema` and written to its
+own JSON lines file by a worker process, so parsing scales with the number
+of cores. The parent keeps the pool busy until a shard runs past the last
+page, then concatenates the shard files in page order.
+
+Only "Nothing is returned" ends the account; other failed pages are retried
+and then raise `responses.ApiResultError`, so an export is never silently
+cut short.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from activecampaign_takehome import activecampaign_takehome as act
+from activecampaign_takehome import schemas
+from activecampaign_takehome.responses import ApiResultError, checked
+
+
+def fetch_page(resource, page, full=1, retries=2, retry_delay=1.0):
+    """
+    Contacts of `page`, retrying failed calls `retries` times (doubling the
+    delay each time).
+
+    Raises `ApiResultError` if the page still fails; a page past the end is
+    an empty list.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return checked(resource.get(full=full, page=page, normalize=True))
+        except ApiResultError:
+            if attempt == retries:
+                raise
+        time.sleep(retry_delay * 2 ** attempt)
+
+
+def export_shard(config, first_page, last_page, path, full=1, timeout=None,
+                 retries=2, retry_delay=1.0):
+    """
+    Fetch pages `first_page`..`last_page`; write the parsed contacts to `path`.
+
+    Runs in a worker process. Returns a dict with the shard's record and
+    page counts and whether it ran past the last page of the account.
+    Failed pages are retried, see `fetch_page`.
+    """
+    resource = act.ContactsResource(config, timeout=timeout)
+    schema = schemas.ContactResponseSchema()
+    records = 0
+    pages = 0
+    exhausted = False
+    with open(path, 'w') as f:
+        for page in range(first_page, last_page + 1):
+            contacts = fetch_page(resource, page, full=full, retries=retries,
+                                  retry_delay=retry_delay)
+            if not contacts:
+                exhausted = True
+                break
+            pages += 1
+            for contact in contacts:
+                loaded = schema.load(contact).data
+                f.write(json.dumps(schema.dump(loaded).data))
+                f.write('\n')
+            records += len(contacts)
+    return {'path': path, 'first_page': first_page, 'records': records,
+            'pages': pages, 'exhausted': exhausted}
+
+
+def export_contacts(config, output, processes=None, pages_per_shard=10, full=1,
+                    timeout=None, tmpdir=None, on_shard=None, retries=2,
+                    retry_delay=1.0):
+    """
+    Export every contact of the account to `output` as JSON lines.
+
+    Parameters
+    ----------
+    config:
+        Account configuration; must be picklable.
+    output:
+        Path or writable text file object.
+    processes:
+        Worker processes. Defaults to the number of CPUs.
+    pages_per_shard:
+        Consecutive `contact_list` pages fetched by one worker task.
+    full:
+        Passed on to `contact_list`; 1 includes lists, actions, etc.
+    tmpdir:
+        Directory for the shard files. Defaults to the system temp dir.
+    on_shard:
+        Called with the result of every finished shard (a dict with
+        `records` and `pages`), e.g. to show progress.
+    retries, retry_delay:
+        Retries of a failed page and the delay before the first one; a page
+        failing every time raises `ApiResultError`.
+
+    Returns
+    -------
+    dict
+        Record, page and shard counts, and elapsed seconds.
+    """
+    processes = processes or os.cpu_count() or 1
+    start = time.perf_counter()
+    results = {}
+    last_shard = None
+    with tempfile.TemporaryDirectory(prefix='ac-export-',
+                                     dir=tmpdir) as shard_dir, \
+            ProcessPoolExecutor(max_workers=processes) as pool:
+        pending = {}
+        next_shard = 0
+        while pending or last_shard is None:
+            # Keep two shards per worker in flight until the account ends.
+            while last_shard is None and len(pending) < processes * 2:
+                first_page = next_shard * pages_per_shard + 1
+                path = os.path.join(shard_dir,
+                                    'shard-{:06d}.jsonl'.format(next_shard))
+                last_page = first_page + pages_per_shard - 1
+                future = pool.submit(
+                    export_shard, config, first_page, last_page, path,
+                    full=full, timeout=timeout, retries=retries,
+                    retry_delay=retry_delay)
+                pending[future] = next_shard
+                next_shard += 1
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                result = future.result()
+                results[index] = result
+                if on_shard is not None:
+                    on_shard(result)
+                if result['exhausted'] and (last_shard is None
+                                            or index < last_shard):
+                    last_shard = index
+
+        shards = [results[i] for i in sorted(results) if i <= last_shard]
+        if hasattr(output, 'write'):
+            _merge(shards, output)
+        else:
+            with open(output, 'w') as f:
+                _merge(shards, f)
+    return {
+        'records': sum(s['records'] for s in shards),
+        'pages': sum(s['pages'] for s in shards),
+        'shards': sum(1 for s in shards if s['pages']),
+        'processes': processes,
+        'elapsed': time.perf_counter() - start,
+    }
+
+
+def _merge(shards, f):
+    for shard in shards:
+        with open(shard['path'], 'r') as shard_file:
+            shutil.copyfileobj(shard_file, f)
@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+
+"""
+Bulk contact import with local duplicate suppression.
+
+Rows are checked against an `EmailIndex` of emails already in the account
+(built from a contact export or by paging through `contact_list`) and
+against the emails seen earlier in the same run. Known and repeated emails
+are dropped, or routed to a callback, before any `contact_add` call.
+"""
+
+import csv
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+
+from activecampaign_takehome.concurrency import imap_bounded, outcome
+from activecampaign_takehome.responses import Normalizer, iter_pages
+
+
+CSV_FIELDS = ['email', 'first_name', 'last_name', 'phone', 'ip4', 'tags',
+              'list_id']
+
+
+def normalize_email(email):
+    return (email or '').strip().lower()
+
+
+def _split(value):
+    return [v.strip() for v in re.split(r'[,;|]', value or '') if v.strip()]
+
+
+def row_to_contact(row):
+    """
+    Convert a CSV row into the dict expected by `ContactsResource.create`.
+
+    `tags` and `list_id` hold several values separated by ',', ';' or '|'.
+    """
+    contact = {k: row[k].strip()
+               for k in ['email', 'first_name', 'last_name', 'phone', 'ip4']
+               if row.get(k)}
+    if row.get('tags'):
+        contact['tags'] = _split(row['tags'])
+    contact['list_id'] = _split(row.get('list_id'))
+    return contact
+
+
+def read_contacts_csv(path):
+    """
+    Yield contacts from a CSV file with a header row (see `CSV_FIELDS`).
+    """
+    with open(path, 'r', newline='') as f:
+        for row in csv.DictReader(f):
+            yield row_to_contact(row)
+
+
+def _digest(email):
+    return hashlib.blake2b(normalize_email(email).encode('utf-8'),
+                           digest_size=8).digest()
+
+
+class EmailIndex:
+    """
+    Set of known emails, kept as 8 byte blake2b digests of the normalized
+    emails (about 80 bytes per email in memory, 8 on disk).
+
+    Emails are compared case-insensitively.
+    """
+    def __init__(self):
+        self.digests = set()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.digests)
+
+    def add(self, email):
+        digest = _digest(email)
+        with self.lock:
+            self.digests.add(digest)
+
+    def add_new(self, email):
+        """
+        Add `email`; return False if it was already present.
+        """
+        digest = _digest(email)
+        with self.lock:
+            if digest in self.digests:
+                return False
+            self.digests.add(digest)
+            return True
+
+    def update(self, other):
+        """
+        Add every email of another `EmailIndex`.
+        """
+        with self.lock:
+            self.digests.update(other.digests)
+
+    def __contains__(self, email):
+        return _digest(email) in self.digests
+
+    def save(self, path):
+        """
+        Write the digests to `path` (8 bytes per email).
+        """
+        with open(path, 'wb') as f:
+            for digest in sorted(self.digests):
+                f.write(digest)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        index = cls()
+        index.digests.update(data[i:i + 8] for i in range(0, len(data), 8))
+        return index
+
+    @classmethod
+    def from_emails(cls, emails):
+        index = cls()
+        for email in emails:
+            if email:
+                index.add(email)
+        return index
+
+    @classmethod
+    def from_export(cls, path):
+        """
+        Build an index from a JSON lines export (see `export.export_contacts`).
+        """
+        def emails():
+            with open(path, 'r') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    details = record.get('contact_details') or {}
+                    yield details.get('email') or record.get('email')
+        return cls.from_emails(emails())
+
+    @classmethod
+    def from_account(cls, resource):
+        """
+        Build an index by paging `contact_list` with a `ContactsResource`.
+        """
+        normalizer = Normalizer(fields=['email'], stream=True)
+        records = iter_pages(resource.get, normalize=normalizer, full=0)
+        return cls.from_emails(record['email'] for record in records)
+
+
+SKIP_KNOWN = 'known'
+SKIP_DUPLICATE = 'duplicate'
+SKIP_INVALID = 'invalid'
+
+
+class ImportReport:
+    """
+    Outcome counts of an import run.
+    """
+    def __init__(self):
+        self.rows = 0
+        self.submitted = 0
+        self.created = 0
+        self.failed = 0
+        self.skipped = OrderedDict([(SKIP_KNOWN, 0), (SKIP_DUPLICATE, 0),
+                                    (SKIP_INVALID, 0)])
+        self.failures = []
+
+    @property
+    def calls_avoided(self):
+        """contact_add calls not made as the email was known or repeated."""
+        return self.skipped[SKIP_KNOWN] + self.skipped[SKIP_DUPLICATE]
+
+    def as_dict(self):
+        return OrderedDict([
+            ('rows', self.rows),
+            ('submitted', self.submitted),
+            ('created', self.created),
+            ('failed', self.failed),
+            ('skipped_known', self.skipped[SKIP_KNOWN]),
+            ('skipped_duplicate', self.skipped[SKIP_DUPLICATE]),
+            ('skipped_invalid', self.skipped[SKIP_INVALID]),
+            ('calls_avoided', self.calls_avoided),
+        ])
+
+    def __repr__(self):
+        return "\n".join("{}: {}".format(k, v)
+                         for k, v in self.as_dict().items())
+
+
+def import_contacts(resource, contacts, index=None, on_skip=None,
+                    max_workers=1, imap=imap_bounded):
+    """
+    Create contacts, skipping emails in `index` or seen earlier in the run.
+
+    Parameters
+    ----------
+    resource:
+        `ContactsResource` used for `contact_add`.
+    contacts:
+        Iterable of contact dicts (see `row_to_contact`).
+    index:
+        `EmailIndex` of emails already in the account. Created emails are
+        added to it.
+    on_skip:
+        Called as `on_skip(row_number, contact, reason)` for every skipped
+        row, with reason 'known', 'duplicate' or 'invalid'.
+    max_workers:
+        Concurrent `contact_add` calls.
+    imap:
+        Runs the calls; `concurrency.imap_bounded` or `runner.Runner.imap`.
+
+    Returns
+    -------
+    ImportReport
+    """
+    report = ImportReport()
+    seen = EmailIndex()
+
+    def skip(row_number, contact, reason):
+        report.skipped[reason] += 1
+        if on_skip is not None:
+            on_skip(row_number, contact, reason)
+
+    def to_submit():
+        for row_number, contact in enumerate(contacts, 1):
+            report.rows += 1
+            email = normalize_email(contact.get('email'))
+            if '@' not in email:
+                skip(row_number, contact, SKIP_INVALID)
+            elif index is not None and email in index:
+                skip(row_number, contact, SKIP_KNOWN)
+            elif not seen.add_new(email):
+                skip(row_number, contact, SKIP_DUPLICATE)
+            else:
+                report.submitted += 1
+                yield row_number, contact
+
+    def create(item):
+        return resource.create(item[1])
+
+    for (row_number, contact), future in imap(create, to_submit(),
+                                              max_workers=max_workers):
+        ok, result, message = outcome(future)
+        if ok:
+            report.created += 1
+            if index is not None:
+                index.add(contact['email'])
+        else:
+            report.failed += 1
+            report.failures.append((row_number, contact.get('email'), message))
+    report.failures.sort()
+    return report
@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+
+"""
+Load generator driving a weighted mix of resource operations.
+
+Each virtual user is a thread that repeatedly picks an operation from the
+mix, calls it through the resource classes and records its latency and
+outcome, until the run reaches its duration or request budget.
+"""
+
+import random
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+
+from activecampaign_takehome import activecampaign_takehome as act
+
+
+def op_contact_list(resources, options, rng):
+    page = rng.randint(1, options.get('pages', 1))
+    return resources['contacts'].get(page=page)
+
+
+def op_contact_add(resources, options, rng):
+    domain = options.get('email_domain', 'example.com')
+    return resources['contacts'].create({
+        'email': 'loadtest+{}@{}'.format(uuid.uuid4().hex, domain),
+        'first_name': 'Load',
+        'last_name': 'Test',
+        'list_id': [options.get('list_id', '1')],
+    })
+
+
+def op_list_list(resources, options, rng):
+    return resources['lists'].get()
+
+
+def op_campaign_list(resources, options, rng):
+    return resources['campaigns'].get(ids=options.get('campaign_id', '1'))
+
+
+def op_campaign_send(resources, options, rng):
+    return resources['campaigns'].send(
+        options['email'], options.get('campaign_id', '1'),
+        options.get('message_id', '1'), 'text', 'test')
+
+
+def op_message_view(resources, options, rng):
+    return resources['messages'].get_one(options.get('message_id', '1'))
+
+
+OPERATIONS = OrderedDict([
+    ('contact_list', op_contact_list),
+    ('contact_add', op_contact_add),
+    ('list_list', op_list_list),
+    ('campaign_list', op_campaign_list),
+    ('campaign_send', op_campaign_send),
+    ('message_view', op_message_view),
+])
+
+
+def parse_mix(mix):
+    """
+    Parse an operation mix such as 'contact_list=70,contact_add=20'.
+
+    Weights are relative and need not sum to 100.
+    """
+    result = OrderedDict()
+    for item in mix.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError("Unknown operation '{}'. Choose from: {}".format(
+                name, ', '.join(OPERATIONS)))
+        try:
+            weight = float(weight) if weight else 1.0
+        except ValueError:
+            raise ValueError("Bad weight for operation '{}': {}".format(
+                name, weight))
+        if weight < 0:
+            raise ValueError("Weight for operation '{}' must not be negative"
+                             .format(name))
+        result[name] = weight
+    if not result or not sum(result.values()):
+        raise ValueError('The operation mix must contain at least one '
+                         'positive weight')
+    return result
+
+
+def percentile(sorted_values, pct):
+    """
+    Linear-interpolated percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * pct / 100.0
+    lower = int(k)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    low, high = sorted_values[lower], sorted_values[upper]
+    return low + (high - low) * (k - lower)
+
+
+class ActionStats:
+    """
+    Latencies and outcomes recorded for one operation.
+    """
+    percentiles = [50, 90, 95, 99]
+
+    def __init__(self):
+        self.latencies = []
+        self.errors = Counter()
+
+    def record(self, latency, error=None):
+        self.latencies.append(latency)
+        if error is not None:
+            self.errors[error] += 1
+
+    def merge(self, other):
+        self.latencies.extend(other.latencies)
+        self.errors.update(other.errors)
+
+    def summary(self, elapsed):
+        latencies = sorted(self.latencies)
+        count = len(latencies)
+        summary = OrderedDict([
+            ('requests', count),
+            ('errors', sum(self.errors.values())),
+            ('throughput', count / elapsed if elapsed else 0.0),
+            ('mean', sum(latencies) / count if count else None),
+            ('max', latencies[-1] if count else None),
+        ])
+        for pct in self.percentiles:
+            summary['p{}'.format(pct)] = percentile(latencies, pct)
+        summary['error_breakdown'] = dict(self.errors)
+        return summary
+
+
+def classify_result(result):
+    """
+    Return an error label for a failed call, or None on success.
+    """
+    if not isinstance(result, dict):
+        return 'api: unexpected response'
+    if str(result.get('result_code')) != '1':
+        # Paging past the last page is not an error for a load test.
+        if result.get('result_message') == 'Failed: Nothing is returned':
+            return None
+        return 'api: {}'.format(result.get('result_message'))
+    return None
+
+
+class LoadTest:
+    """
+    Run a weighted operation mix with concurrent virtual users.
+
+    Parameters
+    ----------
+    config:
+        Config used to build the resources of each virtual user.
+    mix:
+        Mapping (or mix string, see `parse_mix`) of operation name to weight.
+    users:
+        Number of concurrent virtual users.
+    duration:
+        Stop after this many seconds.
+    requests:
+        Stop after this many requests in total.
+    options:
+        Operation options: 'email' (campaign_send recipient), 'campaign_id',
+        'message_id', 'list_id', 'pages' and 'email_domain'.
+    """
+    def __init__(self, config, mix, users=10, duration=None, requests=None,
+                 options=None, seed=None):
+        if duration is None and requests is None:
+            raise ValueError('Set a duration, a request count, or both')
+        self.config = config
+        self.mix = parse_mix(mix) if isinstance(mix, str) else OrderedDict(mix)
+        self.users = users
+        self.duration = duration
+        self.requests = requests
+        self.options = dict(options or {})
+        if 'campaign_send' in self.mix and not self.options.get('email'):
+            raise ValueError("The 'campaign_send' operation needs a "
+                             "recipient email")
+        self.seed = seed
+        self._issued = 0
+        self._lock = threading.Lock()
+
+    def _next_ticket(self, deadline):
+        if deadline is not None and time.perf_counter() >= deadline:
+            return False
+        with self._lock:
+            if self.requests is not None and self._issued >= self.requests:
+                return False
+            self._issued += 1
+        return True
+
+    def _make_resources(self):
+        return {
+            'contacts': act.ContactsResource(self.config),
+            'lists': act.ListResource(self.config),
+            'campaigns': act.CampaignResource(self.config),
+            'messages': act.MessageResource(self.config),
+        }
+
+    def _virtual_user(self, index, deadline, stats):
+        rng = random.Random(None if self.seed is None else self.seed + index)
+        resources = self._make_resources()
+        names = list(self.mix)
+        weights = [self.mix[name] for name in names]
+        while self._next_ticket(deadline):
+            name = rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                result = OPERATIONS[name](resources, self.options, rng)
+                error = classify_result(result)
+            except Exception as e:
+                error = type(e).__name__
+            stats[name].record(time.perf_counter() - start, error)
+
+    def run(self):
+        """
+        Run the load test and return its report.
+        """
+        self._issued = 0
+        per_user = [{name: ActionStats() for name in self.mix}
+                    for _ in range(self.users)]
+        start = time.perf_counter()
+        deadline = start + self.duration if self.duration is not None else None
+        threads = [
+            threading.Thread(target=self._virtual_user,
+                             args=(i, deadline, per_user[i]), daemon=True)
+            for i in range(self.users)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        combined = {name: ActionStats() for name in self.mix}
+        total = ActionStats()
+        for stats in per_user:
+            for name, action_stats in stats.items():
+                combined[name].merge(action_stats)
+                total.merge(action_stats)
+        return OrderedDict([
+            ('users', self.users),
+            ('elapsed', elapsed),
+            ('mix', dict(self.mix)),
+            ('actions', OrderedDict((name, combined[name].summary(elapsed))
+                                    for name in self.mix)),
+            ('total', total.summary(elapsed)),
+        ])
+
+
+def format_report(report):
+    """
+    Render a load test report as a text table; latencies are in milliseconds.
+    """
+    def ms(value):
+        return '-' if value is None else '{:.1f}'.format(value * 1000)
+
+    columns = ['requests', 'errors', 'req/s', 'mean', 'p50', 'p90', 'p95',
+               'p99', 'max']
+    lines = [
+        '{} virtual users, {:.2f}s'.format(report['users'], report['elapsed']),
+        '',
+        '{:<16}'.format('action')
+        + ''.join('{:>10}'.format(c) for c in columns),
+    ]
+    rows = list(report['actions'].items()) + [('TOTAL', report['total'])]
+    for name, s in rows:
+        values = [s['requests'], s['errors'], '{:.1f}'.format(s['throughput']),
+                  ms(s['mean']), ms(s['p50']), ms(s['p90']), ms(s['p95']),
+                  ms(s['p99']), ms(s['max'])]
+        lines.append('{:<16}'.format(name)
+                     + ''.join('{:>10}'.format(v) for v in values))
+    errors = [(name, s['error_breakdown'])
+              for name, s in report['actions'].items() if s['error_breakdown']]
+    if errors:
+        lines.extend(['', 'Errors:'])
+        for name, breakdown in errors:
+            by_count = sorted(breakdown.items(), key=lambda item: -item[1])
+            for label, count in by_count:
+                lines.append('  {:<16}{:>8}  {}'.format(name, count, label))
+    return '\n'.join(lines)
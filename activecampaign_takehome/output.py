@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+"""
+Streaming record output for the CLI's list commands.
+
+Records are written one at a time as they arrive, straight to the output
+stream; nothing is collected or pretty-printed first. Formats:
+
+- json: a JSON array, one record per line
+- jsonl: one JSON object per line
+- csv: header from the first record (or `columns`); nested values as JSON
+- table: fixed-width text columns, sized from the first `sample` records
+"""
+
+import csv
+import itertools
+import json
+
+
+FORMATS = ['json', 'jsonl', 'csv', 'table']
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(',', ':'))
+    return str(value)
+
+
+def write_json(records, out, columns=None):
+    separator = '[\n'
+    for record in records:
+        out.write(separator)
+        out.write(json.dumps(_project(record, columns)))
+        separator = ',\n'
+    out.write('[]\n' if separator == '[\n' else '\n]\n')
+
+
+def write_jsonl(records, out, columns=None):
+    dumps = json.JSONEncoder(separators=(',', ':')).encode
+    for record in records:
+        out.write(dumps(_project(record, columns)))
+        out.write('\n')
+
+
+def write_csv(records, out, columns=None):
+    records = iter(records)
+    first = next(records, None)
+    if first is None:
+        if columns:
+            csv.writer(out).writerow(columns)
+        return
+    columns = list(columns or first)
+    writer = csv.writer(out)
+    writer.writerow(columns)
+    for record in itertools.chain([first], records):
+        writer.writerow([_cell(record.get(c)) for c in columns])
+
+
+def write_table(records, out, columns=None, sample=50, max_width=40):
+    """
+    Fixed-width table; column widths come from the first `sample` records and
+    longer values are cut to the column width.
+    """
+    records = iter(records)
+    head = list(itertools.islice(records, sample))
+    if not head and not columns:
+        return
+    columns = list(columns or head[0])
+    widths = [len(c) for c in columns]
+    for record in head:
+        for i, c in enumerate(columns):
+            width = len(_cell(record.get(c)))
+            widths[i] = min(max(widths[i], width), max_width)
+
+    def line(values):
+        cells = []
+        for value, width in zip(values, widths):
+            value = value if len(value) <= width else value[:width - 1] + '~'
+            cells.append(value.ljust(width))
+        return '  '.join(cells).rstrip() + '\n'
+
+    out.write(line(columns))
+    out.write(line(['-' * w for w in widths]))
+    for record in itertools.chain(head, records):
+        out.write(line([_cell(record.get(c)) for c in columns]))
+
+
+WRITERS = {
+    'json': write_json,
+    'jsonl': write_jsonl,
+    'csv': write_csv,
+    'table': write_table,
+}
+
+
+def _project(record, columns):
+    if columns is None:
+        return record
+    return {c: record.get(c) for c in columns}
+
+
+def write_records(records, fmt, out, columns=None):
+    """
+    Write `records` (any iterable of dicts) to the text stream `out` as `fmt`.
+
+    `columns` selects the fields for json and jsonl, and the columns for csv
+    and table; by default all fields of the first record are used.
+    """
+    try:
+        writer = WRITERS[fmt]
+    except KeyError:
+        raise ValueError('Unknown format {!r}; choose from {}'.format(
+            fmt, ', '.join(FORMATS)))
+    writer(records, out, columns=columns)
+    out.flush()
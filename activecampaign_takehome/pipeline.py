@@ -0,0 +1,445 @@
+# -*- coding: utf-8 -*-
+
+"""
+Streaming fetch -> transform -> sink pipelines.
+
+A `Pipeline` runs a source and a chain of stages in threads, all at the same
+time, with a bounded queue between each pair of neighbours. Every stage has
+its own number of worker threads. When a stage falls behind, the queue in
+front of it fills up and the stages upstream block, so a slow sink never
+causes more than `queue_size` items per queue to be buffered.
+
+Example::
+
+    contacts = ContactsResource(config)
+    Pipeline(
+        PageSource(contacts.get, workers=4, full=1),
+        Stage(to_edit, workers=2),
+        ApiStage(contacts.edit, workers=8),
+        JsonLinesSink('edited.jsonl'),
+    ).run()
+"""
+
+import json
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from activecampaign_takehome.responses import get_normalizer, get_page
+
+
+ON_ERROR_VALUES = ('raise', 'skip')
+
+_DONE = object()
+
+# How often blocked workers check whether the pipeline was stopped.
+_POLL_INTERVAL = 0.05
+
+
+class ApiCallFailed(Exception):
+    """
+    An `ApiStage` call returned a result other than `result_code` 1.
+    """
+    def __init__(self, item, result):
+        if isinstance(result, dict):
+            message = result.get('result_message')
+        else:
+            message = result
+        super().__init__('API call failed: {}'.format(message))
+        self.item = item
+        self.result = result
+
+
+class StageStats:
+    """
+    Counters of one stage. `busy` is the time spent in `process` by all
+    workers.
+    """
+    max_failures = 100
+
+    def __init__(self, workers):
+        self.lock = threading.Lock()
+        self.workers = workers
+        self.received = 0
+        self.emitted = 0
+        self.errors = 0
+        self.busy = 0.0
+        self.failures = []
+
+    def as_dict(self):
+        return OrderedDict([
+            ('workers', self.workers),
+            ('in', self.received),
+            ('out', self.emitted),
+            ('errors', self.errors),
+            ('busy', self.busy),
+        ])
+
+
+class Stage:
+    """
+    Apply `fn` to every item.
+
+    Parameters
+    ----------
+    fn:
+        Called with each item. Its return value is passed on, unless it is
+        None (the item is dropped).
+    workers:
+        Worker threads calling `fn`. With more than one, items may be passed
+        on out of order.
+    name:
+        Name in the report; defaults to the function's name.
+    flat:
+        `fn` returns an iterable of items to pass on.
+    on_error:
+        'raise' stops the pipeline and re-raises the exception from `run`;
+        'skip' counts the error and carries on with the next item.
+    """
+    def __init__(self, fn=None, workers=1, name=None, flat=False,
+                 on_error='raise'):
+        if on_error not in ON_ERROR_VALUES:
+            raise ValueError('on_error must be one of {}'.format(
+                ', '.join(ON_ERROR_VALUES)))
+        if workers < 1:
+            raise ValueError('workers must be at least 1')
+        self.fn = fn
+        self.workers = workers
+        self.name = (name or getattr(fn, '__name__', None)
+                     or type(self).__name__)
+        self.flat = flat
+        self.on_error = on_error
+
+    def open(self):
+        """Called once before the workers start."""
+
+    def close(self):
+        """Called once after the last worker has finished."""
+
+    def process(self, item, emit):
+        result = self.fn(item)
+        if self.flat:
+            for value in result:
+                emit(value)
+        elif result is not None:
+            emit(result)
+
+
+class Source(Stage):
+    """
+    Feed the pipeline from an iterable, in one thread.
+    """
+    def __init__(self, iterable, name='source'):
+        super().__init__(workers=1, name=name)
+        self.iterable = iterable
+
+    def produce(self, emit):
+        for item in self.iterable:
+            if not emit(item):
+                return
+
+
+class PageSource(Source):
+    """
+    Records of every page of a resource's paginated `get` method.
+
+    With several workers, pages are fetched concurrently (and records are
+    passed on in the order the pages arrive); workers stop claiming pages
+    once one comes back empty. A page that fails for another reason raises
+    `responses.ApiResultError`.
+
+    Parameters
+    ----------
+    get:
+        A resource's `get`, e.g. `ContactsResource.get`.
+    workers:
+        Pages fetched at the same time.
+    normalize:
+        True or a `Normalizer`, see `responses`.
+    params:
+        Other arguments for `get`, such as `full` or `filters`.
+    """
+    def __init__(self, get, workers=1, normalize=True, name=None, first_page=1,
+                 **params):
+        super().__init__(None,
+                         name=name or getattr(get, '__qualname__', 'pages'))
+        self.workers = workers
+        self.get = get
+        self.normalizer = get_normalizer(normalize) or get_normalizer(True)
+        self.params = params
+        self.lock = threading.Lock()
+        self.next_page = first_page
+        self.last_page = None
+
+    def produce(self, emit):
+        while True:
+            with self.lock:
+                page = self.next_page
+                if self.last_page is not None and page > self.last_page:
+                    return
+                self.next_page += 1
+            records = get_page(self.get, page, normalize=self.normalizer,
+                               **self.params)
+            for record in records:
+                if not emit(record):
+                    return
+            if not records:
+                with self.lock:
+                    if self.last_page is None or page - 1 < self.last_page:
+                        self.last_page = page - 1
+                return
+
+
+class ApiStage(Stage):
+    """
+    Call a resource method (e.g. `ContactsResource.create`) with every item.
+
+    Passes on `(item, result)` for calls returning `result_code` 1. Other
+    results raise `ApiCallFailed`, handled per `on_error`; with 'skip' (the
+    default) the first failures are kept in the report.
+    """
+    def __init__(self, method, workers=1, name=None, on_error='skip'):
+        name = name or getattr(method, '__qualname__', None)
+        super().__init__(workers=workers, name=name, on_error=on_error)
+        self.method = method
+
+    def process(self, item, emit):
+        result = self.method(item)
+        if (not isinstance(result, dict)
+                or str(result.get('result_code')) != '1'):
+            raise ApiCallFailed(item, result)
+        emit((item, result))
+
+
+class JsonLinesSink(Stage):
+    """
+    Write every item as a line of JSON to a path or a writable text file.
+    """
+    def __init__(self, output, name='jsonl'):
+        super().__init__(workers=1, name=name)
+        self.output = output
+        self.f = None
+
+    def open(self):
+        if hasattr(self.output, 'write'):
+            self.f = self.output
+        else:
+            self.f = open(self.output, 'w')
+
+    def process(self, item, emit):
+        self.f.write(json.dumps(item))
+        self.f.write('\n')
+
+    def close(self):
+        if self.f is not self.output:
+            self.f.close()
+        else:
+            self.f.flush()
+
+
+class SqliteSink(Stage):
+    """
+    Store every record as JSON in a SQLite table, keyed by its `key` field.
+
+    Records with a key already in the table replace the stored one. Commits
+    every `batch` records.
+    """
+    def __init__(self, path, table='records', key='id', batch=500,
+                 name='sqlite'):
+        super().__init__(workers=1, name=name)
+        self.path = path
+        self.table = table
+        self.key = key
+        self.batch = batch
+        self.conn = None
+        self.pending = 0
+
+    def open(self):
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS "{}" '
+            '(key TEXT PRIMARY KEY, record TEXT)'.format(self.table))
+
+    def process(self, item, emit):
+        self.conn.execute(
+            'INSERT OR REPLACE INTO "{}" (key, record) VALUES (?, ?)'
+            .format(self.table),
+            (str(item.get(self.key)), json.dumps(item)))
+        self.pending += 1
+        if self.pending >= self.batch:
+            self.conn.commit()
+            self.pending = 0
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+
+def _get(inbox, stop):
+    while True:
+        try:
+            return inbox.get(timeout=_POLL_INTERVAL)
+        except queue.Empty:
+            if stop.is_set():
+                return _DONE
+
+
+def _put(outbox, item, stop):
+    while True:
+        try:
+            outbox.put(item, timeout=_POLL_INTERVAL)
+            return True
+        except queue.Full:
+            if stop.is_set():
+                return False
+
+
+class Pipeline:
+    """
+    A source followed by stages, connected by bounded queues.
+
+    Parameters
+    ----------
+    source:
+        A `Source` (or `PageSource`), or any iterable.
+    stages:
+        `Stage` instances, or plain functions (run as a one-worker `Stage`).
+    queue_size:
+        Capacity of each queue between two stages.
+    """
+    def __init__(self, source, *stages, queue_size=100):
+        if not isinstance(source, Source):
+            source = Source(source)
+        self.stages = [source] + [s if isinstance(s, Stage) else Stage(s)
+                                  for s in stages]
+        self.queue_size = queue_size
+        self.stats = None
+        names = []
+        for stage in self.stages:
+            name = stage.name
+            n = 1
+            while name in names:
+                n += 1
+                name = '{}#{}'.format(stage.name, n)
+            names.append(name)
+        self.names = names
+
+    def run(self):
+        """
+        Run the pipeline until the source is exhausted and all items are done.
+
+        Returns
+        -------
+        OrderedDict
+            `elapsed` seconds, per-stage counters (`stages`) and the highest
+            number of items seen waiting in each queue (`max_queued`). The
+            stages' `StageStats`, including the failures they skipped, are
+            kept in `stats`.
+        """
+        stages = self.stages
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in stages[1:]]
+        max_queued = [0] * len(queues)
+        stats = [StageStats(stage.workers) for stage in stages]
+        remaining = [stage.workers for stage in stages]
+        lock = threading.Lock()
+        stop = threading.Event()
+        errors = []
+
+        def emitter(index):
+            if index == len(queues):
+                def emit(item):
+                    with lock:
+                        stats[index].emitted += 1
+                    return True
+                return emit
+            outbox = queues[index]
+
+            def emit(item):
+                if not _put(outbox, item, stop):
+                    return False
+                size = outbox.qsize()
+                with lock:
+                    stats[index].emitted += 1
+                    if size > max_queued[index]:
+                        max_queued[index] = size
+                return True
+            return emit
+
+        def fail(index, item, e):
+            stage_stats = stats[index]
+            with stage_stats.lock:
+                stage_stats.errors += 1
+                if len(stage_stats.failures) < stage_stats.max_failures:
+                    stage_stats.failures.append((item, e))
+            if stages[index].on_error == 'raise':
+                with lock:
+                    errors.append(e)
+                stop.set()
+                return False
+            return True
+
+        def worker(index):
+            stage = stages[index]
+            emit = emitter(index)
+            try:
+                if index == 0:
+                    try:
+                        stage.produce(emit)
+                    except Exception as e:
+                        fail(index, None, e)
+                    return
+                inbox = queues[index - 1]
+                while True:
+                    item = _get(inbox, stop)
+                    if item is _DONE or stop.is_set():
+                        return
+                    start = time.perf_counter()
+                    try:
+                        stage.process(item, emit)
+                    except Exception as e:
+                        if not fail(index, item, e):
+                            return
+                    finally:
+                        with stats[index].lock:
+                            stats[index].received += 1
+                            stats[index].busy += time.perf_counter() - start
+            finally:
+                with lock:
+                    remaining[index] -= 1
+                    last = remaining[index] == 0
+                if last and index < len(queues):
+                    # One end marker per downstream worker.
+                    for _ in range(stages[index + 1].workers):
+                        _put(queues[index], _DONE, stop)
+
+        for stage in stages:
+            stage.open()
+        start = time.perf_counter()
+        threads = []
+        try:
+            for index, stage in enumerate(stages):
+                for n in range(stage.workers):
+                    thread = threading.Thread(
+                        target=worker, args=(index,), daemon=True,
+                        name='{}-{}'.format(stage.name, n))
+                    thread.start()
+                    threads.append(thread)
+            for thread in threads:
+                thread.join()
+        except KeyboardInterrupt:
+            stop.set()
+            raise
+        finally:
+            for stage in stages:
+                stage.close()
+        self.stats = OrderedDict(zip(self.names, stats))
+        if errors:
+            raise errors[0]
+        return OrderedDict([
+            ('elapsed', time.perf_counter() - start),
+            ('stages', OrderedDict((name, s.as_dict())
+                                   for name, s in self.stats.items())),
+            ('max_queued', max_queued),
+        ])
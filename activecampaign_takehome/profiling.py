@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+
+"""
+Where-did-the-time-go reports for the CLI's `--profile` option.
+
+While a `Profiler` runs, a few functions are temporarily wrapped to add up
+the wall time spent in each phase:
+
+- config: `Config.configure` (reading the .env file)
+- schema: marshmallow `Schema.dump` / `Schema.load`
+- http: `Api._call` (the transport call, including any circuit breaker)
+- decode: `Api.parse_response` (JSON decoding)
+- output: `pformat` in the CLI and `click.echo`
+
+Import time is measured by the CLI module itself. Time spent in threads is
+summed, so phases can add up to more than the wall time; work done in
+worker processes (e.g. `export_contacts`) is not seen. Optionally the run is
+also recorded with cProfile and tracemalloc.
+"""
+
+import cProfile
+import functools
+import threading
+import time
+import tracemalloc
+from collections import Counter, OrderedDict
+
+import click
+import marshmallow
+
+from activecampaign_takehome import activecampaign_takehome as act
+
+
+PHASES = ['import', 'config', 'schema', 'http', 'decode', 'output']
+
+
+class Profiler:
+    """
+    Phase timings, plus optional cProfile statistics and tracemalloc peak.
+
+    Parameters
+    ----------
+    stats_path:
+        Write cProfile statistics (readable with `pstats`) to this file.
+        Only the main thread is profiled.
+    memory:
+        Trace allocations and report the peak.
+    import_seconds:
+        Time spent importing, measured by the caller.
+    targets:
+        `(owner, attribute, phase)` triples to wrap; defaults to
+        `default_targets()`.
+    """
+    def __init__(self, stats_path=None, memory=False, import_seconds=0.0,
+                 targets=None):
+        self.stats_path = stats_path
+        self.memory = memory
+        self.targets = targets if targets is not None else default_targets()
+        self.totals = OrderedDict((phase, 0.0) for phase in PHASES)
+        self.totals['import'] = import_seconds
+        self.calls = Counter()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.patched = []
+        self.cprofile = None
+        self.start_time = None
+        self.elapsed = None
+        self.memory_peak = None
+
+    def timed(self, phase, fn):
+        """
+        Wrap `fn` to add its wall time to `phase`. Nested calls in the same
+        phase are counted once.
+        """
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if getattr(self.local, phase, False):
+                return fn(*args, **kwargs)
+            setattr(self.local, phase, True)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                setattr(self.local, phase, False)
+                with self.lock:
+                    self.totals[phase] += elapsed
+                    self.calls[phase] += 1
+        return wrapper
+
+    def start(self):
+        for owner, attribute, phase in self.targets:
+            original = getattr(owner, attribute)
+            # Inherited methods are removed again, not copied onto `owner`.
+            inherited = (isinstance(owner, type)
+                         and attribute not in owner.__dict__)
+            self.patched.append((owner, attribute, original, inherited))
+            setattr(owner, attribute, self.timed(phase, original))
+        if self.memory:
+            tracemalloc.start()
+        if self.stats_path:
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+        self.start_time = time.perf_counter()
+
+    def stop(self):
+        self.elapsed = time.perf_counter() - self.start_time
+        if self.cprofile is not None:
+            self.cprofile.disable()
+            self.cprofile.dump_stats(self.stats_path)
+        if self.memory:
+            _, self.memory_peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        for owner, attribute, original, inherited in reversed(self.patched):
+            if inherited:
+                delattr(owner, attribute)
+            else:
+                setattr(owner, attribute, original)
+        self.patched = []
+
+    def report(self):
+        """
+        Phase timings as a dict: `total` wall seconds (import included), then
+        per phase `seconds` and `calls`.
+        """
+        total = self.totals['import'] + self.elapsed
+        phases = OrderedDict()
+        for phase, seconds in self.totals.items():
+            calls = None if phase == 'import' else self.calls[phase]
+            phases[phase] = OrderedDict([('seconds', seconds),
+                                         ('calls', calls)])
+        other = total - sum(self.totals.values())
+        phases['other'] = OrderedDict([('seconds', max(other, 0.0)),
+                                       ('calls', None)])
+        return OrderedDict([
+            ('total', total),
+            ('phases', phases),
+            ('memory_peak', self.memory_peak),
+            ('stats_path', self.stats_path),
+        ])
+
+
+def default_targets():
+    """
+    The functions timed by default, as `(owner, attribute, phase)`.
+    """
+    from activecampaign_takehome import cli
+    return [
+        (act.Config, 'configure', 'config'),
+        (marshmallow.Schema, 'dump', 'schema'),
+        (marshmallow.Schema, 'load', 'schema'),
+        (act.Api, '_call', 'http'),
+        (act.Api, 'parse_response', 'decode'),
+        (cli, 'pformat', 'output'),
+        (click, 'echo', 'output'),
+    ]
+
+
+def format_report(report):
+    """
+    Render a `Profiler.report` as text.
+    """
+    total = report['total']
+    lines = ['Profile: {:.3f}s wall time (time in threads is summed per '
+             'phase)'.format(total)]
+    for phase, values in report['phases'].items():
+        share = values['seconds'] / total * 100 if total else 0.0
+        if values['calls'] is None:
+            calls = ''
+        else:
+            calls = '{} calls'.format(values['calls'])
+        line = '  {:<8}{:>10.3f}s{:>7.1f}%  {}'.format(
+            phase, values['seconds'], share, calls)
+        lines.append(line.rstrip())
+    if report['memory_peak'] is not None:
+        lines.append('Peak traced memory: {:.1f} MiB'.format(
+            report['memory_peak'] / 1024 / 1024))
+    if report['stats_path']:
+        lines.append('cProfile statistics written to {} (python -m pstats {})'
+                     .format(report['stats_path'], report['stats_path']))
+    return '\n'.join(lines)
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+
+"""
+Normalization of the list actions' responses.
+
+`contact_list`, `campaign_list`, `list_list` and `message_list` return their
+records as "0", "1", ... keys next to `result_code`, `result_message` and
+`result_output`, with every number as a string. `Normalizer` picks the
+records out in one pass, optionally converting numeric fields and keeping
+only some fields, and returns them as a `RecordList` (or a generator).
+
+Example::
+
+    contacts = ContactsResource(config)
+    normalizer = Normalizer(coerce=True, fields=['id', 'email', 'sentcnt'])
+    page = contacts.get(page=2, normalize=normalizer)
+    for record in iter_pages(contacts.get, normalize=True, full=1):
+        ...
+
+The projection (`fields`) runs on the decoded page: it makes the records
+smaller, not the parsing. What makes the response itself lighter is the
+`full` mode, and `ContactsResource.get` asks for the lightest one covering
+the normalizer's fields (`Normalizer.full`)::
+
+    normalizer = Normalizer(fields=['id', 'email', 'name', 'listid'])
+    for record in iter_pages(contacts.get, normalize=normalizer):
+        ...
+"""
+
+
+def to_int(value):
+    """
+    `int(value)`; None for empty values, `value` itself if not a number.
+    """
+    if value is None or value == '':
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def to_float(value):
+    """
+    `float(value)`; None for empty values, `value` itself if not a number.
+    """
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+
+# Counters converted by `Normalizer(coerce=True)`; IDs and codes stay strings.
+NUMERIC_FIELDS = {
+    'contact_list': {
+        'bounced_hard': to_int, 'bounced_soft': to_int, 'sentcnt': to_int,
+        'bouncescnt': to_int, 'rating': to_int,
+    },
+    'campaign_list': {
+        'total_amt': to_int, 'send_amt': to_int, 'opens': to_int,
+        'uniqueopens': to_int, 'linkclicks': to_int,
+        'uniquelinkclicks': to_int, 'subscriberclicks': to_int,
+        'forwards': to_int, 'uniqueforwards': to_int, 'hardbounces': to_int,
+        'softbounces': to_int, 'unsubscribes': to_int, 'unsubreasons': to_int,
+        'updates': to_int, 'socialshares': to_int, 'replies': to_int,
+        'uniquereplies': to_int,
+    },
+    'list_list': {
+        'subscribers': to_int, 'subscribers_active': to_int,
+        'subscriber_count': to_int,
+    },
+    'message_list': {
+        'priority': to_int,
+    },
+}
+
+
+# Fields a list action only returns with `full=1`.
+FULL_FIELDS = {
+    'contact_list': frozenset([
+        'lists', 'listslist', 'fields', 'actions', 'automation_history',
+        'campaign_history', 'bounces', 'bouncescnt', 'tags', 'geo',
+    ]),
+}
+
+
+class RecordList(list):
+    """
+    Records of a list action, in order, with the call's result code/message.
+
+    A failed call, or a page past the end ("Nothing is returned"), gives an
+    empty list.
+    """
+    def __init__(self, records=(), result_code=None, result_message=None):
+        super().__init__(records)
+        self.result_code = result_code
+        self.result_message = result_message
+
+    @property
+    def ok(self):
+        return str(self.result_code) == '1'
+
+
+# `result_message` of a list action past its last page.
+NOTHING_RETURNED = 'Nothing is returned'
+
+
+class ApiResultError(Exception):
+    """
+    A list action answered with an error instead of records (e.g. bad API key).
+    """
+
+
+def checked(records):
+    """
+    `records` (a `RecordList`), unless the call failed for another reason
+    than an empty result.
+    """
+    empty = (records.result_code is not None
+             and NOTHING_RETURNED in str(records.result_message))
+    if not records.ok and not empty:
+        raise ApiResultError(str(records.result_message).strip())
+    return records
+
+
+def _record_keys(payload):
+    keys = [k for k in payload if k.isdigit()]
+    # The API sends "0".."n-1" in order; only sort when it did not.
+    if keys == [str(i) for i in range(len(keys))]:
+        return keys
+    return sorted(keys, key=int)
+
+
+class Normalizer:
+    """
+    Turn a list action payload into records.
+
+    Parameters
+    ----------
+    coerce:
+        True to convert the action's counters (see `NUMERIC_FIELDS`), or a
+        dict of field name -> converter such as `to_int` or `to_float`.
+    fields:
+        Keep only these fields, in this order; missing ones are None. The
+        page is decoded in full before the fields are picked.
+    stream:
+        Return a generator of records instead of a `RecordList`.
+    """
+    def __init__(self, coerce=None, fields=None, stream=False):
+        self.coerce = coerce
+        self.fields = list(fields) if fields is not None else None
+        self.stream = stream
+
+    def full(self, api_action):
+        """
+        The lightest `full` mode returning every one of `fields`: 1 if one
+        is only sent with `full=1` (see `FULL_FIELDS`), else 0; None without
+        `fields`.
+        """
+        if self.fields is None:
+            return None
+        full_only = FULL_FIELDS.get(api_action, frozenset())
+        return 1 if full_only.intersection(self.fields) else 0
+
+    def converters(self, api_action=None):
+        if not self.coerce:
+            return []
+        if self.coerce is True:
+            return list(NUMERIC_FIELDS.get(api_action, {}).items())
+        return list(self.coerce.items())
+
+    def records(self, payload, api_action=None):
+        """
+        Generator of the records of `payload`.
+        """
+        if (not isinstance(payload, dict)
+                or str(payload.get('result_code')) != '1'):
+            return
+        converters = self.converters(api_action)
+        fields = self.fields
+        if fields is not None:
+            # Converting after projecting only touches fields that are kept.
+            converters = [(k, f) for k, f in converters if k in fields]
+        for key in _record_keys(payload):
+            record = payload[key]
+            if fields is not None:
+                get = record.get
+                record = {field: get(field) for field in fields}
+            elif converters:
+                record = dict(record)
+            for field, convert in converters:
+                if field in record:
+                    record[field] = convert(record[field])
+            yield record
+
+    def __call__(self, payload, api_action=None):
+        if self.stream:
+            return self.records(payload, api_action)
+        result_code = result_message = None
+        if isinstance(payload, dict):
+            result_code = payload.get('result_code')
+            result_message = payload.get('result_message')
+        else:
+            result_message = payload
+        return RecordList(self.records(payload, api_action), result_code,
+                          result_message)
+
+
+def get_normalizer(normalize):
+    """
+    The `Normalizer` for a `get` method's `normalize` argument: None for a
+    falsy value, the default `Normalizer` for True.
+    """
+    if not normalize:
+        return None
+    if isinstance(normalize, Normalizer):
+        return normalize
+    return Normalizer()
+
+
+def normalize(payload, api_action=None, coerce=None, fields=None):
+    """
+    Shorthand for `Normalizer(coerce, fields)(payload, api_action)`.
+    """
+    return Normalizer(coerce=coerce, fields=fields)(payload, api_action)
+
+
+def get_page(get, page, normalize=True, **params):
+    """
+    Page `page` of a paginated `get` method as a `RecordList`, via `checked`.
+
+    Streaming normalizers are replaced by their list counterpart, since a
+    generator carries no result code to check.
+    """
+    normalizer = get_normalizer(normalize) or Normalizer()
+    if normalizer.stream:
+        normalizer = Normalizer(coerce=normalizer.coerce,
+                                fields=normalizer.fields)
+    return checked(get(page=page, normalize=normalizer, **params))
+
+
+def iter_pages(get, normalize=True, first_page=1, **params):
+    """
+    Records of every page of a paginated `get` method, up to an empty page.
+
+    Raises `ApiResultError` if a page fails for another reason than being
+    past the end, rather than stopping early.
+
+    Parameters
+    ----------
+    get:
+        A resource's `get`, e.g. `ContactsResource.get`.
+    normalize:
+        Passed on to `get`; True or a `Normalizer`. Streaming normalizers
+        are fine too.
+    first_page:
+        Page to start at.
+    params:
+        Other arguments for `get`, such as `full` or `filters`.
+    """
+    page = first_page
+    while True:
+        records = get_page(get, page, normalize=normalize, **params)
+        if not records:
+            return
+        yield from records
+        page += 1
@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+
+"""
+Long-running CLI jobs on an event loop, with live progress and clean Ctrl-C.
+
+The client is blocking, so a `Runner` keeps an asyncio event loop that
+hands each call to a worker thread and waits for them
+(`asyncio.wrap_future`). The loop keeps `max_workers` calls in flight,
+redraws a `Progress` line (done, rate, ETA) while waiting, and owns SIGINT:
+
+- the first Ctrl-C stops taking new work and lets the calls in flight
+  finish, so their results are still recorded (e.g. in a sync snapshot);
+- a second Ctrl-C gives up on them and raises `KeyboardInterrupt`.
+
+`Runner.imap` has the interface of `concurrency.imap_bounded`, and the bulk
+functions (`importer.import_contacts`, `sync.upsert_contacts`,
+`bulk.delete_many`) take it as their `imap` argument. The number of calls in
+flight is their `max_workers`; raise it until the progress rate reaches the
+account's rate limit.
+
+Example::
+
+    with Runner(Progress(label='contact_add')) as runner:
+        report = import_contacts(resource, contacts, max_workers=32,
+                                 imap=runner.imap)
+    if runner.interrupted:
+        print('Stopped early')
+"""
+
+import asyncio
+import datetime
+import signal
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from activecampaign_takehome.concurrency import outcome
+
+
+class Progress:
+    """
+    A one-line progress display: the count, the recent rate, and the
+    percentage and ETA when `total` is known.
+
+    Parameters
+    ----------
+    total:
+        Expected number of units, if known.
+    label:
+        What is counted, e.g. 'calls' or 'contacts'.
+    stream:
+        Defaults to stderr.
+    interval:
+        Seconds between redraws.
+    window:
+        The rate is measured over the last `window` seconds.
+    status:
+        Optional callable returning more text for the line, e.g. the
+        current concurrency limit.
+    """
+    def __init__(self, total=None, label='calls', stream=None, interval=0.2,
+                 window=10.0, status=None, clock=time.monotonic):
+        self.total = total
+        self.label = label
+        self.stream = stream if stream is not None else sys.stderr
+        self.interval = interval
+        self.window = window
+        self.status = status
+        self.clock = clock
+        self.done = 0
+        self.failed = 0
+        self.start = clock()
+        self.samples = deque([(self.start, 0)])
+        self.last_draw = None
+        self.width = 0
+
+    def update(self, ok=True, n=1):
+        self.done += n
+        if not ok:
+            self.failed += n
+        now = self.clock()
+        if now - self.samples[-1][0] >= self.interval:
+            self.samples.append((now, self.done))
+            while (len(self.samples) > 2
+                   and now - self.samples[1][0] >= self.window):
+                self.samples.popleft()
+
+    @property
+    def rate(self):
+        """Units per second over the last `window` seconds."""
+        now = self.clock()
+        since, done = self.samples[0]
+        return (self.done - done) / (now - since) if now > since else 0.0
+
+    @property
+    def eta(self):
+        """Seconds left, if `total` is known and something was done."""
+        rate = self.rate
+        if self.total is None or not rate:
+            return None
+        return max(self.total - self.done, 0) / rate
+
+    def line(self):
+        parts = []
+        if self.total:
+            share = min(self.done / self.total, 1)
+            parts.append('{}/{} {} ({:.0%})'.format(self.done, self.total,
+                                                    self.label, share))
+        else:
+            parts.append('{} {}'.format(self.done, self.label))
+        parts.append('{:.1f}/s'.format(self.rate))
+        eta = self.eta
+        if eta is not None:
+            parts.append('ETA {}'.format(datetime.timedelta(seconds=int(eta))))
+        if self.failed:
+            parts.append('{} failed'.format(self.failed))
+        if self.status is not None:
+            parts.append(self.status())
+        return ' | '.join(parts)
+
+    def draw(self, force=False):
+        now = self.clock()
+        if (not force and self.last_draw is not None
+                and now - self.last_draw < self.interval):
+            return
+        self.last_draw = now
+        line = self.line()
+        self.stream.write('\r' + line.ljust(self.width))
+        self.stream.flush()
+        self.width = len(line)
+
+    def note(self, message):
+        """Print `message` on its own line, below the progress line."""
+        self.draw(force=True)
+        self.stream.write('\n{}\n'.format(message))
+        self.stream.flush()
+        self.width = 0
+
+    def close(self):
+        self.draw(force=True)
+        self.stream.write('\n')
+        self.stream.flush()
+
+
+class Runner:
+    """
+    Runs blocking calls from an asyncio event loop; see the module docstring.
+
+    Parameters
+    ----------
+    progress:
+        `Progress` updated with every finished call (a call counts as failed
+        when `concurrency.outcome` says so), or None.
+    handle_signals:
+        Install the Ctrl-C handler. Only possible in the main thread; elsewhere
+        the runner works without it.
+    """
+    def __init__(self, progress=None, handle_signals=True):
+        self.progress = progress
+        self.handle_signals = handle_signals
+        self.loop = None
+        self.signals = False
+        self.interrupted = False
+
+    def __enter__(self):
+        self.loop = asyncio.new_event_loop()
+        if self.handle_signals:
+            try:
+                self.loop.add_signal_handler(signal.SIGINT, self.interrupt)
+                self.signals = True
+            except (NotImplementedError, RuntimeError, ValueError):
+                # Not the main thread, or no loop signal handlers here.
+                pass
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self.loop is None:
+            return
+        if self.signals:
+            self.loop.remove_signal_handler(signal.SIGINT)
+            self.signals = False
+        self.loop.close()
+        self.loop = None
+        if self.progress is not None:
+            self.progress.close()
+
+    def interrupt(self):
+        """
+        Stop taking new work; called on Ctrl-C. Raises `KeyboardInterrupt`
+        when called again.
+        """
+        if self.interrupted:
+            raise KeyboardInterrupt
+        self.interrupted = True
+        if self.progress is not None:
+            self.progress.note('Interrupted: finishing the calls in flight '
+                               '(Ctrl-C again to abort)')
+
+    def imap(self, fn, items, max_workers=1):
+        """
+        Call `fn(item)` in worker threads; yield `(item, future)` as calls
+        finish.
+
+        Same contract as `concurrency.imap_bounded`; once interrupted, no more
+        items are taken and the pairs of the calls in flight are still yielded.
+        """
+        if self.loop is None:
+            raise RuntimeError('Runner is not open; use it as a context '
+                               'manager')
+        pending = {}
+        executor = ThreadPoolExecutor(max_workers=max_workers,
+                                      thread_name_prefix='runner')
+        try:
+            for item in () if self.interrupted else items:
+                # Like imap_bounded, take the next item, then wait for a slot.
+                while len(pending) >= max_workers:
+                    yield from self._finished(pending)
+                if self.interrupted:
+                    # Interrupted while waiting: the item taken is not started.
+                    break
+                call = executor.submit(fn, item)
+                future = asyncio.wrap_future(call, loop=self.loop)
+                pending[future] = (item, call)
+                if self.interrupted:
+                    break
+            while pending:
+                yield from self._finished(pending)
+        finally:
+            # Calls not started yet are dropped; when giving up, the running
+            # ones are not waited for.
+            for future, (item, call) in pending.items():
+                future.cancel()
+                call.cancel()
+            executor.shutdown(wait=not pending)
+
+    def _finished(self, pending):
+        for future in self.loop.run_until_complete(self._wait(pending)):
+            item, _ = pending.pop(future)
+            if self.progress is not None:
+                self.progress.update(outcome(future)[0])
+            yield item, future
+
+    async def _wait(self, pending):
+        timeout = self.progress.interval if self.progress is not None else None
+        while True:
+            done, _ = await asyncio.wait(list(pending), timeout=timeout,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if self.progress is not None:
+                self.progress.draw()
+            if done:
+                return done
@@ -1,7 +1,8 @@
 
 import copy
 import pdb
-from marshmallow import Schema, ValidationError, fields, pprint, pre_load, post_load, post_dump
+from marshmallow import (Schema, ValidationError, fields, pprint, pre_load,
+                         post_load, post_dump)
 
 
 class ActionSchema(Schema):
@@ -73,12 +74,20 @@ class ContactSchema(ContactDetailsSchema):
     @post_dump
     def process_lists(self, data):
         data = copy.deepcopy(data)
-        list_ids = data.pop('list_id')
+        list_ids = data.pop('list_id', [])
         for _id in list_ids:
             data['p[{}]'.format(_id)] = str(_id)
         return data
 
 
+class ContactEditSchema(ContactSchema):
+    """
+    Schema for editing an existing contact via the ActiveCampaign API.
+    """
+    id = fields.Str(required=True)
+    overwrite = fields.Str(default='0')  # 1: drop lists/fields not passed
+
+
 
 class ContactResponseSchema(Schema):
     id = fields.Str()
@@ -174,14 +183,13 @@ class ContactResponseSchema(Schema):
     @pre_load
     def format(self, in_data):
         # Convert dictionary of 'lists' to list of lists
+        # 'lists' is only returned with full=1.
         in_data = copy.deepcopy(in_data)
-        in_data['lists'] = [v for k, v in in_data['lists'].items()]
+        in_data['lists'] = [v for k, v in (in_data.get('lists') or {}).items()]
         in_data['contact_details'] = {
-            'first_name': in_data['first_name'],
-            'last_name': in_data['last_name'],
-            'phone': in_data['phone'],
-            'email': in_data['email'],
-            'ip4': in_data['ip4']
+            k: in_data[k]
+            for k in ['first_name', 'last_name', 'phone', 'email', 'ip4']
+            if k in in_data
         }
         return in_data
 
@@ -257,6 +265,7 @@ class TextMessageSchema(MessageSchema):
     """
     textconstructor: Text version. Examples: editor, external, upload. If editor, it uses 'text' parameter. If external, uses 'textfetch' and 'textfetchwhen' parameters. If upload, uses 'message_upload_text'.
     text:   Text version. Content of your text only email. Example: '_text only_ content of your email'
+    message_upload_text:    Text version. Uploaded content of your text email.
     textfetch:  Text version. URL where to fetch the body from. Example: 'http://somedomain.com/somepage.txt'
     textfetchwhen:  Text version. When to fetch. Examples: (fetch at) 'send' and (fetch) 'pers'(onalized)
     """
@@ -264,7 +273,7 @@ class TextMessageSchema(MessageSchema):
     text = fields.Str() # Text content
     textfetch = fields.Str() # url to get the text body from
     textfetchwhen = fields.Str() # 'send' or 'pers'
-    message_upload_text = fields.Str() # Not implemented
+    message_upload_text = fields.Str() # Uploaded text body
 
     @post_dump
     def validate_text(self, data):
@@ -279,7 +288,10 @@ class TextMessageSchema(MessageSchema):
             if not (data.get('textfetch') and data.get('textfetchwhen')):
                 raise ValidationError("Must provide a value for the 'textfetch' and 'textfetchwhen' parameters when the 'textconstructor' is 'external'.")
         elif data['textconstructor'] == 'upload':
-            raise ValidationError('This feature is not yet implemented.')
+            if not data.get('message_upload_text'):
+                raise ValidationError(
+                    "Must provide a value for the 'message_upload_text' "
+                    "parameter when the 'textconstructor' is 'upload'.")
         else:
             raise ValidationError("Bad value for the 'textconstructor parameter.")
 
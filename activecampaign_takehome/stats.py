@@ -0,0 +1,353 @@
+# -*- coding: utf-8 -*-
+
+"""
+Vectorized contact analytics.
+
+Contacts are loaded once into NumPy columns: integer bounce and send
+counters, `datetime64` signup dates, and categorical email domains and list
+memberships (integer codes plus a table of categories). The aggregates are
+then computed with `bincount`, `unique` and `searchsorted` over whole
+columns, so they stay fast for millions of contacts.
+
+NumPy is an optional dependency::
+
+    pip install activecampaign_takehome[stats]
+"""
+
+import json
+from collections import OrderedDict
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from activecampaign_takehome.responses import Normalizer, iter_pages
+
+
+FREQUENCIES = OrderedDict([('D', 'day'), ('W', 'week'), ('M', 'month'),
+                           ('Y', 'year')])
+
+# Lower bounds of the `sentcnt` buckets of the send count histogram.
+SEND_BUCKETS = [0, 1, 2, 5, 10, 20, 50, 100]
+
+_NO_DATE = ('', '0000-00-00', '0000-00-00 00:00:00')
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError('Contact statistics need NumPy; install it with '
+                          '`pip install numpy`.')
+
+
+def _int(value):
+    if value in (None, ''):
+        return 0
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _date(value):
+    if not value or value in _NO_DATE:
+        return 'NaT'
+    # Drop any UTC offset; `datetime64` only parses naive timestamps.
+    return str(value)[:19]
+
+
+def _domain(record):
+    domain = record.get('email_domain')
+    if domain:
+        return domain.lower()
+    details = record.get('contact_details') or {}
+    email = record.get('email') or details.get('email') or ''
+    return email.rpartition('@')[2].strip().lower()
+
+
+def _list_ids(record):
+    # `contact_list` (full=1) returns a dict keyed by list ID; exports hold a
+    # list of dicts.
+    lists = record.get('lists')
+    if isinstance(lists, dict):
+        lists = lists.values()
+    if lists:
+        return [str(membership.get('listid'))
+                for membership in lists if membership.get('listid')]
+    listid = record.get('listid')
+    return [str(listid)] if listid else []
+
+
+class Categorical:
+    """
+    Integer `codes` into a list of `categories`.
+    """
+    def __init__(self, codes, categories):
+        self.codes = codes
+        self.categories = categories
+
+    def counts(self, weights=None):
+        """
+        Occurrences (or summed `weights`) of every category, in category order.
+        """
+        return np.bincount(self.codes, weights=weights,
+                           minlength=len(self.categories))
+
+    def __len__(self):
+        return len(self.codes)
+
+
+class ContactColumns:
+    """
+    Column-oriented contact data.
+
+    One entry per contact in `bounced_hard`, `bounced_soft`, `sentcnt`,
+    `bouncescnt`, `sdate` and `domain`. List memberships are exploded into
+    two parallel columns: `member_contact` (row of the contact) and
+    `member_list` (categorical list ID).
+    """
+    def __init__(self, bounced_hard, bounced_soft, sentcnt, bouncescnt, sdate,
+                 domain, member_contact, member_list):
+        self.bounced_hard = bounced_hard
+        self.bounced_soft = bounced_soft
+        self.sentcnt = sentcnt
+        self.bouncescnt = bouncescnt
+        self.sdate = sdate
+        self.domain = domain
+        self.member_contact = member_contact
+        self.member_list = member_list
+
+    def __len__(self):
+        return len(self.sentcnt)
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        Build the columns from `contact_list` records or exported contacts.
+
+        This is the only per-record loop; it only converts and appends.
+        """
+        _require_numpy()
+        hard, soft, sent, bounces, dates, domain_codes = [], [], [], [], [], []
+        member_contact, member_codes = [], []
+        domains = {}
+        lists = {}
+        for row, record in enumerate(records):
+            hard.append(_int(record.get('bounced_hard')))
+            soft.append(_int(record.get('bounced_soft')))
+            sent.append(_int(record.get('sentcnt')))
+            bounces.append(_int(record.get('bouncescnt')))
+            dates.append(_date(record.get('sdate')))
+            domain = _domain(record)
+            domain_codes.append(domains.setdefault(domain, len(domains)))
+            for list_id in _list_ids(record):
+                member_contact.append(row)
+                member_codes.append(lists.setdefault(list_id, len(lists)))
+        return cls(
+            bounced_hard=np.array(hard, dtype=np.int64),
+            bounced_soft=np.array(soft, dtype=np.int64),
+            sentcnt=np.array(sent, dtype=np.int64),
+            bouncescnt=np.array(bounces, dtype=np.int64),
+            sdate=np.array(dates, dtype='datetime64[s]'),
+            domain=Categorical(np.array(domain_codes, dtype=np.int32),
+                               list(domains)),
+            member_contact=np.array(member_contact, dtype=np.int64),
+            member_list=Categorical(np.array(member_codes, dtype=np.int32),
+                                    list(lists)),
+        )
+
+    @classmethod
+    def from_export(cls, path):
+        """
+        Load a JSON lines contact export (see `export_contacts`).
+        """
+        def records():
+            with open(path, 'r') as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+        return cls.from_records(records())
+
+    @classmethod
+    def from_account(cls, resource, full=1):
+        """
+        Page through `contact_list` with a `ContactsResource`.
+        """
+        records = iter_pages(resource.get, normalize=Normalizer(stream=True),
+                             full=full)
+        return cls.from_records(records)
+
+
+def _rate(numerator, denominator):
+    return np.divide(numerator, denominator, out=np.zeros(len(numerator)),
+                     where=denominator > 0)
+
+
+def _sort_key(list_id):
+    return (0, int(list_id), '') if list_id.isdigit() else (1, 0, list_id)
+
+
+def list_stats(columns):
+    """
+    Per-list contacts, sends, bounces and bounce rates.
+
+    `bounce_rate` is hard plus soft bounces per send; `bounced_contact_rate`
+    is the share of the list's contacts with at least one bounce.
+    """
+    rows = columns.member_contact
+    lists = columns.member_list
+    bounced = ((columns.bounced_hard > 0) | (columns.bounced_soft > 0)
+               | (columns.bouncescnt > 0))
+    contacts = lists.counts()
+    sent = lists.counts(columns.sentcnt[rows])
+    hard = lists.counts(columns.bounced_hard[rows])
+    soft = lists.counts(columns.bounced_soft[rows])
+    bounced_contacts = lists.counts(bounced[rows])
+    bounce_rate = _rate(hard + soft, sent)
+    bounced_contact_rate = _rate(bounced_contacts, contacts)
+
+    result = OrderedDict()
+    order = sorted(range(len(lists.categories)),
+                   key=lambda i: _sort_key(lists.categories[i]))
+    for i in order:
+        result[lists.categories[i]] = OrderedDict([
+            ('contacts', int(contacts[i])),
+            ('sent', int(sent[i])),
+            ('hard_bounces', int(hard[i])),
+            ('soft_bounces', int(soft[i])),
+            ('bounced_contacts', int(bounced_contacts[i])),
+            ('bounce_rate', float(bounce_rate[i])),
+            ('bounced_contact_rate', float(bounced_contact_rate[i])),
+        ])
+    return result
+
+
+def domain_stats(columns, top=10):
+    """
+    The `top` email domains by contact count, with their share of contacts.
+    """
+    counts = columns.domain.counts()
+    total = max(len(columns), 1)
+    order = np.argsort(-counts, kind='stable')[:top]
+    return OrderedDict(
+        (columns.domain.categories[i] or '(none)', OrderedDict([
+            ('contacts', int(counts[i])),
+            ('share', float(counts[i]) / total),
+        ]))
+        for i in order)
+
+
+def send_stats(columns, buckets=SEND_BUCKETS):
+    """
+    Totals and distribution of `sentcnt`.
+
+    `buckets` are the lower bounds of the histogram buckets; the last one
+    is open-ended.
+    """
+    sent = columns.sentcnt
+    bucket = np.searchsorted(np.asarray(buckets), sent, side='right') - 1
+    counts = np.bincount(bucket[bucket >= 0], minlength=len(buckets))
+    histogram = OrderedDict()
+    for i, low in enumerate(buckets):
+        if i == len(buckets) - 1:
+            label = '{}+'.format(low)
+        elif buckets[i + 1] - low == 1:
+            label = str(low)
+        else:
+            label = '{}-{}'.format(low, buckets[i + 1] - 1)
+        histogram[label] = int(counts[i])
+    empty = not len(sent)
+    return OrderedDict([
+        ('total', int(sent.sum())),
+        ('mean', 0.0 if empty else float(sent.mean())),
+        ('median', 0.0 if empty else float(np.median(sent))),
+        ('max', 0 if empty else int(sent.max())),
+        ('histogram', histogram),
+    ])
+
+
+def signup_histogram(columns, freq='M'):
+    """
+    Number of contacts per signup (`sdate`) period.
+
+    `freq` is one of D, W, M or Y; weeks start on Monday (ISO weeks) and are
+    labelled with that Monday. Contacts without a signup date are left out.
+    """
+    if freq not in FREQUENCIES:
+        raise ValueError('freq must be one of {}'.format(
+            ', '.join(FREQUENCIES)))
+    dates = columns.sdate[~np.isnat(columns.sdate)]
+    if freq == 'W':
+        # datetime64[W] weeks start on Thursday, like the 1970-01-01 epoch:
+        # shift them to Monday.
+        shift = np.timedelta64(3, 'D')
+        days = dates.astype('datetime64[D]') + shift
+        periods = days.astype('datetime64[W]').astype('datetime64[D]') - shift
+    else:
+        periods = dates.astype('datetime64[{}]'.format(freq))
+    periods, counts = np.unique(periods, return_counts=True)
+    return OrderedDict((str(period), int(count))
+                       for period, count in zip(periods, counts))
+
+
+def contact_stats(columns, freq='M', top=10):
+    """
+    All aggregates for a set of contacts.
+
+    Parameters
+    ----------
+    columns:
+        `ContactColumns`.
+    freq:
+        Signup histogram period: D, W, M or Y.
+    top:
+        Number of email domains to report.
+
+    Returns
+    -------
+    OrderedDict
+        `contacts`, `lists`, `domains`, `sends` and `signups`.
+    """
+    return OrderedDict([
+        ('contacts', len(columns)),
+        ('lists', list_stats(columns)),
+        ('domains', domain_stats(columns, top=top)),
+        ('sends', send_stats(columns)),
+        ('signups', signup_histogram(columns, freq=freq)),
+    ])
+
+
+def format_stats(stats, freq='M'):
+    """
+    Render `contact_stats` output as text tables.
+    """
+    lines = ['{} contacts'.format(stats['contacts']), '']
+
+    columns = ['contacts', 'sent', 'hard', 'soft', 'bounced', 'bounce%',
+               'bounced%']
+    lines.append('{:<12}'.format('list')
+                 + ''.join('{:>10}'.format(c) for c in columns))
+    for list_id, s in stats['lists'].items():
+        values = [s['contacts'], s['sent'], s['hard_bounces'],
+                  s['soft_bounces'], s['bounced_contacts'],
+                  '{:.2f}'.format(s['bounce_rate'] * 100),
+                  '{:.2f}'.format(s['bounced_contact_rate'] * 100)]
+        lines.append('{:<12}'.format(list_id)
+                     + ''.join('{:>10}'.format(v) for v in values))
+
+    header = '{:<32}{:>10}{:>10}'.format('domain', 'contacts', 'share%')
+    lines.extend(['', header])
+    for domain, s in stats['domains'].items():
+        lines.append('{:<32}{:>10}{:>10.2f}'.format(domain, s['contacts'],
+                                                    s['share'] * 100))
+
+    sends = stats['sends']
+    lines.extend(['', 'sends: total {total}, mean {mean:.2f}, '
+                      'median {median:g}, max {max}'.format(**sends)])
+    for label, count in sends['histogram'].items():
+        lines.append('  {:<12}{:>10}'.format(label, count))
+
+    lines.extend(['', 'signups per {}:'.format(FREQUENCIES[freq])])
+    for period, count in stats['signups'].items():
+        lines.append('  {:<12}{:>10}'.format(period, count))
+    return '\n'.join(lines)
@@ -0,0 +1,530 @@
+# -*- coding: utf-8 -*-
+
+"""
+Local stand-in for the ActiveCampaign v1 API.
+
+`StubBackend` answers API actions from an in-memory account and `StubServer`
+exposes it over HTTP on localhost, so the resource classes can be exercised
+end to end (benchmarks, load tests) without a real account.
+"""
+
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+
+STUB_API_KEY = 'stub-api-key'
+
+
+class StubConfig:
+    """
+    Config object pointing the resources at a stub server.
+
+    Mirrors the attributes of `activecampaign_takehome.Config` without
+    reading a .env file.
+    """
+    def __init__(self, base_url, api_key=STUB_API_KEY):
+        self.API_KEY = api_key
+        self.ACCOUNT = 'stub'
+        self.DOMAIN = 'localhost'
+        self.API_OUTPUT = 'json'
+        self.BASE_URL = base_url
+        self.keys = ['API_KEY', 'ACCOUNT', 'DOMAIN', 'API_OUTPUT', 'BASE_URL']
+
+    def __repr__(self):
+        return "\n".join("{}: {}".format(k, getattr(self, k))
+                         for k in self.keys)
+
+
+def make_contact(_id, list_id='1'):
+    """
+    Build a contact record shaped like a `contact_list` (full=1) entry.
+    """
+    _id = str(_id)
+    sdate = '2018-07-11 09:18:35'
+    list_entry = {
+        'id': _id, 'subscriberid': _id, 'listid': list_id, 'formid': '0',
+        'seriesid': '0', 'sdate': sdate, 'udate': '0000-00-00 00:00:00',
+        'status': '1', 'responder': '1', 'sync': '0', 'unsubreason': '',
+        'unsubcampaignid': '0', 'unsubmessageid': '0',
+        'first_name': 'Stub', 'last_name': _id, 'ip4_sub': '0',
+        'sourceid': '10', 'sourceid_autosync': '0', 'ip4_last': '0',
+        'ip4_unsub': '0', 'listname': 'Stub List {}'.format(list_id),
+        'sdate_iso': '2018-07-11T09:18:35-05:00',
+    }
+    contact = dict(list_entry)
+    contact.update({
+        'udate': '2018-07-11 09:18:27', 'lid': list_id, 'ip4': '0.0.0.0',
+        'a_unsub_time': '00:00:00', 'a_unsub_date': '0000-00-00',
+        'cdate': '2018-07-11 09:18:27',
+        'email': 'stub{}@example.com'.format(_id), 'phone': '',
+        'orgid': '1', 'orgname': 'Stub Accounts', 'segmentio_id': '',
+        'bounced_hard': '0', 'bounced_soft': '0', 'bounced_date': '0000-00-00',
+        'ip': '0.0.0.0', 'ua': '', 'hash': '{:032x}'.format(int(_id)),
+        'socialdata_lastcheck': '0000-00-00 00:00:00',
+        'email_local': '', 'email_domain': '', 'sentcnt': '0', 'rating': '0',
+        'rating_tstamp': '0000-00-00', 'gravatar': '1', 'deleted': '0',
+        'anonymized': '0', 'adate': '2018-07-13 11:53:52',
+        'edate': '0000-00-00 00:00:00', 'deleted_at': '0000-00-00 00:00:00',
+        'name': 'Stub {}'.format(_id),
+        'lists': {list_id: list_entry},
+        'listslist': list_id,
+        'fields': [],
+        'actions': [{
+            'text': 'Subscribed to list - Stub List {}'.format(list_id),
+            'type': 'subscribe',
+            'tstamp': '2018-07-11T09:18:35-05:00',
+        }],
+        'automation_history': [],
+        'campaign_history': [],
+        'bounces': {'mailing': [], 'mailings': 0, 'responder': [],
+                    'responders': 0},
+        'bouncescnt': 0,
+        'tags': [],
+        'geo': [],
+    })
+    return contact
+
+
+# Keys only returned by `contact_list` when `full=1`.
+CONTACT_FULL_KEYS = [
+    'lists', 'listslist', 'fields', 'actions', 'automation_history',
+    'campaign_history', 'bounces', 'bouncescnt', 'tags', 'geo',
+]
+
+
+def _result(code, message, **extra):
+    result = dict(extra)
+    result.update({
+        'result_code': code,
+        'result_message': message,
+        'result_output': 'json',
+    })
+    return result
+
+
+def _nothing_returned():
+    return _result(0, 'Failed: Nothing is returned')
+
+
+def _numbered(records):
+    """Lay records out the way the list actions do: "0", "1", ... keys."""
+    result = {str(i): r for i, r in enumerate(records)}
+    result.update(_result(1, 'Success: Something is returned'))
+    return result
+
+
+def _posted_lists(data):
+    """List IDs of the `p[<id>]` fields of a contact post."""
+    return [v for k, v in sorted(data.items()) if k.startswith('p[')]
+
+
+def _ids(value, available):
+    if value is None:
+        return None
+    if value.lower() == 'all':
+        return list(available)
+    return [i for i in value.split(',') if i in available]
+
+
+class StubBackend:
+    """
+    In-memory ActiveCampaign account.
+
+    Each supported action is a `action_<api_action>` method receiving the
+    query parameters and the form data, and returning the decoded JSON
+    payload the real API would send back.
+
+    Parameters
+    ----------
+    contacts:
+        Number of synthetic contacts to create.
+    campaigns, messages, lists:
+        Number of synthetic campaigns, messages and lists to create.
+    latency:
+        Seconds to sleep before answering each call, to mimic network and
+        server time.
+    page_size:
+        Records per page for the paginated list actions.
+    broken_actions:
+        Actions answering "Nothing is returned" whatever they are asked,
+        the way `message_list` does on some accounts.
+    """
+    page_size = 20
+
+    def __init__(self, contacts=100, campaigns=3, messages=3, lists=2,
+                 latency=0.0, page_size=None, api_key=STUB_API_KEY,
+                 broken_actions=()):
+        self.api_key = api_key
+        self.latency = latency
+        self.broken_actions = frozenset(broken_actions)
+        if page_size is not None:
+            self.page_size = page_size
+        self.lock = threading.Lock()
+        self.calls = Counter()
+        # Calls of each action being answered, and the most at any one time.
+        self.in_flight = Counter()
+        self.max_in_flight = Counter()
+        self.contacts = {}
+        for i in range(1, contacts + 1):
+            list_id = str((i - 1) % max(lists, 1) + 1)
+            self.contacts[str(i)] = make_contact(i, list_id=list_id)
+        self.emails = {c['email']: _id for _id, c in self.contacts.items()}
+        self.next_contact_id = contacts + 1
+        self.lists = {
+            str(i): {'id': str(i), 'listid': str(i),
+                     'name': 'Stub List {}'.format(i),
+                     'stringid': 'stub-list-{}'.format(i), 'subscribers': '0'}
+            for i in range(1, lists + 1)
+        }
+        self.messages = {
+            str(i): {'id': str(i), 'format': 'text',
+                     'subject': 'Stub message {}'.format(i),
+                     'fromemail': 'sender@example.com',
+                     'fromname': 'Stub Sender',
+                     'reply2': 'sender@example.com', 'priority': '3',
+                     'charset': 'utf-8', 'encoding': 'quoted-printable',
+                     'text': 'Stub body {}'.format(i)}
+            for i in range(1, messages + 1)
+        }
+        self.next_message_id = messages + 1
+        self.campaigns = {
+            str(i): {'id': str(i), 'name': 'Stub campaign {}'.format(i),
+                     'type': 'single', 'status': '0', 'public': '0',
+                     'sdate': '2018-07-11 09:18:35',
+                     'cdate': '2018-07-11 09:18:35', 'send_amt': '0'}
+            for i in range(1, campaigns + 1)
+        }
+        self.next_campaign_id = campaigns + 1
+        self.addresses = {}
+        self.next_address_id = 1
+
+    def handle(self, method, params, data=None):
+        """
+        Answer a single API call.
+        """
+        params = dict(params or {})
+        data = dict(data or {})
+        api_action = params.get('api_action')
+        if params.get('api_key') != self.api_key:
+            return ("<?xml version='1.0' encoding='utf-8'?>\n"
+                    "<root><error>You are not authorized to access this file"
+                    "</error></root>")
+        with self.lock:
+            self.calls[api_action] += 1
+            self.in_flight[api_action] += 1
+            self.max_in_flight[api_action] = max(
+                self.max_in_flight[api_action], self.in_flight[api_action])
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            if api_action in self.broken_actions:
+                return _nothing_returned()
+            handler = getattr(self, 'action_{}'.format(api_action), None)
+            if handler is None:
+                return _result(0, 'Unknown API action: {}'.format(api_action))
+            return handler(params, data)
+        finally:
+            with self.lock:
+                self.in_flight[api_action] -= 1
+
+    def _page(self, records, params):
+        try:
+            page = int(params.get('page') or 1)
+        except ValueError:
+            page = 1
+        start = (page - 1) * self.page_size
+        return records[start:start + self.page_size]
+
+    # Contacts
+
+    def action_contact_list(self, params, data):
+        ids = _ids(params.get('ids'), self.contacts)
+        if not ids:
+            return _nothing_returned()
+        records = self._page([self.contacts[i] for i in ids], params)
+        if not records:
+            return _nothing_returned()
+        if str(params.get('full', '0')) != '1':
+            records = [
+                {k: v for k, v in r.items() if k not in CONTACT_FULL_KEYS}
+                for r in records
+            ]
+        return _numbered(records)
+
+    def action_contact_add(self, params, data):
+        email = data.get('email')
+        if not email or '@' not in email:
+            return _result(0, 'Contact Email Address is not valid.')
+        with self.lock:
+            if email in self.emails:
+                return _result(0, 'You selected a list that does not allow '
+                               'duplicates. This email is in the system '
+                               'already, please edit that contact instead.')
+            _id = str(self.next_contact_id)
+            self.next_contact_id += 1
+            contact = make_contact(_id)
+            contact.update({
+                'email': email,
+                'first_name': data.get('first_name', ''),
+                'last_name': data.get('last_name', ''),
+                'phone': data.get('phone', ''),
+            })
+            self.contacts[_id] = contact
+            self.emails[email] = _id
+        return _result(1, 'Contact added', subscriber_id=int(_id),
+                       sendlast_should=0, sendlast_did=0)
+
+    def action_contact_edit(self, params, data):
+        with self.lock:
+            contact = self.contacts.get(str(data.get('id')))
+            if contact is None:
+                return _result(0, 'Contact not found')
+            email = data.get('email', contact['email'])
+            if email != contact['email']:
+                self.emails.pop(contact['email'], None)
+                self.emails[email] = contact['id']
+            contact['email'] = email
+            for key in ['first_name', 'last_name', 'phone']:
+                if key in data:
+                    contact[key] = data[key]
+            # overwrite=1 replaces the lists and tags; else the posted ones
+            # are added.
+            overwrite = data.get('overwrite', '1') == '1'
+            lists = {} if overwrite else dict(contact['lists'])
+            for list_id in _posted_lists(data):
+                lists[list_id] = (
+                    contact['lists'].get(list_id)
+                    or make_contact(contact['id'], list_id)['lists'][list_id])
+            if lists or overwrite:
+                contact['lists'] = lists
+                contact['listslist'] = ','.join(lists)
+            tags = [t for t in (data.get('tags') or '').split(',') if t]
+            if not overwrite:
+                tags = contact['tags'] + [t for t in tags
+                                          if t not in contact['tags']]
+            contact['tags'] = tags
+        return _result(1, 'Contact updated', subscriber_id=int(contact['id']))
+
+    def action_contact_delete(self, params, data):
+        with self.lock:
+            contact = self.contacts.pop(str(params.get('id')), None)
+            if contact is not None:
+                self.emails.pop(contact['email'], None)
+        return _result(1, 'Contact deleted')
+
+    def action_contact_delete_list(self, params, data):
+        ids = [i for i in (params.get('ids') or '').split(',') if i]
+        if not ids:
+            return _result(0, 'No contacts selected')
+        with self.lock:
+            for _id in ids:
+                contact = self.contacts.pop(_id, None)
+                if contact is not None:
+                    self.emails.pop(contact['email'], None)
+        return _result(1, 'Contacts deleted')
+
+    # Lists
+
+    def action_list_list(self, params, data):
+        ids = _ids(params.get('ids'), self.lists)
+        if not ids:
+            return _nothing_returned()
+        return _numbered([self.lists[i] for i in ids])
+
+    # Messages
+
+    def action_message_list(self, params, data):
+        ids = _ids(params.get('ids'), self.messages)
+        if not ids:
+            return _nothing_returned()
+        return _numbered(self._page([self.messages[i] for i in ids], params))
+
+    def action_message_view(self, params, data):
+        message = self.messages.get(str(params.get('id')))
+        if message is None:
+            return _result(0, 'Message not found')
+        return _result(1, 'Message found', **message)
+
+    def action_message_add(self, params, data):
+        with self.lock:
+            _id = str(self.next_message_id)
+            self.next_message_id += 1
+            message = {k: v for k, v in data.items() if not k.startswith('p[')}
+            message['id'] = _id
+            self.messages[_id] = message
+        return _result(1, 'Message added', id=int(_id))
+
+    def action_message_delete(self, params, data):
+        with self.lock:
+            self.messages.pop(str(params.get('id')), None)
+        return _result(1, 'Message(s) deleted')
+
+    def action_message_delete_list(self, params, data):
+        ids = [i for i in (params.get('ids') or '').split(',') if i]
+        if not ids:
+            return _result(0, 'No messages selected')
+        with self.lock:
+            for _id in ids:
+                self.messages.pop(_id, None)
+        return _result(1, 'Message(s) deleted')
+
+    # Addresses
+
+    def action_address_add(self, params, data):
+        with self.lock:
+            _id = str(self.next_address_id)
+            self.next_address_id += 1
+            address = {k: v for k, v in data.items() if not k.startswith('p[')}
+            address['id'] = _id
+            self.addresses[_id] = address
+        return _result(1, 'Address added', id=int(_id))
+
+    def action_address_delete(self, params, data):
+        with self.lock:
+            address = self.addresses.pop(str(params.get('id')), None)
+        if address is None:
+            return _result(0, 'Address not found')
+        return _result(1, 'Address deleted')
+
+    def action_address_delete_list(self, params, data):
+        ids = [i for i in (params.get('ids') or '').split(',') if i]
+        with self.lock:
+            # All or nothing, so the IDs of a failed batch can be retried one
+            # by one.
+            if not ids or any(_id not in self.addresses for _id in ids):
+                return _result(0, 'Address not found')
+            for _id in ids:
+                del self.addresses[_id]
+        return _result(1, 'Address(es) deleted')
+
+    # Campaigns
+
+    def action_campaign_list(self, params, data):
+        ids = _ids(params.get('ids'), self.campaigns)
+        if not ids:
+            return _nothing_returned()
+        return _numbered(self._page([self.campaigns[i] for i in ids], params))
+
+    def action_campaign_create(self, params, data):
+        with self.lock:
+            _id = str(self.next_campaign_id)
+            self.next_campaign_id += 1
+            campaign = {k: v for k, v in data.items()
+                        if not k.startswith(('p[', 'm['))}
+            campaign['id'] = _id
+            self.campaigns[_id] = campaign
+        return _result(1, 'Campaign saved', id=int(_id))
+
+    def action_campaign_send(self, params, data):
+        if str(params.get('campaignid')) not in self.campaigns:
+            return _result(0, 'Campaign not found')
+        return _result(1, 'Campaign sent')
+
+    def action_campaign_status(self, params, data):
+        campaign = self.campaigns.get(str(params.get('id')))
+        if campaign is None:
+            return _result(0, 'Campaign not found')
+        campaign['status'] = params.get('status')
+        return _result(1, 'Campaign status changed')
+
+
+class _StubRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; avoid Nagle stalls on
+    # keep-alive connections.
+    disable_nagle_algorithm = True
+
+    def _respond(self, method, data):
+        parsed = urlparse(self.path)
+        if parsed.path != self.server.base_path:
+            self.send_error(404)
+            return
+        params = dict(parse_qsl(parsed.query, keep_blank_values=True))
+        result = self.server.backend.handle(method, params, data)
+        body = json.dumps(result).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._respond('GET', {})
+
+    def do_POST(self):
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            body = self._read_chunked()
+        else:
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length)
+        data = dict(parse_qsl(body.decode('utf-8'), keep_blank_values=True))
+        self._respond('POST', data)
+
+    def _read_chunked(self):
+        chunks = []
+        while True:
+            size = int(self.rfile.readline().split(b';')[0].strip(), 16)
+            if size == 0:
+                self.rfile.readline()
+                return b''.join(chunks)
+            chunks.append(self.rfile.read(size))
+            self.rfile.readline()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The socketserver default of 5 drops connections under concurrent load.
+    request_queue_size = 128
+
+
+class StubServer:
+    """
+    Serve a `StubBackend` over HTTP on localhost from a background thread.
+
+    Usable as a context manager::
+
+        with StubServer(StubBackend(contacts=1000)) as server:
+            resource = ContactsResource(server.config())
+            resource.get(page=1)
+    """
+    base_path = '/admin/api.php'
+
+    def __init__(self, backend=None, host='127.0.0.1', port=0):
+        self.backend = backend if backend is not None else StubBackend()
+        self.httpd = _StubHTTPServer((host, port), _StubRequestHandler)
+        self.httpd.backend = self.backend
+        self.httpd.base_path = self.base_path
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return 'http://{}:{}'.format(host, port)
+
+    def config(self):
+        return StubConfig(self.base_url, api_key=self.backend.api_key)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever,
+                                       daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self.thread is not None:
+            self.thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
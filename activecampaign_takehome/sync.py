@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+
+"""
+Diff-based contact upsert.
+
+A local snapshot (SQLite) remembers, for every synced email, the contact ID
+and a hash of what was last sent: the `ContactDetailsSchema` fields, list
+memberships and tags. On re-sync only new contacts (`contact_add`) and
+changed ones (`contact_edit`) are sent, so the cost scales with the number
+of changes rather than with the size of the list.
+
+Edits are sent with `overwrite` '1': the input is the whole record, and
+lists, tags and fields it leaves out are removed from the contact, as the
+hash assumes.
+"""
+
+import hashlib
+import json
+import sqlite3
+from collections import OrderedDict
+
+from activecampaign_takehome import schemas
+from activecampaign_takehome.concurrency import imap_bounded, outcome
+from activecampaign_takehome.importer import normalize_email
+
+
+HASHED_FIELDS = sorted(schemas.ContactDetailsSchema().fields)
+
+
+def contact_hash(contact):
+    """
+    Hash of the contact's details, list memberships and tags.
+
+    Emails are compared case-insensitively and list IDs and tags are
+    order-independent.
+    """
+    normalized = {}
+    for field in HASHED_FIELDS:
+        value = contact.get(field)
+        if field == 'email':
+            value = normalize_email(value)
+        elif field == 'tags':
+            value = sorted(value or [])
+        elif value is None:
+            value = ''
+        normalized[field] = value
+    list_ids = contact.get('list_id') or []
+    normalized['list_id'] = sorted(str(_id) for _id in list_ids)
+    encoded = json.dumps(normalized, sort_keys=True,
+                         separators=(',', ':')).encode('utf-8')
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+class ContactSnapshot:
+    """
+    SQLite table of email -> (contact ID, hash) for the contacts last synced.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS contacts ('
+            'email TEXT PRIMARY KEY, contact_id TEXT, hash TEXT)')
+        self.conn.commit()
+
+    def get(self, email):
+        """
+        Return `(contact_id, hash)` for `email`, or None.
+        """
+        return self.conn.execute(
+            'SELECT contact_id, hash FROM contacts WHERE email = ?',
+            (normalize_email(email),)).fetchone()
+
+    def put(self, email, contact_id, _hash):
+        self.conn.execute(
+            'INSERT OR REPLACE INTO contacts (email, contact_id, hash) '
+            'VALUES (?, ?, ?)',
+            (normalize_email(email),
+             None if contact_id is None else str(contact_id), _hash))
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM contacts').fetchone()[0]
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def seed_from_export(self, path):
+        """
+        Record contact IDs and hashes from a JSON lines contact export.
+
+        The hash covers the exported details and lists; contacts whose tags
+        or other fields differ from the incoming data are edited on the next
+        sync.
+        """
+        count = 0
+        with open(path, 'r') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                details = dict(record.get('contact_details') or {})
+                details['list_id'] = [
+                    membership.get('listid')
+                    for membership in record.get('lists') or []
+                    if membership.get('listid')]
+                details['tags'] = record.get('tags') or []
+                if details.get('email'):
+                    self.put(details['email'], record.get('id'),
+                             contact_hash(details))
+                    count += 1
+        self.commit()
+        return count
+
+
+class UpsertReport:
+    """
+    Outcome counts of an upsert run.
+    """
+    def __init__(self):
+        self.rows = 0
+        self.unchanged = 0
+        self.created = 0
+        self.updated = 0
+        self.failed = 0
+        self.failures = []
+
+    @property
+    def calls(self):
+        return self.created + self.updated + self.failed
+
+    def as_dict(self):
+        return OrderedDict([
+            ('rows', self.rows),
+            ('unchanged', self.unchanged),
+            ('created', self.created),
+            ('updated', self.updated),
+            ('failed', self.failed),
+            ('calls', self.calls),
+        ])
+
+    def __repr__(self):
+        return "\n".join("{}: {}".format(k, v)
+                         for k, v in self.as_dict().items())
+
+
+def upsert_contacts(resource, contacts, snapshot, max_workers=1, dry_run=False,
+                    imap=imap_bounded):
+    """
+    Send only new or changed contacts, and update the snapshot.
+
+    Parameters
+    ----------
+    resource:
+        `ContactsResource`; `create` is used for new contacts, `edit` (with
+        `overwrite` '1') for contacts already in the snapshot.
+    contacts:
+        Iterable of contact dicts as passed to `ContactsResource.create`.
+    snapshot:
+        `ContactSnapshot` of the previous sync.
+    max_workers:
+        Concurrent API calls.
+    dry_run:
+        Classify the contacts without calling the API or touching the snapshot.
+    imap:
+        Runs the calls; `concurrency.imap_bounded` or `runner.Runner.imap`.
+
+    Returns
+    -------
+    UpsertReport
+    """
+    report = UpsertReport()
+
+    def changes():
+        for row_number, contact in enumerate(contacts, 1):
+            report.rows += 1
+            _hash = contact_hash(contact)
+            previous = snapshot.get(contact.get('email'))
+            if previous is not None and previous[1] == _hash:
+                report.unchanged += 1
+                continue
+            contact_id = previous[0] if previous is not None else None
+            if dry_run:
+                if contact_id is None:
+                    report.created += 1
+                else:
+                    report.updated += 1
+                continue
+            yield row_number, contact, contact_id, _hash
+
+    def send(item):
+        row_number, contact, contact_id, _hash = item
+        if contact_id is None:
+            return resource.create(contact)
+        data = dict(contact)
+        data['id'] = contact_id
+        data['overwrite'] = '1'
+        return resource.edit(data)
+
+    for item, future in imap(send, changes(), max_workers=max_workers):
+        row_number, contact, contact_id, _hash = item
+        ok, result, message = outcome(future)
+        if not ok:
+            report.failed += 1
+            report.failures.append((row_number, contact.get('email'), message))
+            continue
+        if contact_id is None:
+            report.created += 1
+            contact_id = result.get('subscriber_id')
+        else:
+            report.updated += 1
+        snapshot.put(contact['email'], contact_id, _hash)
+    if not dry_run:
+        snapshot.commit()
+    report.failures.sort()
+    return report
@@ -0,0 +1,358 @@
+# -*- coding: utf-8 -*-
+
+"""
+HTTP transports used by `Api` to talk to the API.
+
+A transport has a single `request` method taking the method, URL, query
+parameters, form data and headers, and returns a response object with a
+`status_code` and a `json()` method.
+
+- `RequestsTransport` (default) uses `requests`.
+- `ThreadLocalRequestsTransport` keeps one `requests.Session` per thread,
+  for clients shared by a thread pool.
+- `Urllib3Transport` uses a `urllib3` connection pool directly, skipping
+  the per-call session and adapter setup of `requests`.
+- `InMemoryTransport` hands the call to a Python function, e.g.
+  `StubBackend.handle`, without any networking.
+- `RateLimitedTransport` wraps another transport to cap its calls per second.
+
+`cassette` adds transports recording calls to a file and replaying them.
+"""
+
+import io
+import json
+import os
+import threading
+import time
+from urllib.parse import parse_qsl, quote_plus, urlencode
+
+import requests
+import urllib3
+
+
+# Bytes left as-is by `quote_plus`; the space becomes a single '+'.
+_UNESCAPED = (b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+              b'0123456789_.-~ ')
+
+
+class StreamingForm:
+    """
+    URL-encoded form body produced incrementally.
+
+    `fields` holds ordinary values; `streams` maps field names to large
+    values given as paths (`os.PathLike`) or file objects, which are read
+    and encoded `chunk_size` bytes at a time while the request is sent. The
+    encoded body is never built in memory.
+
+    When every stream can be re-read (paths and seekable files) the encoded
+    length is computed up front, so the body goes out with a Content-Length;
+    otherwise it is sent with chunked transfer encoding.
+    """
+    chunk_size = 64 * 1024
+
+    def __init__(self, fields, streams, chunk_size=None):
+        self.fields = fields
+        self.streams = streams
+        if chunk_size is not None:
+            self.chunk_size = chunk_size
+        self._starts = {}
+        for name, source in streams.items():
+            if not isinstance(source, os.PathLike) and _seekable(source):
+                self._starts[name] = source.tell()
+        self._length = None
+
+    def _chunks(self, name, source):
+        if isinstance(source, os.PathLike):
+            with open(source, 'rb') as f:
+                yield from iter(lambda: f.read(self.chunk_size), b'')
+            return
+        if name in self._starts:
+            source.seek(self._starts[name])
+        empty = source.read(0)
+        for chunk in iter(lambda: source.read(self.chunk_size), empty):
+            yield chunk.encode('utf-8') if isinstance(chunk, str) else chunk
+
+    def _replayable(self):
+        return all(isinstance(s, os.PathLike) or name in self._starts
+                   for name, s in self.streams.items())
+
+    def __iter__(self):
+        separator = ''
+        if self.fields:
+            yield urlencode(self.fields).encode('ascii')
+            separator = '&'
+        for name, source in self.streams.items():
+            yield '{}{}='.format(separator, quote_plus(name)).encode('ascii')
+            separator = '&'
+            for chunk in self._chunks(name, source):
+                yield quote_plus(chunk).encode('ascii')
+
+    def __bool__(self):
+        # `requests` replaces falsy bodies with {}; a form of unknown length
+        # is not empty.
+        return True
+
+    def __len__(self):
+        """
+        Encoded size in bytes, or 0 when a stream cannot be read twice.
+        """
+        if self._length is None:
+            if not self._replayable():
+                return 0
+            length = len(urlencode(self.fields)) if self.fields else 0
+            for name, source in self.streams.items():
+                length += len(quote_plus(name)) + 1 + (1 if length else 0)
+                for chunk in self._chunks(name, source):
+                    # Escaped bytes take three characters ('%XX').
+                    escaped = len(chunk.translate(None, _UNESCAPED))
+                    length += len(chunk) + 2 * escaped
+            self._length = length
+        return self._length
+
+    def to_dict(self):
+        """
+        Decode the whole form into a dict; only for small bodies and tests.
+        """
+        return dict(parse_qsl(b''.join(self).decode('ascii'),
+                              keep_blank_values=True))
+
+
+def _seekable(source):
+    try:
+        return source.seekable()
+    except (AttributeError, ValueError):
+        return False
+
+
+def is_stream_source(value):
+    """
+    True for values `StreamingForm` streams: paths and file objects.
+    """
+    return (isinstance(value, (os.PathLike, io.IOBase))
+            or hasattr(value, 'read'))
+
+
+class Response:
+    """
+    Response returned by the non-`requests` transports.
+    """
+    def __init__(self, status_code, content, headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8')
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class InMemoryResponse:
+    """
+    Response wrapping an already decoded payload.
+    """
+    status_code = 200
+
+    def __init__(self, payload, status_code=None):
+        self.payload = payload
+        if status_code is not None:
+            self.status_code = status_code
+
+    @property
+    def content(self):
+        return json.dumps(self.payload).encode('utf-8')
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8')
+
+    def json(self):
+        return self.payload
+
+
+class Transport:
+    """
+    Interface of the transports.
+    """
+    def request(self, method, url, params=None, data=None, headers=None,
+                timeout=None):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class RequestsTransport(Transport):
+    """
+    Transport based on `requests`.
+
+    Without a `session` every call goes through `requests.get` /
+    `requests.post`, opening a new connection each time. Pass a
+    `requests.Session` to reuse connections.
+    """
+    def __init__(self, session=None):
+        self.session = session
+
+    def request(self, method, url, params=None, data=None, headers=None,
+                timeout=None):
+        client = self.session if self.session is not None else requests
+        if method == 'GET':
+            return client.get(url, params=params, timeout=timeout)
+        elif method == 'POST':
+            return client.post(url, headers=headers, params=params, data=data,
+                               timeout=timeout)
+        raise ValueError('Unsupported HTTP method: {}'.format(method))
+
+    def close(self):
+        if self.session is not None:
+            self.session.close()
+
+
+class ThreadLocalRequestsTransport(Transport):
+    """
+    Transport based on `requests` with one `requests.Session` per thread.
+
+    Sessions are not safe to share between threads; this gives every thread
+    its own, so connections are reused without locking. The transport
+    itself can be shared by any number of threads.
+    """
+    def __init__(self, make_session=requests.Session):
+        self.make_session = make_session
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.sessions = []
+
+    @property
+    def session(self):
+        session = getattr(self.local, 'session', None)
+        if session is None:
+            session = self.local.session = self.make_session()
+            with self.lock:
+                self.sessions.append(session)
+        return session
+
+    def request(self, method, url, params=None, data=None, headers=None,
+                timeout=None):
+        session = self.session
+        if method == 'GET':
+            return session.get(url, params=params, timeout=timeout)
+        elif method == 'POST':
+            return session.post(url, headers=headers, params=params, data=data,
+                                timeout=timeout)
+        raise ValueError('Unsupported HTTP method: {}'.format(method))
+
+    def close(self):
+        with self.lock:
+            sessions, self.sessions = self.sessions, []
+        for session in sessions:
+            session.close()
+        self.local = threading.local()
+
+
+class Urllib3Transport(Transport):
+    """
+    Transport using a shared `urllib3.PoolManager`.
+
+    Parameters
+    ----------
+    maxsize:
+        Connections kept per host; set it to the number of threads sharing
+        the transport.
+    """
+    def __init__(self, maxsize=10, pool=None):
+        if pool is None:
+            pool = urllib3.PoolManager(maxsize=maxsize, retries=False)
+        self.pool = pool
+
+    def request(self, method, url, params=None, data=None, headers=None,
+                timeout=None):
+        if params:
+            url = '{}?{}'.format(url, urlencode(params))
+        body = None
+        kwargs = {}
+        if isinstance(data, StreamingForm):
+            body = data
+            headers = dict(headers or {})
+            if len(data):
+                headers['Content-Length'] = str(len(data))
+            else:
+                kwargs['chunked'] = True
+        elif data is not None:
+            body = urlencode(data) if isinstance(data, dict) else data
+        if timeout is not None:
+            kwargs['timeout'] = timeout
+        resp = self.pool.request(method, url, body=body, headers=headers,
+                                 **kwargs)
+        return Response(resp.status, resp.data, resp.headers)
+
+    def close(self):
+        self.pool.clear()
+
+
+class InMemoryTransport(Transport):
+    """
+    Transport calling `handler(method, params, data)` directly.
+
+    The handler returns the decoded JSON payload the API would send; see
+    `stubserver.StubBackend.handle`.
+    """
+    def __init__(self, handler):
+        self.handler = handler
+
+    def request(self, method, url, params=None, data=None, headers=None,
+                timeout=None):
+        if isinstance(data, StreamingForm):
+            data = data.to_dict()
+        return InMemoryResponse(self.handler(method, params, data))
+
+
+class RateLimitedTransport(Transport):
+    """
+    Wrap `transport` to make at most `rate` calls per second (token bucket).
+
+    Up to `burst` calls (default: `rate`, at least 1) go out at once after
+    an idle period; calls over the limit sleep in the calling thread until
+    their turn. Safe to share between threads.
+    """
+    def __init__(self, transport, rate, burst=None, clock=time.monotonic,
+                 sleep=time.sleep):
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+        self.transport = transport
+        self.rate = rate
+        self.burst = burst or max(rate, 1)
+        self.clock = clock
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self.tokens = self.burst
+        self.updated = clock()
+        self.waited = 0.0
+
+    def acquire(self):
+        """
+        Take a token, sleeping until one is available; returns the wait.
+        """
+        with self.lock:
+            now = self.clock()
+            self.tokens = min(self.burst,
+                              self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # A negative balance reserves the next tokens for the callers
+            # already waiting.
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            self.waited += wait
+        if wait:
+            self.sleep(wait)
+        return wait
+
+    def request(self, method, url, params=None, data=None, headers=None,
+                timeout=None):
+        self.acquire()
+        return self.transport.request(method, url, params=params, data=data,
+                                      headers=headers, timeout=timeout)
+
+    def close(self):
+        self.transport.close()
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+
+"""
+Parallel pre-validation of contact import files.
+
+The CSV file is read once in the parent process and cut into chunks of
+rows. Worker processes convert each row with `importer.row_to_contact` and
+check it against `ContactSchema` (email format) and the list ID rules of
+`contact_add`, and send back only the errors they found. The parent writes
+the valid rows, unchanged and in file order, to a clean CSV file ready for
+`import_contacts`, and every error to a report keyed by row number. No API
+call is made.
+"""
+
+import csv
+import os
+import time
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+
+from activecampaign_takehome import schemas
+from activecampaign_takehome.importer import row_to_contact
+
+
+ERROR_FIELDS = ['row', 'field', 'message', 'email']
+
+
+def validate_contact(contact, schema=None):
+    """
+    Problems with a contact dict (see `row_to_contact`) that `contact_add`
+    would reject.
+
+    Returns a list of `(field, message)`; empty if the contact is valid.
+    """
+    schema = schema or schemas.ContactSchema()
+    errors = []
+    if not contact.get('email'):
+        errors.append(('email', 'Missing email address.'))
+    for field, messages in sorted(schema.validate(contact).items()):
+        errors.extend((field, message) for message in messages)
+    list_ids = contact.get('list_id') or []
+    if not list_ids:
+        errors.append(('list_id', 'At least one list ID is required.'))
+    for list_id in list_ids:
+        if not list_id.isdigit() or not int(list_id):
+            errors.append(('list_id',
+                           'Not a valid list ID: {!r}.'.format(list_id)))
+    return errors
+
+
+def validate_rows(header, rows, first_row):
+    """
+    Validate raw CSV rows numbered from `first_row`. Runs in a worker process.
+
+    Returns `(row_number, field, message, email)` for every error.
+    """
+    schema = schemas.ContactSchema()
+    errors = []
+    for row_number, values in enumerate(rows, first_row):
+        if len(values) != len(header):
+            message = 'Expected {} values, got {}.'.format(len(header),
+                                                           len(values))
+            errors.append((row_number, 'row', message, ''))
+            continue
+        contact = row_to_contact(dict(zip(header, values)))
+        for field, message in validate_contact(contact, schema):
+            errors.append((row_number, field, message,
+                           contact.get('email', '')))
+    return errors
+
+
+def _chunks(reader, chunk_size):
+    chunk = []
+    for values in reader:
+        # csv.DictReader (used by `read_contacts_csv`) skips blank lines
+        # without numbering them.
+        if not values:
+            continue
+        chunk.append(values)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def validate_import(path, clean_output, errors_output, processes=None,
+                    chunk_size=10000):
+    """
+    Validate a contact CSV file in parallel; write its valid rows and an
+    error report.
+
+    Parameters
+    ----------
+    path:
+        CSV file with a header row, as read by `import_contacts`.
+    clean_output:
+        Path of the CSV file receiving the header and every valid row.
+    errors_output:
+        Path of the CSV error report: one line per error, with the row
+        number (first data row is 1, as in `import_contacts`), field,
+        message and email.
+    processes:
+        Worker processes. Defaults to the number of CPUs.
+    chunk_size:
+        Rows per worker task.
+
+    Returns
+    -------
+    OrderedDict
+        Row counts, errors per field and elapsed seconds.
+    """
+    processes = processes or os.cpu_count() or 1
+    start = time.perf_counter()
+    rows = valid = invalid = 0
+    by_field = Counter()
+    with open(path, 'r', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None or 'email' not in header:
+            raise ValueError('{} needs a header row with an email column'
+                             .format(path))
+        with open(clean_output, 'w', newline='') as clean_file, \
+                open(errors_output, 'w', newline='') as errors_file, \
+                ProcessPoolExecutor(max_workers=processes) as pool:
+            clean = csv.writer(clean_file)
+            clean.writerow(header)
+            report = csv.writer(errors_file)
+            report.writerow(ERROR_FIELDS)
+
+            def write(first_row, chunk, future):
+                nonlocal valid, invalid
+                errors = future.result()
+                report.writerows(errors)
+                bad = set()
+                for row_number, field, _, _ in errors:
+                    bad.add(row_number)
+                    by_field[field] += 1
+                for row_number, values in enumerate(chunk, first_row):
+                    if row_number not in bad:
+                        clean.writerow(values)
+                valid += len(chunk) - len(bad)
+                invalid += len(bad)
+
+            # Chunks are written in file order; keep two per worker in flight.
+            pending = deque()
+            for chunk in _chunks(reader, chunk_size):
+                future = pool.submit(validate_rows, header, chunk, rows + 1)
+                pending.append((rows + 1, chunk, future))
+                rows += len(chunk)
+                if len(pending) >= processes * 2:
+                    write(*pending.popleft())
+            while pending:
+                write(*pending.popleft())
+    return OrderedDict([
+        ('rows', rows),
+        ('valid', valid),
+        ('invalid', invalid),
+        ('errors', sum(by_field.values())),
+        ('errors_by_field', OrderedDict(sorted(by_field.items()))),
+        ('processes', processes),
+        ('elapsed', time.perf_counter() - start),
+    ])
@@ -0,0 +1,429 @@
+# -*- coding: utf-8 -*-
+
+"""
+Durable work queue for bulk jobs, shared by worker processes via one SQLite
+file.
+
+A coordinator splits a job (contacts to import, emails to send a campaign
+to, IDs to delete) into chunks with `WorkQueue.submit`. Any number of
+`Worker`s, in processes on the same host or on hosts sharing the file,
+claim one chunk at a time under a lease and run it through the resource
+classes. While a chunk runs, a heartbeat thread of its worker renews the
+lease and records how many calls are done, however long the calls take. A
+worker that dies stops renewing; once its lease
+expires the chunk is claimed again by another worker, up to `max_attempts`
+times. `WorkQueue.status` reports every job's progress.
+
+Delivery is at least once: a chunk retried after its worker died sends its
+items again. For imports, contacts already created come back as failed
+`contact_add` calls.
+
+The file uses SQLite's default rollback journal rather than WAL, so it also
+works on a shared directory whose filesystem supports POSIX locks.
+
+Example::
+
+    queue = WorkQueue('jobs.db')
+    job_id = queue.submit('import', import_items('contacts.csv'),
+                          chunk_size=500)
+
+    # On every worker host:
+    Worker(WorkQueue('jobs.db'), Client(Config()), max_workers=8).run()
+
+    print(queue.status(job_id))
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+
+from activecampaign_takehome import importer
+from activecampaign_takehome.concurrency import imap_bounded, outcome
+
+
+PENDING = 'pending'
+LEASED = 'leased'
+DONE = 'done'
+FAILED = 'failed'
+
+Chunk = namedtuple('Chunk', ['id', 'job_id', 'kind', 'params', 'items',
+                             'attempts'])
+
+
+class LeaseLost(Exception):
+    """
+    The chunk's lease expired and another worker claimed it.
+    """
+
+
+def run_import(client, items, params, max_workers, imap):
+    report = importer.import_contacts(client.contacts, items,
+                                      max_workers=max_workers, imap=imap)
+    failures = [[email, message] for _, email, message in report.failures]
+    return report.created, failures
+
+
+def run_send(client, items, params, max_workers, imap):
+    def send(email):
+        return client.campaigns.send(email, params['campaign_id'],
+                                     params['message_id'], params['type'],
+                                     params['action'])
+
+    sent = 0
+    failures = []
+    for email, future in imap(send, items, max_workers=max_workers):
+        ok, result, message = outcome(future)
+        if ok:
+            sent += 1
+        else:
+            failures.append([email, message])
+    return sent, failures
+
+
+def run_delete(client, items, params, max_workers, imap):
+    resource = getattr(client, params['resource'])
+    report = resource.delete_many(items, max_workers=max_workers, imap=imap)
+    failures = [[_id, message] for _id, message in report.failures()]
+    return report.deleted, failures
+
+
+# Job kinds: called as `handler(client, items, params, max_workers, imap)`,
+# they return the number of items done and a list of [item, message] failures.
+HANDLERS = OrderedDict([
+    ('import', run_import),
+    ('send', run_send),
+    ('delete', run_delete),
+])
+
+
+def import_items(path):
+    """
+    The contacts of a CSV file (see `importer.read_contacts_csv`), without
+    invalid or repeated emails.
+    """
+    seen = importer.EmailIndex()
+    for contact in importer.read_contacts_csv(path):
+        email = importer.normalize_email(contact.get('email'))
+        if '@' in email and seen.add_new(email):
+            yield contact
+
+
+def read_lines(path):
+    """
+    The non-blank lines of a file, e.g. emails or IDs, one per line.
+    """
+    with open(path, 'r') as f:
+        for line in f:
+            if line.strip():
+                yield line.strip()
+
+
+class WorkQueue:
+    """
+    Jobs split into leased chunks, in a SQLite file shared by the coordinator
+    and the workers.
+
+    Parameters
+    ----------
+    path:
+        SQLite file (created if missing).
+    lease_seconds:
+        A claimed chunk goes back to the queue if its worker does not
+        renew the lease (`heartbeat`) for this long.
+    max_attempts:
+        Claims of a chunk before it is marked as failed.
+    """
+    def __init__(self, path, lease_seconds=300.0, max_attempts=3,
+                 clock=time.time):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.clock = clock
+        # Serializes the transactions of a worker and of its heartbeat thread.
+        self.lock = threading.RLock()
+        # Autocommit; writes go through `_transaction`.
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None,
+                                    check_same_thread=False)
+        self.conn.executescript(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT, params TEXT, '
+            'created REAL);'
+            'CREATE TABLE IF NOT EXISTS chunks ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, job_id INTEGER, '
+            'items TEXT, size INTEGER, state TEXT, owner TEXT, '
+            'lease_expires REAL, attempts INTEGER DEFAULT 0, '
+            'done INTEGER DEFAULT 0, failed INTEGER DEFAULT 0, '
+            'failures TEXT, error TEXT, updated REAL);'
+            'CREATE INDEX IF NOT EXISTS chunks_state ON chunks (state, id);')
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @contextmanager
+    def _transaction(self):
+        # IMMEDIATE takes the write lock up front, so two workers never claim
+        # the same chunk.
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+            self.conn.execute('COMMIT')
+
+    def submit(self, kind, items, params=None, chunk_size=500):
+        """
+        Add a job of `kind` (see `HANDLERS`) over `items`, split into chunks
+        of `chunk_size` items.
+
+        Returns the job ID.
+        """
+        if kind not in HANDLERS:
+            raise ValueError('kind must be one of {}'.format(
+                ', '.join(HANDLERS)))
+        now = self.clock()
+        with self._transaction():
+            job_id = self.conn.execute(
+                'INSERT INTO jobs (kind, params, created) VALUES (?, ?, ?)',
+                (kind, json.dumps(params or {}), now)).lastrowid
+            chunk = []
+            for item in items:
+                chunk.append(item)
+                if len(chunk) == chunk_size:
+                    self._add_chunk(job_id, chunk, now)
+                    chunk = []
+            if chunk:
+                self._add_chunk(job_id, chunk, now)
+        return job_id
+
+    def _add_chunk(self, job_id, items, now):
+        self.conn.execute(
+            'INSERT INTO chunks (job_id, items, size, state, updated) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (job_id, json.dumps(items), len(items), PENDING, now))
+
+    def claim(self, owner):
+        """
+        Lease the oldest pending (or expired) chunk to `owner`; None if
+        there is none.
+        """
+        now = self.clock()
+        with self._transaction():
+            self.conn.execute(
+                "UPDATE chunks SET state = ?, error = 'Lease expired', "
+                "updated = ? "
+                "WHERE state = ? AND lease_expires < ? AND attempts >= ?",
+                (FAILED, now, LEASED, now, self.max_attempts))
+            row = self.conn.execute(
+                'SELECT chunks.id, job_id, kind, params, items, attempts '
+                'FROM chunks JOIN jobs ON jobs.id = chunks.job_id '
+                'WHERE state = ? OR (state = ? AND lease_expires < ?) '
+                'ORDER BY chunks.id LIMIT 1',
+                (PENDING, LEASED, now)).fetchone()
+            if row is None:
+                return None
+            chunk_id, job_id, kind, params, items, attempts = row
+            self.conn.execute(
+                'UPDATE chunks SET state = ?, owner = ?, lease_expires = ?, '
+                'attempts = ?, done = 0, failed = 0, updated = ? '
+                'WHERE id = ?',
+                (LEASED, owner, now + self.lease_seconds, attempts + 1, now,
+                 chunk_id))
+        return Chunk(chunk_id, job_id, kind, json.loads(params),
+                     json.loads(items), attempts + 1)
+
+    def _update_leased(self, chunk, owner, sql, args):
+        with self._transaction():
+            updated = self.conn.execute(
+                'UPDATE chunks SET {} '
+                'WHERE id = ? AND owner = ? AND state = ?'.format(sql),
+                tuple(args) + (chunk.id, owner, LEASED)).rowcount
+        if not updated:
+            raise LeaseLost('Chunk {} is no longer leased to {}'.format(
+                chunk.id, owner))
+
+    def heartbeat(self, chunk, owner, done=0, failed=0):
+        """
+        Renew the lease of `chunk` and record its progress; raises
+        `LeaseLost` if it was claimed by another worker.
+        """
+        now = self.clock()
+        self._update_leased(
+            chunk, owner,
+            'lease_expires = ?, done = ?, failed = ?, updated = ?',
+            (now + self.lease_seconds, done, failed, now))
+
+    def complete(self, chunk, owner, done, failures):
+        """
+        Mark `chunk` as done, with the number of items done and the
+        `[item, message]` failures.
+        """
+        self._update_leased(
+            chunk, owner,
+            'state = ?, done = ?, failed = ?, failures = ?, updated = ?',
+            (DONE, done, len(failures), json.dumps(failures), self.clock()))
+
+    def release(self, chunk, owner, error):
+        """
+        Give `chunk` back after an error: it is retried, or failed after
+        `max_attempts`.
+        """
+        state = FAILED if chunk.attempts >= self.max_attempts else PENDING
+        self._update_leased(chunk, owner,
+                            'state = ?, owner = NULL, error = ?, updated = ?',
+                            (state, str(error), self.clock()))
+
+    def status(self, job_id=None):
+        """
+        Progress of every job (or of `job_id`): chunk counts per state, and
+        items done and failed.
+        """
+        now = self.clock()
+        sql = ('SELECT jobs.id, kind, COUNT(chunks.id), SUM(state = ?), '
+               'SUM(state = ? AND lease_expires >= ?), '
+               'SUM(state = ? AND lease_expires < ?), '
+               'SUM(state = ?), SUM(state = ?), '
+               'SUM(size), SUM(done), SUM(failed) '
+               'FROM jobs LEFT JOIN chunks ON chunks.job_id = jobs.id')
+        args = [PENDING, LEASED, now, LEASED, now, DONE, FAILED]
+        if job_id is not None:
+            sql += ' WHERE jobs.id = ?'
+            args.append(job_id)
+        sql += ' GROUP BY jobs.id ORDER BY jobs.id'
+        columns = ['job', 'kind', 'chunks', 'pending', 'leased', 'expired',
+                   'done', 'failed', 'items', 'items_done', 'items_failed']
+        return [OrderedDict(zip(columns,
+                                [v if v is not None else 0 for v in row]))
+                for row in self.conn.execute(sql, args)]
+
+    def failures(self, job_id):
+        """
+        `(item, message)` of every failed item of `job_id`, and
+        `(chunk ID, error)` of failed chunks.
+        """
+        rows = self.conn.execute(
+            'SELECT id, state, failures, error FROM chunks '
+            'WHERE job_id = ? ORDER BY id', (job_id,))
+        for chunk_id, state, failures, error in rows:
+            if state == FAILED:
+                yield 'chunk {}'.format(chunk_id), error
+            for item, message in json.loads(failures or '[]'):
+                yield item, message
+
+
+class Worker:
+    """
+    Claims chunks from a `WorkQueue` and runs them with `client`.
+
+    Parameters
+    ----------
+    queue:
+        `WorkQueue`.
+    client:
+        `Client` whose resources run the chunks.
+    name:
+        Lease owner; defaults to host:pid.
+    max_workers:
+        Concurrent API calls within a chunk.
+    heartbeat_interval:
+        Seconds between lease renewals while a chunk runs; keep it well
+        under the queue's `lease_seconds`. Renewals run in their own thread,
+        so a slow call does not hold them up; still give `client` a timeout
+        shorter than the lease, so a hung call cannot keep a chunk forever.
+    """
+    def __init__(self, queue, client, name=None, max_workers=4,
+                 heartbeat_interval=10.0):
+        self.queue = queue
+        self.client = client
+        self.name = name or '{}:{}'.format(socket.gethostname(), os.getpid())
+        self.max_workers = max_workers
+        self.heartbeat_interval = heartbeat_interval
+        self.counts = OrderedDict([
+            ('chunks', 0), ('items_done', 0), ('items_failed', 0),
+            ('errors', 0), ('lost', 0)])
+
+    def run_once(self):
+        """
+        Claim and run one chunk. Returns False if there was none to claim.
+        """
+        chunk = self.queue.claim(self.name)
+        if chunk is None:
+            return False
+        calls = [0]
+        stop = threading.Event()
+        lost = threading.Event()
+
+        def beat():
+            # Renew the lease and report progress until the chunk is finished.
+            while not stop.wait(self.heartbeat_interval):
+                try:
+                    self.queue.heartbeat(chunk, self.name, done=calls[0])
+                except LeaseLost:
+                    lost.set()
+                    return
+                except sqlite3.Error:
+                    # E.g. the file stayed locked past the timeout: try
+                    # again at the next beat.
+                    pass
+
+        def imap(fn, items, max_workers=1):
+            for item, future in imap_bounded(fn, items,
+                                             max_workers=max_workers):
+                if lost.is_set():
+                    raise LeaseLost('Chunk {} is no longer leased to {}'
+                                    .format(chunk.id, self.name))
+                calls[0] += 1
+                yield item, future
+
+        handler = HANDLERS[chunk.kind]
+        heartbeat = threading.Thread(
+            target=beat, name='heartbeat-{}'.format(chunk.id), daemon=True)
+        heartbeat.start()
+        try:
+            done, failures = handler(self.client, chunk.items, chunk.params,
+                                     self.max_workers, imap)
+            self.queue.complete(chunk, self.name, done, failures)
+        except LeaseLost:
+            self.counts['lost'] += 1
+            return True
+        except Exception as e:
+            self.counts['errors'] += 1
+            try:
+                self.queue.release(chunk, self.name,
+                                   '{}: {}'.format(type(e).__name__, e))
+            except LeaseLost:
+                self.counts['lost'] += 1
+            return True
+        finally:
+            stop.set()
+            heartbeat.join()
+        self.counts['chunks'] += 1
+        self.counts['items_done'] += done
+        self.counts['items_failed'] += len(failures)
+        return True
+
+    def run(self, until_empty=True, poll_interval=2.0, sleep=time.sleep):
+        """
+        Run chunks until the queue is empty, or forever (polling every
+        `poll_interval` seconds).
+
+        Returns the counts of chunks and items run by this worker.
+        """
+        while True:
+            if not self.run_once():
+                if until_empty:
+                    break
+                sleep(poll_interval)
+        return self.counts
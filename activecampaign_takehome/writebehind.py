@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+
+"""
+Write-behind contact creation.
+
+`ContactBuffer.submit` writes the contact to a local SQLite spool and
+returns right away; a background thread sends the spooled contacts with
+`ContactsResource.create` once `batch_size` of them are waiting or the
+oldest has waited `max_age` seconds. Contacts stay in the spool until the
+API has answered, so after a crash or restart they are sent by the next
+buffer opened on the same spool.
+
+Example::
+
+    buffer = ContactBuffer(ContactsResource(config), 'signups.db',
+                           batch_size=50, max_age=5)
+    # Returns immediately.
+    buffer.submit({'email': 'new@example.com', 'list_id': ['1']})
+    ...
+    buffer.close()   # drains and stops the flusher
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from activecampaign_takehome.concurrency import imap_bounded, outcome
+
+
+PENDING = 'pending'
+FAILED = 'failed'
+
+FLUSH_SIZE = 'size'
+FLUSH_AGE = 'age'
+FLUSH_DRAIN = 'drain'
+
+
+class ContactBuffer:
+    """
+    Durable write-behind buffer for `ContactsResource.create`.
+
+    Parameters
+    ----------
+    resource:
+        `ContactsResource` used to send the contacts.
+    spool_path:
+        SQLite file holding the contacts not sent yet (created if missing).
+    batch_size:
+        Flush as soon as this many contacts are waiting.
+    max_age:
+        Flush when the oldest waiting contact is this many seconds old.
+    max_workers:
+        Concurrent `contact_add` calls during a flush.
+    max_attempts:
+        Calls that raise (connection errors, timeouts, open circuits) are
+        retried after `retry_delay`, doubling per attempt; after this many
+        attempts the contact is marked as failed. Contacts rejected by the
+        API (`result_code` 0) are marked as failed right away.
+    retry_delay:
+        Seconds before the first retry.
+    start:
+        Start the background flusher. Without it, contacts are only sent
+        by `drain`.
+    """
+    def __init__(self, resource, spool_path, batch_size=50, max_age=5.0,
+                 max_workers=4, max_attempts=5, retry_delay=1.0, start=True):
+        self.resource = resource
+        self.spool_path = spool_path
+        self.batch_size = batch_size
+        self.max_age = max_age
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+
+        self.db_lock = threading.Lock()
+        self.conn = sqlite3.connect(spool_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS spool ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, contact TEXT, state TEXT, '
+            'created REAL, attempts INTEGER DEFAULT 0, '
+            'next_attempt REAL DEFAULT 0, error TEXT)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS spool_ready '
+                          'ON spool (state, next_attempt)')
+        self.conn.commit()
+
+        self.cond = threading.Condition()
+        # Submits since the flusher last looked, and how many wake it up.
+        self.unflushed = 0
+        self.wake_after = 1
+        self.drain_target = None
+        self.drains_started = 0
+        self.drains_done = 0
+        self.closing = False
+
+        self.submitted = 0
+        self.created = 0
+        self.rejected = 0
+        self.retried = 0
+        self.gave_up = 0
+        self.batches = 0
+        self.flush_seconds = 0.0
+        self.last_flush = None
+        self.reasons = Counter()
+
+        self.thread = None
+        if start:
+            self.thread = threading.Thread(target=self._run,
+                                           name='contact-buffer', daemon=True)
+            self.thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def submit(self, contact):
+        """
+        Spool `contact` for `ContactsResource.create` and return its spool ID.
+        """
+        with self.db_lock:
+            cursor = self.conn.execute(
+                'INSERT INTO spool (contact, state, created) VALUES (?, ?, ?)',
+                (json.dumps(contact), PENDING, time.time()))
+            self.conn.commit()
+        with self.cond:
+            self.submitted += 1
+            self.unflushed += 1
+            if self.unflushed == self.wake_after:
+                self.cond.notify_all()
+        return cursor.lastrowid
+
+    def drain(self, timeout=None):
+        """
+        Send every contact spooled so far and wait until the API has answered.
+
+        Each contact is tried once, even if it is waiting for a retry;
+        contacts whose call raised stay in the spool. Returns `metrics()`, or
+        raises `TimeoutError`.
+        """
+        with self.db_lock:
+            target = self.conn.execute(
+                'SELECT MAX(id) FROM spool').fetchone()[0] or 0
+        if self.thread is None:
+            self._drain_to(target)
+            return self.metrics()
+        with self.cond:
+            self.drain_target = max(self.drain_target or 0, target)
+            # Wait for a drain pass that starts after this request.
+            needed = self.drains_started + 1
+            self.cond.notify_all()
+            if not self.cond.wait_for(lambda: self.drains_done >= needed,
+                                      timeout=timeout):
+                raise TimeoutError('Contacts still pending after {}s'
+                                   .format(timeout))
+        return self.metrics()
+
+    def close(self, drain=True, timeout=None):
+        """
+        Drain (unless `drain` is False), stop the flusher and close the spool.
+        """
+        if drain:
+            self.drain(timeout=timeout)
+        with self.cond:
+            self.closing = True
+            self.cond.notify_all()
+        if self.thread is not None:
+            self.thread.join()
+        with self.db_lock:
+            self.conn.close()
+
+    def metrics(self):
+        """
+        Counters since this buffer was opened, plus the spool's contents.
+        """
+        with self.db_lock:
+            counts = dict(self.conn.execute(
+                'SELECT state, COUNT(*) FROM spool GROUP BY state').fetchall())
+        with self.cond:
+            return OrderedDict([
+                ('submitted', self.submitted),
+                ('created', self.created),
+                ('rejected', self.rejected),
+                ('retried', self.retried),
+                ('gave_up', self.gave_up),
+                ('pending', counts.get(PENDING, 0)),
+                ('failed', counts.get(FAILED, 0)),
+                ('batches', self.batches),
+                ('flush_seconds', self.flush_seconds),
+                ('last_flush', self.last_flush),
+                ('reasons', dict(self.reasons)),
+            ])
+
+    def failures(self):
+        """
+        `(spool_id, contact, error)` of the contacts marked as failed.
+        """
+        with self.db_lock:
+            rows = self.conn.execute(
+                'SELECT id, contact, error FROM spool WHERE state = ? '
+                'ORDER BY id', (FAILED,)).fetchall()
+        return [(_id, json.loads(contact), error)
+                for _id, contact, error in rows]
+
+    # Flusher
+
+    def _ready(self, now):
+        """
+        Number of contacts ready to send and the creation time of the oldest.
+        """
+        with self.db_lock:
+            return self.conn.execute(
+                'SELECT COUNT(*), MIN(created) FROM spool '
+                'WHERE state = ? AND next_attempt <= ?',
+                (PENDING, now)).fetchone()
+
+    def _next_retry(self, now):
+        with self.db_lock:
+            return self.conn.execute(
+                'SELECT MIN(next_attempt) FROM spool '
+                'WHERE state = ? AND next_attempt > ?',
+                (PENDING, now)).fetchone()[0]
+
+    def _run(self):
+        while True:
+            with self.cond:
+                if self.closing:
+                    return
+                target = self.drain_target
+                if target is not None:
+                    self.drain_target = None
+                    self.drains_started += 1
+                    number = self.drains_started
+                self.unflushed = 0
+            if target is not None:
+                self._drain_to(target)
+                with self.cond:
+                    self.drains_done = number
+                    self.cond.notify_all()
+                continue
+
+            now = time.time()
+            count, oldest = self._ready(now)
+            if count >= self.batch_size:
+                self._flush(self._select(now, self.batch_size), FLUSH_SIZE)
+                continue
+            if count and now - oldest >= self.max_age:
+                self._flush(self._select(now, self.batch_size), FLUSH_AGE)
+                continue
+
+            if count:
+                wait = oldest + self.max_age - now
+            else:
+                next_retry = self._next_retry(now)
+                wait = None if next_retry is None else next_retry - now
+            with self.cond:
+                self.wake_after = self.batch_size - count if count else 1
+                # Contacts submitted since `_ready` may already be enough.
+                if (self.unflushed < self.wake_after and not self.closing
+                        and self.drain_target is None):
+                    timeout = None if wait is None else max(wait, 0.001)
+                    self.cond.wait(timeout=timeout)
+
+    def _select(self, now, limit, after=None, upto=None):
+        with self.db_lock:
+            if after is None:
+                return self.conn.execute(
+                    'SELECT id, contact, attempts FROM spool '
+                    'WHERE state = ? AND next_attempt <= ? '
+                    'ORDER BY id LIMIT ?', (PENDING, now, limit)).fetchall()
+            return self.conn.execute(
+                'SELECT id, contact, attempts FROM spool '
+                'WHERE state = ? AND id > ? AND id <= ? ORDER BY id LIMIT ?',
+                (PENDING, after, upto, limit)).fetchall()
+
+    def _drain_to(self, target):
+        cursor = 0
+        while cursor < target:
+            rows = self._select(None, self.batch_size, after=cursor,
+                                upto=target)
+            if not rows:
+                return
+            self._flush(rows, FLUSH_DRAIN)
+            cursor = rows[-1][0]
+
+    def _flush(self, rows, reason):
+        start = time.perf_counter()
+        created = rejected = retried = gave_up = 0
+        updates = []
+        deletes = []
+
+        def send(row):
+            return self.resource.create(json.loads(row[1]))
+
+        results = imap_bounded(send, rows, max_workers=self.max_workers)
+        for (_id, contact, attempts), future in results:
+            ok, result, message = outcome(future)
+            if ok:
+                created += 1
+                deletes.append((_id,))
+            elif result is not None:
+                # The API answered: retrying would not help.
+                rejected += 1
+                updates.append((FAILED, attempts + 1, 0, message, _id))
+            elif attempts + 1 >= self.max_attempts:
+                gave_up += 1
+                updates.append((FAILED, attempts + 1, 0, message, _id))
+            else:
+                retried += 1
+                next_attempt = time.time() + self.retry_delay * 2 ** attempts
+                updates.append((PENDING, attempts + 1, next_attempt,
+                                message, _id))
+        with self.db_lock:
+            self.conn.executemany('DELETE FROM spool WHERE id = ?', deletes)
+            self.conn.executemany(
+                'UPDATE spool SET state = ?, attempts = ?, next_attempt = ?, '
+                'error = ? WHERE id = ?', updates)
+            self.conn.commit()
+
+        elapsed = time.perf_counter() - start
+        with self.cond:
+            self.created += created
+            self.rejected += rejected
+            self.retried += retried
+            self.gave_up += gave_up
+            self.batches += 1
+            self.flush_seconds += elapsed
+            self.reasons[reason] += 1
+            self.last_flush = OrderedDict([
+                ('reason', reason), ('contacts', len(rows)),
+                ('created', created), ('seconds', elapsed)])
@@ -14,6 +14,7 @@ with open('HISTORY.rst') as history_file:
 requirements = [
     'Click>=6.0',
     'requests',
+    'urllib3',
     'python-dateutil==2.7.3',
     'python-dotenv==0.8.2',
     'marshmallow==2.15.3'
@@ -23,6 +24,10 @@ setup_requirements = ['pytest-runner', ]
 
 test_requirements = ['pytest', ]
 
+extras_requirements = {
+    'stats': ['numpy'],
+}
+
 setup(
     author="MJ Berends",
     author_email='mjr.berends@gmail.com',
@@ -44,6 +49,7 @@ setup(
         ],
     },
     install_requires=requirements,
+    extras_require=extras_requirements,
     long_description=readme + '\n\n' + history,
     include_package_data=True,
     keywords='activecampaign_takehome',
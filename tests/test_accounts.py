@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for multi-account profiles and fan-out."""
+
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from activecampaign_takehome import accounts, cli
+from activecampaign_takehome import activecampaign_takehome as act
+from activecampaign_takehome.stubserver import StubBackend, StubServer
+from activecampaign_takehome.transport import (RateLimitedTransport,
+                                               Urllib3Transport)
+
+
+@pytest.fixture
+def servers():
+    with StubServer(StubBackend(contacts=3, lists=2, campaigns=1)) as eu, \
+            StubServer(StubBackend(contacts=25, lists=1, campaigns=2)) as us:
+        yield eu, us
+
+
+def write_profiles(path, servers, extra=''):
+    eu, us = servers
+    path.write(
+        '[DEFAULT]\n'
+        'domain = localhost\n'
+        'rate = 50\n'
+        '\n'
+        '[eu]\n'
+        'account = eu\n'
+        'api_key = {}\n'
+        'base_url = {}\n'
+        '\n'
+        '[us]\n'
+        'account = us\n'
+        'api_key = {}\n'
+        'base_url = {}\n'
+        'max_connections = 2\n'
+        'timeout = 5\n'.format(eu.backend.api_key, eu.base_url,
+                               us.backend.api_key, us.base_url) + extra)
+    return str(path)
+
+
+def test_load_profiles(tmpdir, servers, monkeypatch):
+    path = write_profiles(tmpdir.join('profiles.ini'), servers)
+    profiles = accounts.load_profiles(path)
+    assert list(profiles) == ['eu', 'us']
+    us = profiles['us']
+    assert us.config.ACCOUNT == 'us' and us.config.DOMAIN == 'localhost'
+    assert us.config.API_OUTPUT == 'json'
+    assert us.rate == 50.0 and us.burst is None
+    assert (us.max_connections, us.timeout) == (2, 5.0)
+
+    monkeypatch.setenv(accounts.PROFILES_ENV, path)
+    assert list(accounts.load_profiles()) == ['eu', 'us']
+    with pytest.raises(act.ConfigurationError):
+        accounts.load_profiles(str(tmpdir.join('missing.ini')))
+
+
+def test_fan_out(tmpdir, servers):
+    path = write_profiles(tmpdir.join('profiles.ini'), servers)
+    with accounts.Accounts.from_file(path) as accts:
+        client = accts.clients['us']
+        assert isinstance(client.transport, RateLimitedTransport)
+        assert isinstance(client.transport.transport, Urllib3Transport)
+        assert client.transport is not accts.clients['eu'].transport
+
+        results = accts.fan_out(accounts.fetch_contacts)
+        assert ([(r.account, r.ok, len(r.result)) for r in results]
+                == [('eu', True, 3), ('us', True, 25)])
+        records = list(accounts.merge(results))
+        assert len(records) == 28
+        assert records[0]['account'] == 'eu'
+        assert records[0]['email'] == 'stub1@example.com'
+        assert records[-1]['account'] == 'us'
+        assert records[-1]['email'] == 'stub25@example.com'
+
+        def failing(client):
+            if client.config.ACCOUNT == 'eu':
+                raise RuntimeError('boom')
+            return client.lists.get(normalize=True)
+
+        results = accts.fan_out(failing)
+        assert not results[0].ok and str(results[0].error) == 'boom'
+        assert [r['account'] for r in accounts.merge(results)] == ['us']
+
+        results = accts.fan_out(accounts.fetch_lists, names=['us'])
+        assert [r.account for r in results] == ['us']
+        with pytest.raises(KeyError):
+            accts.fan_out(accounts.fetch_lists, names=['nope'])
+
+
+def test_fan_out_command(tmpdir, servers):
+    path = write_profiles(tmpdir.join('profiles.ini'), servers)
+    result = CliRunner().invoke(cli.main, ['--format', 'jsonl', 'fan-out',
+                                           'campaigns', '--profiles-file',
+                                           path])
+    assert result.exit_code == 0, result.output
+    records = [json.loads(line) for line in result.stdout.splitlines()]
+    assert ([(r['account'], r['id']) for r in records]
+            == [('eu', '1'), ('us', '1'), ('us', '2')])
+
+    result = CliRunner().invoke(cli.main, ['--format', 'table', 'fan-out',
+                                           'lists', '--profiles-file', path,
+                                           '-a', 'eu'])
+    assert result.exit_code == 0, result.output
+    assert result.stdout.splitlines()[0].split() == ['account', 'id', 'name',
+                                                     'stringid', 'subscribers']
+    assert len(result.stdout.splitlines()) == 4
+
+    result = CliRunner().invoke(cli.main, ['fan-out', 'lists',
+                                           '--profiles-file', path,
+                                           '-a', 'nope'])
+    assert result.exit_code == 2
+    assert 'Unknown profile(s): nope' in result.stderr
+
+    bad = write_profiles(tmpdir.join('bad.ini'), servers,
+                         '\n[broken]\naccount = broken\napi_key = wrong\n'
+                         'base_url = {}\n'.format(servers[0].base_url))
+    result = CliRunner().invoke(cli.main, ['fan-out', 'lists',
+                                           '--profiles-file', bad])
+    assert result.exit_code == 1
+    assert "'eu'" in result.stdout and "'us'" in result.stdout
+    assert result.stderr.startswith('broken: ')
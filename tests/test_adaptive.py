@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the adaptive concurrency limit."""
+
+import json
+import threading
+import time
+
+import pytest
+from click.testing import CliRunner
+
+from activecampaign_takehome import activecampaign_takehome as act
+from activecampaign_takehome import cli, importer
+from activecampaign_takehome.adaptive import AdaptiveLimit
+from activecampaign_takehome.circuitbreaker import (CircuitBreakerRegistry,
+                                                    CircuitOpenError)
+from activecampaign_takehome.stubserver import (StubBackend, StubConfig,
+                                                StubServer)
+from activecampaign_takehome.transport import (InMemoryTransport, Response,
+                                               Transport)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_aimd():
+    clock = Clock()
+    limit = AdaptiveLimit(initial=2, max_limit=4, clock=clock)
+    # Not saturated: the limit stays.
+    limit.acquire()
+    limit.release(0.1)
+    assert limit.limit == 2
+    # Saturated: +1/limit per call.
+    for _ in range(2):
+        limit.acquire()
+    limit.release(0.1)
+    limit.release(0.1)
+    assert limit.limit == 2.5
+    assert limit.counts['increases'] == 1
+
+    # Throttling halves the limit, once per round trip.
+    limit.acquire()
+    limit.acquire()
+    limit.release(0.1, throttled=True)
+    limit.release(0.1, throttled=True)
+    assert limit.limit == 1.25
+    clock.now += 1
+    limit.acquire()
+    limit.release(0.1, failed=True)
+    assert limit.limit == 1
+    metrics = limit.metrics()
+    keys = ('limit', 'throttled', 'errors', 'decreases', 'max_in_flight')
+    assert [metrics[k] for k in keys] == [1, 2, 1, 2, 2]
+
+    # Latency well above the lowest recent one counts as congestion.
+    limit = AdaptiveLimit(initial=4, clock=clock, smoothing=1.0)
+    limit.acquire()
+    limit.release(0.1)
+    limit.acquire()
+    limit.release(0.5)
+    assert limit.limit == 2 and limit.counts['slow'] == 1
+
+    with pytest.raises(ValueError):
+        AdaptiveLimit(initial=10, max_limit=5)
+
+
+def test_open_breaker_leaves_limit_alone():
+    backend = StubBackend(contacts=1)
+    limit = AdaptiveLimit(initial=8)
+    breakers = CircuitBreakerRegistry(min_calls=1, window=1, reset_timeout=60)
+    resource = act.ContactsResource(
+        StubConfig('http://stub.invalid', api_key=backend.api_key),
+        transport=InMemoryTransport(backend.handle), limiter=limit,
+        breakers=breakers)
+    breakers.get('contact_delete').record(0.1, failed=True)
+    for _ in range(5):
+        with pytest.raises(CircuitOpenError):
+            resource.delete('1')
+    metrics = limit.metrics()
+    keys = ('limit', 'in_flight', 'calls', 'decreases')
+    assert [metrics[k] for k in keys] == [8, 0, 0, 0]
+
+
+def test_acquire_waits_for_a_slot():
+    limit = AdaptiveLimit(initial=1, max_limit=1)
+    limit.acquire()
+    acquired = threading.Event()
+
+    def second():
+        limit.acquire()
+        acquired.set()
+
+    thread = threading.Thread(target=second)
+    thread.start()
+    assert not acquired.wait(0.1)
+    limit.release(0.01)
+    assert acquired.wait(5)
+    thread.join()
+    assert limit.metrics()['in_flight'] == 1
+
+
+class CapacityTransport(Transport):
+    """
+    Answers 429 while over `capacity` calls are in flight, like a throttled
+    account.
+    """
+    def __init__(self, backend, capacity, latency=0.005):
+        self.backend = backend
+        self.capacity = capacity
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.throttled = 0
+
+    def request(self, method, url, params=None, data=None, headers=None,
+                timeout=None):
+        with self.lock:
+            self.in_flight += 1
+            over = self.in_flight > self.capacity
+            self.throttled += over
+        try:
+            time.sleep(self.latency)
+            if over:
+                body = json.dumps({'result_code': 0,
+                                   'result_message': 'Too many requests'})
+                return Response(429, body.encode())
+            transport = InMemoryTransport(self.backend.handle)
+            return transport.request(method, url, params, data)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+def test_limit_settles_under_account_capacity():
+    contacts = [{'email': 'c{}@example.com'.format(i), 'list_id': ['1']}
+                for i in range(300)]
+    backend = StubBackend(contacts=0)
+    transport = CapacityTransport(backend, capacity=6)
+    limit = AdaptiveLimit(initial=2, max_limit=32)
+    resource = act.ContactsResource(
+        StubConfig('http://stub.invalid', api_key=backend.api_key),
+        transport=transport, limiter=limit)
+    report = importer.import_contacts(resource, contacts, max_workers=32)
+
+    metrics = limit.metrics()
+    assert metrics['calls'] == 300
+    assert 1 <= metrics['limit'] <= 12
+    assert metrics['max_in_flight'] < 32
+    assert report.created + report.failed == 300
+    # Far fewer 429s than with 32 calls in flight.
+    assert transport.throttled < 60
+
+
+def test_adaptive_command_reports_limit():
+    with StubServer(StubBackend(contacts=5)) as server:
+        env = {'AC_BASE_URL': server.base_url,
+               'AC_API_KEY': server.backend.api_key}
+        result = CliRunner().invoke(
+            cli.main, ['delete-many', 'addresses', '1', '2', '-w', '16',
+                       '--adaptive'], env=env)
+        assert result.exit_code == 1
+        assert 'Concurrency limit 4' in result.stderr
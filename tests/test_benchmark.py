@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the stub server and the benchmark suite."""
+
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from activecampaign_takehome import activecampaign_takehome as act
+from activecampaign_takehome import benchmark
+from activecampaign_takehome.stubserver import StubBackend, StubServer
+
+
+@pytest.fixture
+def stub_server():
+    with StubServer(StubBackend(contacts=45)) as server:
+        yield server
+
+
+def test_stub_server_contacts_paging(stub_server):
+    resource = act.ContactsResource(stub_server.config())
+    assert resource.base_url == stub_server.base_url
+
+    first = resource.get(page=1)
+    assert first['result_code'] == 1
+    assert first['0']['email'] == 'stub1@example.com'
+    assert 'lists' not in first['0']
+
+    full = resource.get(full=1, page=3)
+    assert sorted(k for k in full if k.isdigit()) == ['0', '1', '2', '3', '4']
+    assert full['0']['lists']
+
+    empty = resource.get(page=4)
+    assert empty['result_code'] == 0
+
+
+def test_stub_server_contact_add(stub_server):
+    resource = act.ContactsResource(stub_server.config())
+    data = {'email': 'new@example.com', 'first_name': 'New',
+            'last_name': 'User', 'list_id': ['1']}
+    result = resource.create(data)
+    assert result['result_code'] == 1
+    assert result['subscriber_id'] == 46
+    # Duplicate emails are rejected.
+    assert resource.create(data)['result_code'] == 0
+
+
+def test_run_suite():
+    results = benchmark.run_suite(['contact_export', 'schema_dump_load'],
+                                  size=25, repeat=1)
+    assert results['metadata']['python']
+    assert results['parameters'] == {'size': 25, 'repeat': 1, 'latency': 0.0}
+    assert results['benchmarks']['contact_export']['ops'] == 25
+    assert results['benchmarks']['schema_dump_load']['ops_per_sec'] > 0
+
+
+def test_compare():
+    baseline = {'benchmarks': {
+        'a': {'median': 1.0, 'ops_per_sec': 100.0},
+        'b': {'median': 1.0, 'ops_per_sec': 100.0},
+    }}
+    results = {'benchmarks': {
+        'a': {'median': 1.05, 'ops_per_sec': 95.2},
+        'b': {'median': 1.5, 'ops_per_sec': 66.7},
+        'c': {'median': 1.0, 'ops_per_sec': 100.0},
+    }}
+    rows = benchmark.compare(results, baseline, tolerance=0.1)
+    rows = {row['name']: row for row in rows}
+    assert set(rows) == {'a', 'b'}
+    assert not rows['a']['regressed']
+    assert rows['b']['regressed']
+
+
+def test_benchmark_cli_regression(tmpdir):
+    baseline_path = str(tmpdir.join('baseline.json'))
+    with open(baseline_path, 'w') as f:
+        fast = {'median': 1e-9, 'ops_per_sec': 1e12}
+        json.dump({'benchmarks': {'schema_dump_load': fast}}, f)
+    runner = CliRunner()
+    result = runner.invoke(benchmark.main, [
+        '-b', 'schema_dump_load', '--size', '5', '--repeat', '1',
+        '--baseline', baseline_path])
+    assert result.exit_code == 1
+    assert 'REGRESSION' in result.output
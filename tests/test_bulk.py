@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the bulk deletes."""
+
+from click.testing import CliRunner
+
+from activecampaign_takehome import activecampaign_takehome as act
+from activecampaign_takehome import bulk, cli
+from activecampaign_takehome.stubserver import (StubBackend, StubConfig,
+                                                StubServer)
+from activecampaign_takehome.transport import InMemoryTransport
+
+
+def stub_client(backend):
+    config = StubConfig('http://stub.invalid', api_key=backend.api_key)
+    return act.Client(config, transport=InMemoryTransport(backend.handle))
+
+
+def test_delete_many_batches_and_retries():
+    deleted = []
+
+    def delete_one(_id):
+        if _id == '5':
+            return {'result_code': 0, 'result_message': 'Not found'}
+        deleted.append(_id)
+        return {'result_code': 1, 'result_message': 'Deleted'}
+
+    def delete_list(ids):
+        if '5' in ids:
+            return {'result_code': 0, 'result_message': 'Failed'}
+        deleted.extend(ids)
+        return {'result_code': 1, 'result_message': 'Deleted'}
+
+    ids = [str(i) for i in range(1, 11)] + ['3']
+    report = bulk.delete_many(ids, delete_one, delete_list, batch_size=4,
+                              max_workers=2)
+    assert list(report.results) == [str(i) for i in range(1, 11)]
+    assert sorted(deleted, key=int) == [str(i) for i in range(1, 11) if i != 5]
+    assert report.failures() == [('5', 'Not found')]
+    # 3 batches, then the 4 IDs of the failed one one by one.
+    assert (report.batches, report.calls) == (3, 7)
+    assert (report.deleted, report.failed) == (9, 1)
+    assert report.per_second > 0
+
+    report = bulk.delete_many('1,2,2', delete_one)
+    assert (report.calls, report.deleted) == (2, 2)
+
+
+def test_dry_run():
+    def fail(_):
+        raise AssertionError('called')
+
+    report = bulk.delete_many(range(250), fail, fail, batch_size=100,
+                              dry_run=True)
+    assert (report.calls, report.batches) == (3, 3)
+    assert (report.deleted, report.failed) == (0, 0)
+    assert report.results['0'] == (True, bulk.DRY_RUN_MESSAGE)
+    assert bulk.delete_many(range(5), fail, dry_run=True).calls == 5
+
+
+def test_resources_delete_many():
+    backend = StubBackend(contacts=30, messages=5)
+    with stub_client(backend) as client:
+        ids = [str(i) for i in range(1, 21)]
+        report = client.contacts.delete_many(ids, batch_size=10)
+        assert report.deleted == 20
+        assert backend.calls['contact_delete_list'] == 2
+        assert 'contact_delete' not in backend.calls
+        assert len(backend.contacts) == 10
+
+        report = client.messages.delete_many(['1', '2'])
+        assert report.deleted == 2
+        assert backend.calls['message_delete_list'] == 1
+        assert sorted(backend.messages) == ['3', '4', '5']
+
+        for i in range(3):
+            client.addresses.create({'company_name': 'Co {}'.format(i),
+                                     'address_1': 'Street', 'city': 'City',
+                                     'zipcode': '1000', 'country': 'US',
+                                     'list_id': '1'})
+        report = client.addresses.delete_many(['1', '9'])
+        # The batch fails on '9', and its IDs are retried one by one.
+        assert backend.calls['address_delete_list'] == 1
+        assert backend.calls['address_delete'] == 2
+        assert [_id for _id, _ in report.failures()] == ['9']
+        report = client.addresses.delete_many(['2', '3'])
+        assert report.deleted == 2
+        assert backend.calls['address_delete_list'] == 2
+        assert backend.calls['address_delete'] == 2
+        assert not backend.addresses
+
+
+def test_delete_many_command():
+    with StubServer(StubBackend(contacts=5)) as server:
+        env = {'AC_BASE_URL': server.base_url,
+               'AC_API_KEY': server.backend.api_key}
+        runner = CliRunner()
+        result = runner.invoke(cli.main, ['delete-many', 'contacts', '1', '2',
+                                          '--dry-run'], env=env)
+        assert result.exit_code == 0, result.output
+        assert 'dry_run: True' in result.stdout
+        assert len(server.backend.contacts) == 5
+
+        result = runner.invoke(cli.main, ['delete-many', 'contacts', '1', '2'],
+                               env=env)
+        assert result.exit_code == 0, result.output
+        assert 'deleted: 2' in result.stdout
+        assert sorted(server.backend.contacts) == ['3', '4', '5']
+
+        result = runner.invoke(cli.main, ['delete-many', 'addresses', '7'],
+                               env=env)
+        assert result.exit_code == 1
+        assert '7: Address not found' in result.stderr
+
+        result = runner.invoke(cli.main, ['delete-many', 'messages'], env=env)
+        assert result.exit_code == 2
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the stale-while-revalidate response cache."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from activecampaign_takehome import activecampaign_takehome as act
+from activecampaign_takehome.cache import ResponseCache
+from activecampaign_takehome.stubserver import StubBackend, StubConfig
+from activecampaign_takehome.transport import InMemoryTransport
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def counter():
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return {'result_code': 1, 'version': len(calls)}
+    return fetch, calls
+
+
+def test_strict_mode():
+    clock = Clock()
+    cache = ResponseCache(ttl=10, mode='strict', clock=clock)
+    fetch, calls = counter()
+    assert cache.get('k', fetch)['version'] == 1
+    clock.now += 9
+    assert cache.get('k', fetch)['version'] == 1
+    clock.now += 1
+    assert cache.get('k', fetch)['version'] == 2
+    assert len(calls) == 2
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 2, 1)
+
+    with pytest.raises(ValueError):
+        ResponseCache(mode='lru')
+
+
+def test_stale_while_revalidate():
+    clock = Clock()
+    cache = ResponseCache(ttl=10, mode='swr', max_stale=30, clock=clock)
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow_fetch():
+        calls.append(1)
+        if len(calls) > 1:
+            started.set()
+            assert release.wait(5)
+        return {'result_code': 1, 'version': len(calls)}
+
+    assert cache.get('k', slow_fetch)['version'] == 1
+    clock.now += 15
+    # Stale: returned at once, a single refresh runs in the background.
+    for _ in range(5):
+        assert cache.get('k', slow_fetch)['version'] == 1
+    assert started.wait(5)
+    assert len(calls) == 2
+    release.set()
+    cache.close()
+    assert cache.get('k', slow_fetch)['version'] == 2
+    stats = cache.stats()
+    assert stats['stale_hits'] == 5
+    assert (stats['refreshes'], stats['hits']) == (1, 1)
+
+    # Past ttl + max_stale the caller waits for a fresh copy.
+    clock.now += 41
+    assert cache.get('k', slow_fetch)['version'] == 3
+    assert cache.stats()['misses'] == 2
+
+
+def test_failed_refresh_keeps_stale_entry():
+    clock = Clock()
+    cache = ResponseCache(ttl=10, mode='swr', max_stale=30, clock=clock)
+    cache.get('k', lambda: {'result_code': 1})
+
+    def failing():
+        raise ConnectionError('down')
+
+    clock.now += 20
+    assert cache.get('k', failing) == {'result_code': 1}
+    cache.close()
+    assert cache.stats()['refresh_errors'] == 1
+    assert cache.get('k', failing) == {'result_code': 1}
+    cache.close()
+
+    clock.now += 30
+    with pytest.raises(ConnectionError):
+        cache.get('k', failing)
+    # Error pages are not cached.
+    error_page = '<xml>not authorized</xml>'
+    assert cache.get('x', lambda: error_page) == error_page
+    assert cache.stats()['entries'] == 1
+
+
+def test_error_results_are_not_cached():
+    cache = ResponseCache(ttl=10)
+    results = iter([{'result_code': 0, 'result_message': 'Temporary error'},
+                    {'result_code': 1}])
+    assert cache.get('k', lambda: next(results))['result_code'] == 0
+    assert cache.stats()['entries'] == 0
+    assert cache.get('k', lambda: next(results)) == {'result_code': 1}
+    assert cache.get('k', lambda: {'result_code': 0}) == {'result_code': 1}
+
+    # A custom predicate decides what is kept.
+    cache = ResponseCache(ttl=10, cacheable=lambda value: True)
+    cache.get('k', lambda: {'result_code': 0})
+    assert cache.stats()['entries'] == 1
+
+
+def test_failed_result_refresh_keeps_stale_entry():
+    clock = Clock()
+    cache = ResponseCache(ttl=10, mode='swr', max_stale=30, clock=clock)
+    cache.get('k', lambda: {'result_code': 1, 'version': 1})
+
+    clock.now += 20
+    failed = {'result_code': 0, 'result_message': 'Temporary error'}
+    assert cache.get('k', lambda: failed)['version'] == 1
+    cache.close()
+    stats = cache.stats()
+    assert (stats['refresh_errors'], stats['refreshes']) == (1, 0)
+    assert cache.get('k', lambda: failed)['version'] == 1
+    cache.close()
+
+
+def test_single_flight():
+    cache = ResponseCache(ttl=10)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.1)
+        return {'result_code': 1}
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda _: cache.get('k', fetch), range(8)))
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+    assert cache.stats()['coalesced'] == 7
+
+
+def test_eviction_and_invalidate():
+    cache = ResponseCache(ttl=10, max_entries=2)
+    for key in 'abc':
+        cache.get(key, lambda: {'result_code': 1})
+    assert list(cache.entries) == ['b', 'c']
+    assert cache.stats()['evictions'] == 1
+    cache.invalidate('b')
+    assert list(cache.entries) == ['c']
+    cache.invalidate()
+    assert not cache.entries
+
+
+def test_resources_use_cache():
+    backend = StubBackend(contacts=3, lists=2, campaigns=1, messages=1)
+    config = StubConfig('http://stub.invalid', api_key=backend.api_key)
+    cache = ResponseCache(ttl=60)
+    with act.Client(config, transport=InMemoryTransport(backend.handle),
+                    cache=cache) as client:
+        for _ in range(3):
+            assert len(client.lists.get(normalize=True)) == 2
+            assert client.campaigns.get(ids='1')['0']['id'] == '1'
+            client.messages.get_one('1')
+            client.contacts.get()
+        client.lists.get(ids='1')
+    assert backend.calls['list_list'] == 2
+    assert backend.calls['campaign_list'] == 1
+    assert backend.calls['message_view'] == 1
+    assert backend.calls['contact_list'] == 3
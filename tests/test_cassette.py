@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the record/replay transports."""
+
+import gzip
+import io
+import json
+
+import pytest
+
+from activecampaign_takehome import activecampaign_takehome as act
+from activecampaign_takehome.cassette import (Cassette, CassetteMiss,
+                                              RecordingTransport,
+                                              ReplayTransport)
+from activecampaign_takehome.responses import iter_pages
+from activecampaign_takehome.stubserver import StubBackend, StubServer
+from activecampaign_takehome.transport import Urllib3Transport
+
+
+def workload(client):
+    contacts = list(iter_pages(client.contacts.get, full=1))
+    contact = {'email': 'new@example.com', 'list_id': ['1']}
+    created = client.contacts.create(contact)
+    duplicate = client.contacts.create(contact)
+    lists = client.lists.get(normalize=True)
+    message = client.messages.create({
+        'format': 'text', 'textconstructor': 'editor', 'subject': 'Hi',
+        'fromemail': 'a@example.com', 'fromname': 'A',
+        'reply2': 'a@example.com', 'priority': '3', 'list_id': ['1'],
+        'text': io.StringIO('streamed body'),
+    })
+    return [len(contacts), created['result_code'], duplicate['result_code'],
+            len(lists), message['result_code']]
+
+
+def test_record_and_replay(tmpdir):
+    cassette = Cassette()
+    with StubServer(StubBackend(contacts=25, lists=2)) as server:
+        config = server.config()
+        recording = RecordingTransport(Urllib3Transport(), cassette)
+        with act.Client(config, transport=recording) as client:
+            recorded = workload(client)
+    assert recorded == [25, 1, 0, 2, 1]
+    assert len(cassette) == 7
+    assert all('api_key' not in i['params'] for i in cassette.interactions)
+    assert cassette.interactions[-1]['data']['text'] == '<streamed>'
+
+    path = str(tmpdir.join('workload.jsonl.gz'))
+    cassette.save(path)
+    with gzip.open(path, 'rt') as f:
+        first = json.loads(f.readline())
+    assert first['params']['api_action'] == 'contact_list'
+
+    # The stub server is gone: everything comes from the cassette.
+    replay = ReplayTransport(path)
+    with act.Client(config, transport=replay) as client:
+        assert workload(client) == recorded
+    assert replay.replayed == 7
+
+
+def test_replay_misses_and_latency():
+    cassette = Cassette()
+    with StubServer(StubBackend(contacts=1)) as server:
+        recording = RecordingTransport(Urllib3Transport(), cassette)
+        resource = act.ContactsResource(server.config(), transport=recording)
+        resource.get(ids='1')
+        config = server.config()
+    cassette.interactions[0]['elapsed'] = 0.25
+
+    slept = []
+    replay = ReplayTransport(cassette, latency_scale=2, sleep=slept.append)
+    resource = act.ContactsResource(config, transport=replay)
+    assert resource.get(ids='1')['0']['id'] == '1'
+    assert resource.get(ids='1')['0']['id'] == '1'
+    assert slept == [0.5, 0.5]
+    with pytest.raises(CassetteMiss):
+        resource.get(ids='2')
+
+    replay = ReplayTransport(cassette, repeat=False)
+    resource = act.ContactsResource(config, transport=replay)
+    resource.get(ids='1')
+    with pytest.raises(CassetteMiss):
+        resource.get(ids='1')
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the per-action circuit breakers."""
+
+from unittest import mock
+
+import pytest
+import requests
+
+from activecampaign_takehome import activecampaign_takehome as act
+from activecampaign_takehome import circuitbreaker as cb
+from activecampaign_takehome.stubserver import StubConfig
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_breaker(**kwargs):
+    clock = FakeClock()
+    settings = dict(failure_rate=0.5, window=4, min_calls=4,
+                    reset_timeout=10.0, clock=clock)
+    settings.update(kwargs)
+    return cb.CircuitBreaker(name='campaign_send', **settings), clock
+
+
+def test_opens_on_failure_rate():
+    breaker, clock = make_breaker()
+    for failed in [False, True, False]:
+        breaker.before_call()
+        breaker.record(0.1, failed=failed)
+    assert breaker.state == cb.CLOSED
+    breaker.before_call()
+    breaker.record(0.1, failed=True)
+    assert breaker.state == cb.OPEN
+    with pytest.raises(cb.CircuitOpenError) as excinfo:
+        breaker.before_call()
+    assert excinfo.value.api_action == 'campaign_send'
+    assert excinfo.value.retry_after == pytest.approx(10.0)
+
+
+def test_opens_on_slow_calls():
+    breaker, clock = make_breaker(slow_call_duration=1.0, slow_call_rate=0.75)
+    for duration in [2.0, 2.0, 0.1, 2.0]:
+        breaker.before_call()
+        breaker.record(duration)
+    assert breaker.state == cb.OPEN
+
+
+def test_half_open_probe():
+    breaker, clock = make_breaker(half_open_calls=1)
+    for _ in range(4):
+        breaker.before_call()
+        breaker.record(0.1, failed=True)
+    assert breaker.state == cb.OPEN
+
+    clock.now = 10.0
+    assert breaker.state == cb.HALF_OPEN
+    breaker.before_call()
+    # Only one probe at a time.
+    with pytest.raises(cb.CircuitOpenError):
+        breaker.before_call()
+    breaker.record(0.1, failed=True)
+    assert breaker.state == cb.OPEN
+
+    clock.now = 20.0
+    breaker.before_call()
+    breaker.record(0.1)
+    assert breaker.state == cb.CLOSED
+    breaker.before_call()
+
+
+def test_registry_is_per_action():
+    overrides = {'contact_list': {'min_calls': 1}}
+    registry = cb.CircuitBreakerRegistry(window=2, min_calls=2,
+                                         overrides=overrides)
+    assert registry.get('campaign_send') is registry.get('campaign_send')
+    assert registry.get('contact_list').min_calls == 1
+    for _ in range(2):
+        registry.get('campaign_send').record(0.1, failed=True)
+    assert registry.states() == {'campaign_send': cb.OPEN,
+                                 'contact_list': cb.CLOSED}
+
+
+def test_api_fails_fast_per_action():
+    class MockResponse:
+        status_code = 200
+
+        def json(self):
+            return {'result_code': 1, 'result_message': 'ok',
+                    'result_output': 'json'}
+
+    def fake_get(url, params=None, **kwargs):
+        if params['api_action'] == 'campaign_send':
+            raise requests.Timeout()
+        return MockResponse()
+
+    registry = cb.CircuitBreakerRegistry(window=3, min_calls=3,
+                                         reset_timeout=60.0)
+    config = StubConfig('http://127.0.0.1:1')
+    campaigns = act.CampaignResource(config, breakers=registry, timeout=1.0)
+    contacts = act.ContactsResource(config, breakers=registry, timeout=1.0)
+    with mock.patch('requests.get', side_effect=fake_get) as mock_get:
+        for _ in range(3):
+            with pytest.raises(requests.Timeout):
+                campaigns.send('qa@example.com', '1', '1', 'text', 'test')
+        with pytest.raises(act.CircuitOpenError):
+            campaigns.send('qa@example.com', '1', '1', 'text', 'test')
+        assert mock_get.call_count == 3
+        assert contacts.get()['result_code'] == 1
+        assert mock_get.call_args[1]['timeout'] == 1.0
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the thread-safe shared client."""
+
+import pickle
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from activecampaign_takehome import activecampaign_takehome as act
+from activecampaign_takehome import transport
+from activecampaign_takehome.stubserver import (StubBackend, StubConfig,
+                                                StubServer)
+
+
+def test_requests_are_built_without_side_effects():
+    calls = []
+
+    def handler(method, params, data):
+        calls.append(params)
+        return {'result_code': 1, 'result_message': 'ok',
+                'result_output': 'json'}
+
+    api = act.Api(StubConfig('http://unused.invalid'),
+                  transport=transport.InMemoryTransport(handler))
+    params = {'id': '3'}
+    headers = {'X-Trace': 'abc'}
+    api.do_get('contact_delete', params)
+    api.do_post('contact_add', {'email': 'a@example.com'}, params=params,
+                headers=headers)
+    assert params == {'id': '3'}
+    assert headers == {'X-Trace': 'abc'}
+    assert calls[0]['api_action'] == 'contact_delete'
+
+
+def test_frozen_config():
+    client = act.Client(StubConfig('http://127.0.0.1:1'))
+    assert client.config.BASE_URL == 'http://127.0.0.1:1'
+    with pytest.raises(AttributeError):
+        client.config.API_KEY = 'other'
+    assert pickle.loads(pickle.dumps(client.config)) == client.config
+    assert isinstance(client.transport, transport.ThreadLocalRequestsTransport)
+    assert client.contacts.transport is client.messages.transport
+
+
+@pytest.mark.parametrize('make_transport', [
+    lambda: None,
+    lambda: transport.Urllib3Transport(maxsize=16),
+], ids=['thread_local_requests', 'urllib3'])
+def test_stress_shared_client(make_transport):
+    threads = 16
+    calls_per_thread = 30
+    shared_params = {'ids': 'all', 'sort': 'id'}
+    with StubServer(StubBackend(contacts=40, campaigns=2)) as server:
+        client = act.Client(server.config(), transport=make_transport())
+        errors = []
+
+        def work(worker):
+            for i in range(calls_per_thread):
+                kind = i % 3
+                if kind == 0:
+                    contact_id = str((worker * calls_per_thread + i) % 40 + 1)
+                    result = client.contacts.get(ids=contact_id,
+                                                 normalize=True)
+                    if [r['id'] for r in result] != [contact_id]:
+                        errors.append(('get', contact_id, result))
+                elif kind == 1:
+                    email = 'w{}-{}@example.com'.format(worker, i)
+                    result = client.contacts.create({'email': email,
+                                                     'list_id': ['1']})
+                    _id = str(result.get('subscriber_id'))
+                    stored = server.backend.contacts.get(_id)
+                    if stored is None or stored['email'] != email:
+                        errors.append(('create', email, result))
+                else:
+                    result = client.campaigns.do_get('campaign_list',
+                                                     shared_params)
+                    if str(result.get('result_code')) != '1':
+                        errors.append(('campaign_list', result))
+
+        start = threading.Barrier(threads)
+
+        def run(worker):
+            start.wait()
+            work(worker)
+
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            list(executor.map(run, range(threads)))
+        client.close()
+
+    assert errors == []
+    assert shared_params == {'ids': 'all', 'sort': 'id'}
+    calls = server.backend.calls
+    assert (calls['contact_list'] + calls['contact_add']
+            + calls['campaign_list'] == threads * calls_per_thread)
+    assert len(server.backend.contacts) == 40 + threads * calls_per_thread // 3
+
+
+def test_thread_local_sessions():
+    t = transport.ThreadLocalRequestsTransport()
+    sessions = []
+
+    def grab():
+        sessions.append(t.session)
+        assert t.session is sessions[-1]
+
+    workers = [threading.Thread(target=grab) for _ in range(4)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    assert len(set(map(id, sessions))) == 4
+    assert len(t.sessions) == 4
+    t.close()
+    assert t.sessions == []
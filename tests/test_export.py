@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the sharded contact export."""
+
+import io
+import json
+
+import pytest
+
+from activecampaign_takehome import export
+from activecampaign_takehome.responses import ApiResultError
+from activecampaign_takehome.stubserver import StubBackend, StubServer
+
+
+def test_export_contacts(tmpdir):
+    output = str(tmpdir.join('contacts.jsonl'))
+    with StubServer(StubBackend(contacts=95)) as server:
+        report = export.export_contacts(server.config(), output, processes=2,
+                                        pages_per_shard=2)
+    assert report['records'] == 95
+    assert report['pages'] == 5
+    assert report['shards'] == 3
+
+    with open(output) as f:
+        records = [json.loads(line) for line in f]
+    assert [r['id'] for r in records] == [str(i) for i in range(1, 96)]
+    assert records[0]['contact_details']['email'] == 'stub1@example.com'
+    assert records[0]['lists'][0]['listid'] == '1'
+    assert records[0]['sdate'] == '2018-07-11 09:18:35'
+
+
+def test_export_contacts_basic_to_file_object():
+    output = io.StringIO()
+    with StubServer(StubBackend(contacts=20)) as server:
+        report = export.export_contacts(server.config(), output, processes=1,
+                                        pages_per_shard=1, full=0)
+    assert report['records'] == 20
+    records = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert records[-1]['contact_details']['email'] == 'stub20@example.com'
+    assert records[-1]['lists'] == []
+
+
+class FlakyBackend(StubBackend):
+    """
+    Fails `contact_list` for page 3 the first `failures` times.
+    """
+    def __init__(self, failures, **kwargs):
+        super().__init__(**kwargs)
+        self.failures = failures
+
+    def action_contact_list(self, params, data):
+        if str(params.get('page')) == '3' and self.failures:
+            self.failures -= 1
+            return {'result_code': 0,
+                    'result_message': 'Failed: Internal error',
+                    'result_output': 'json'}
+        return super().action_contact_list(params, data)
+
+
+def test_export_retries_failed_pages(tmpdir):
+    output = str(tmpdir.join('contacts.jsonl'))
+    with StubServer(FlakyBackend(1, contacts=100)) as server:
+        report = export.export_contacts(server.config(), output, processes=1,
+                                        pages_per_shard=2, retry_delay=0)
+    assert report['records'] == 100
+
+
+def test_export_raises_on_failing_page(tmpdir):
+    output = str(tmpdir.join('contacts.jsonl'))
+    with StubServer(FlakyBackend(3, contacts=100)) as server:
+        with pytest.raises(ApiResultError, match='Internal error'):
+            export.export_contacts(server.config(), output, processes=1,
+                                   pages_per_shard=2, retry_delay=0)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the duplicate-suppressing contact import."""
+
+import json
+
+from click.testing import CliRunner
+
+from activecampaign_takehome import activecampaign_takehome as act
+from activecampaign_takehome import cli, importer
+from activecampaign_takehome.stubserver import StubBackend, StubServer
+
+
+def test_email_index(tmpdir):
+    index = importer.EmailIndex()
+    for email in ['a@example.com', 'B@Example.com ', 'c@example.com']:
+        index.add(email)
+    assert len(index) == 3
+    assert 'b@example.com' in index
+    assert 'd@example.com' not in index
+    assert not index.add_new('A@example.com')
+    assert index.add_new('d@example.com')
+
+    path = str(tmpdir.join('index.bin'))
+    index.save(path)
+    loaded = importer.EmailIndex.load(path)
+    assert len(loaded) == 4
+    assert 'c@example.com' in loaded
+
+
+def test_email_index_from_export(tmpdir):
+    path = tmpdir.join('contacts.jsonl')
+    path.write('\n'.join(json.dumps(r) for r in [
+        {'id': '1', 'contact_details': {'email': 'known@example.com'}},
+        {'id': '2', 'email': 'raw@example.com'},
+    ]) + '\n')
+    index = importer.EmailIndex.from_export(str(path))
+    assert 'known@example.com' in index
+    assert 'raw@example.com' in index
+
+
+def test_row_to_contact():
+    contact = importer.row_to_contact({
+        'email': ' a@example.com ', 'first_name': 'A', 'last_name': '',
+        'tags': 'x; y', 'list_id': '1|2'})
+    assert contact == {'email': 'a@example.com', 'first_name': 'A',
+                       'tags': ['x', 'y'], 'list_id': ['1', '2']}
+
+
+def test_import_contacts_skips_known_and_repeated():
+    rows = [
+        # Already in the account.
+        {'email': 'stub1@example.com', 'list_id': ['1']},
+        {'email': 'new1@example.com', 'list_id': ['1']},
+        # Repeated in the file.
+        {'email': 'NEW1@example.com', 'list_id': ['1']},
+        {'email': 'not-an-email', 'list_id': ['1']},
+        {'email': 'new2@example.com', 'list_id': ['1']},
+    ]
+    skipped = []
+    with StubServer(StubBackend(contacts=30)) as server:
+        resource = act.ContactsResource(server.config())
+        index = importer.EmailIndex.from_account(resource)
+        assert len(index) == 30
+        report = importer.import_contacts(
+            resource, rows, index=index, max_workers=2,
+            on_skip=lambda n, contact, reason: skipped.append((n, reason)))
+        assert server.backend.calls['contact_add'] == 2
+
+    assert report.as_dict() == {
+        'rows': 5, 'submitted': 2, 'created': 2, 'failed': 0,
+        'skipped_known': 1, 'skipped_duplicate': 1, 'skipped_invalid': 1,
+        'calls_avoided': 2,
+    }
+    assert skipped == [(1, 'known'), (3, 'duplicate'), (4, 'invalid')]
+    assert 'new2@example.com' in index
+
+
+def test_import_contacts_command(tmpdir):
+    csv_path = tmpdir.join('contacts.csv')
+    csv_path.write('email,first_name,last_name,tags,list_id\n'
+                   'stub2@example.com,Known,Contact,,1\n'
+                   'fresh@example.com,Fresh,Contact,"a,b",1\n'
+                   'fresh@example.com,Fresh,Again,,1\n')
+    skipped_path = tmpdir.join('skipped.csv')
+    with StubServer(StubBackend(contacts=5)) as server:
+        env = {'AC_BASE_URL': server.base_url,
+               'AC_API_KEY': server.backend.api_key}
+        result = CliRunner().invoke(cli.main, [
+            'import-contacts', str(csv_path), '--scan-account',
+            '--skipped', str(skipped_path)], env=env)
+    assert result.exit_code == 0, result.output
+    assert 'calls_avoided: 2' in result.output
+    assert skipped_path.read().splitlines() == [
+        'row,reason,email', '1,known,stub2@example.com',
+        '3,duplicate,fresh@example.com']
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the load test runner and the `loadtest` command."""
+
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from activecampaign_takehome import cli
+from activecampaign_takehome import loadtest as lt
+from activecampaign_takehome.stubserver import StubBackend, StubServer
+
+
+def test_parse_mix():
+    mix = lt.parse_mix('contact_list=70, contact_add=20,campaign_send=10')
+    assert list(mix.items()) == [('contact_list', 70.0), ('contact_add', 20.0),
+                                 ('campaign_send', 10.0)]
+    assert lt.parse_mix('list_list') == {'list_list': 1.0}
+    with pytest.raises(ValueError):
+        lt.parse_mix('contact_explode=10')
+    with pytest.raises(ValueError):
+        lt.parse_mix('contact_list=0')
+
+
+def test_percentile():
+    values = [1, 2, 3, 4, 5]
+    assert lt.percentile(values, 50) == 3
+    assert lt.percentile(values, 100) == 5
+    assert lt.percentile(values, 90) == pytest.approx(4.6)
+    assert lt.percentile([], 50) is None
+
+
+def test_load_test_request_budget():
+    with StubServer(StubBackend(contacts=40)) as server:
+        test = lt.LoadTest(
+            server.config(), 'contact_list=70,contact_add=20,campaign_send=10',
+            users=4, requests=60, options={'email': 'qa@example.com',
+                                           'campaign_id': '1', 'pages': 2},
+            seed=1)
+        report = test.run()
+    assert report['total']['requests'] == 60
+    assert report['total']['errors'] == 0
+    assert sum(s['requests'] for s in report['actions'].values()) == 60
+    assert report['actions']['contact_list']['p50'] is not None
+
+
+def test_load_test_error_breakdown():
+    with StubServer(StubBackend(campaigns=1)) as server:
+        test = lt.LoadTest(
+            server.config(), 'campaign_send=1', users=2, requests=10,
+            options={'email': 'qa@example.com', 'campaign_id': '99'})
+        report = test.run()
+    breakdown = report['actions']['campaign_send']['error_breakdown']
+    assert breakdown == {'api: Campaign not found': 10}
+
+
+def test_load_test_requires_campaign_email():
+    with pytest.raises(ValueError):
+        lt.LoadTest(object(), 'campaign_send=1', requests=1)
+
+
+def test_loadtest_command():
+    runner = CliRunner()
+    result = runner.invoke(cli.main, ['loadtest', '--stub', '-n', '20',
+                                      '-u', '2', '--json'])
+    assert result.exit_code == 0, result.output
+    report = json.loads(result.output)
+    assert report['total']['requests'] == 20
+
+    result = runner.invoke(cli.main, ['loadtest', '--stub'])
+    assert result.exit_code != 0
@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for fetching many messages."""
+
+from activecampaign_takehome import activecampaign_takehome as act
+from activecampaign_takehome.cache import ResponseCache
+from activecampaign_takehome.stubserver import StubBackend, StubConfig
+from activecampaign_takehome.transport import InMemoryTransport
+
+
+def test_get_many_falls_back_to_message_view():
+    backend = StubBackend(messages=5, latency=0.2,
+                          broken_actions=['message_list'])
+    config = StubConfig('http://stub.invalid', api_key=backend.api_key)
+    messages = act.MessageResource(config,
+                                   transport=InMemoryTransport(backend.handle),
+                                   cache=ResponseCache(ttl=60))
+
+    result = messages.get_many(ids=['3', '1', '9', '3', '5'])
+    assert [result[k]['id'] for k in ['0', '1', '2']] == ['3', '1', '5']
+    assert '3' not in result and 'result_code' not in result['0']
+    assert result['result_code'] == 1
+    assert backend.calls['message_list'] == 1
+    assert backend.calls['message_view'] == 4
+    # The views of the four distinct IDs ran at the same time.
+    assert backend.max_in_flight['message_view'] == 4
+
+    records = messages.get_many(ids='1,2', normalize=True)
+    assert [r['id'] for r in records] == ['1', '2']
+    assert records[0]['priority'] == '3'
+    assert backend.calls['message_list'] == 1
+    assert backend.calls['message_view'] == 5
+    assert messages.get_many(ids='1,2', page=2)['result_code'] == 0
+
+    # Without explicit IDs there is nothing to fall back on.
+    assert messages.get_many()['result_code'] == 0
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the streaming record output."""
+
+import csv
+import io
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from activecampaign_takehome import cli, output
+from activecampaign_takehome.stubserver import StubBackend, StubServer
+
+
+RECORDS = [
+    {'id': '1', 'email': 'a@example.com', 'tags': ['x', 'y'], 'phone': None},
+    {'id': '2', 'email': 'b@example.com', 'tags': [], 'phone': '555'},
+]
+
+
+@pytest.mark.parametrize('fmt', output.FORMATS)
+def test_formats_are_streamed(fmt):
+    out = io.StringIO()
+
+    def records():
+        for i, record in enumerate(RECORDS * 60):
+            # Everything before the sample of the table is already written.
+            if fmt != 'table' and i:
+                assert out.getvalue()
+            yield record
+
+    output.write_records(records(), fmt, out)
+    text = out.getvalue()
+    if fmt == 'json':
+        assert json.loads(text) == RECORDS * 60
+    elif fmt == 'jsonl':
+        assert [json.loads(line) for line in text.splitlines()] == RECORDS * 60
+    elif fmt == 'csv':
+        rows = list(csv.DictReader(io.StringIO(text)))
+        assert rows[0] == {'id': '1', 'email': 'a@example.com',
+                           'tags': '["x","y"]', 'phone': ''}
+        assert len(rows) == 120
+    else:
+        lines = text.splitlines()
+        assert lines[0].split() == ['id', 'email', 'tags', 'phone']
+        assert len(lines) == 122
+
+
+def test_empty_and_columns():
+    out = io.StringIO()
+    output.write_records(iter([]), 'json', out)
+    assert json.loads(out.getvalue()) == []
+
+    out = io.StringIO()
+    output.write_records(RECORDS, 'jsonl', out, columns=['email'])
+    assert out.getvalue() == ('{"email":"a@example.com"}\n'
+                              '{"email":"b@example.com"}\n')
+
+    out = io.StringIO()
+    output.write_records([{'id': '1', 'name': 'x' * 100}], 'table', out,
+                         columns=['id', 'name'])
+    assert max(len(line)
+               for line in out.getvalue().splitlines()) == len('id') + 2 + 40
+
+    with pytest.raises(ValueError):
+        output.write_records(RECORDS, 'xml', io.StringIO())
+
+
+def test_list_commands_stream_all_pages():
+    with StubServer(StubBackend(contacts=45)) as server:
+        env = {'AC_BASE_URL': server.base_url,
+               'AC_API_KEY': server.backend.api_key}
+        result = CliRunner().invoke(cli.main,
+                                    ['--format', 'jsonl', 'get-contacts'],
+                                    env=env)
+        assert result.exit_code == 0, result.output
+        assert [json.loads(line)['id']
+                for line in result.output.splitlines()] == [
+                    str(i) for i in range(1, 46)]
+
+        result = CliRunner().invoke(cli.main,
+                                    ['--format', 'csv', 'get-campaigns',
+                                     '--ids', 'all'], env=env)
+        assert result.output.splitlines()[0].startswith('id,name,type')
+
+        result = CliRunner().invoke(cli.main,
+                                    ['--format', 'table', 'get-lists'],
+                                    env=env)
+        assert result.output.split(
+            '\n')[0].split() == cli.TABLE_COLUMNS['lists']
+
+        result = CliRunner().invoke(cli.main,
+                                    ['--format', 'json', 'get-messages',
+                                     '--page', '1'], env=env)
+        assert [m['id'] for m in json.loads(result.output)] == ['1', '2', '3']
+
+        # The default keeps the pretty-printed first page.
+        result = CliRunner().invoke(cli.main, ['get-contacts'], env=env)
+        assert "'result_code': 1" in result.output
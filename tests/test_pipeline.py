@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the fetch -> transform -> sink pipelines."""
+
+import io
+import json
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from activecampaign_takehome import activecampaign_takehome as act
+from activecampaign_takehome import pipeline
+from activecampaign_takehome.stubserver import StubBackend, StubServer
+
+
+def test_stages_and_report():
+    collected = []
+    lock = threading.Lock()
+
+    def collect(item):
+        with lock:
+            collected.append(item)
+
+    report = pipeline.Pipeline(
+        range(100),
+        pipeline.Stage(lambda n: n * 2, workers=4),
+        pipeline.Stage(lambda n: n if n % 4 == 0 else None, name='even'),
+        pipeline.Stage(lambda n: [n, n + 1], flat=True),
+        collect,
+        queue_size=5,
+    ).run()
+    assert sorted(collected) == sorted(x for n in range(0, 200, 4)
+                                       for x in (n, n + 1))
+    stages = report['stages']
+    assert list(stages) == ['source', '<lambda>', 'even', '<lambda>#2',
+                            'collect']
+    assert stages['source']['out'] == 100
+    assert stages['<lambda>']['workers'] == 4
+    assert stages['even']['out'] == 50
+    assert stages['collect']['in'] == 100
+    assert max(report['max_queued']) <= 5
+
+
+def test_backpressure():
+    produced = [0]
+    consumed = [0]
+    in_flight = []
+
+    def source():
+        for i in range(300):
+            produced[0] += 1
+            in_flight.append(produced[0] - consumed[0])
+            yield i
+
+    def slow_sink(item):
+        time.sleep(0.001)
+        consumed[0] += 1
+
+    pipeline.Pipeline(source(), pipeline.Stage(lambda n: n, workers=2),
+                      slow_sink, queue_size=10).run()
+    assert consumed[0] == 300
+    # Two queues of 10, plus one item held by each worker.
+    assert max(in_flight) <= 2 * 10 + 4
+
+
+def test_errors():
+    def boom(n):
+        if n == 5:
+            raise ValueError('bad item')
+        return n
+
+    with pytest.raises(ValueError):
+        pipeline.Pipeline(iter(range(10 ** 6)), boom, lambda n: None,
+                          queue_size=2).run()
+
+    p = pipeline.Pipeline(range(10), pipeline.Stage(boom, on_error='skip'))
+    report = p.run()
+    assert report['stages']['boom']['errors'] == 1
+    assert report['stages']['boom']['out'] == 9
+    assert p.stats['boom'].failures[0][0] == 5
+
+
+def test_resource_stages(tmpdir):
+    with StubServer(StubBackend(contacts=50, lists=1)) as server:
+        contacts = act.ContactsResource(server.config())
+
+        def to_edit(record):
+            if int(record['id']) % 10 == 0:
+                return None
+            return {'id': record['id'], 'email': record['email'],
+                    'first_name': 'Edited', 'list_id': ['1']}
+
+        out = io.StringIO()
+        report = pipeline.Pipeline(
+            pipeline.PageSource(contacts.get, workers=3, full=0),
+            pipeline.Stage(to_edit, workers=2),
+            pipeline.ApiStage(contacts.edit, workers=4, name='edit'),
+            pipeline.Stage(lambda pair: pair[0]),
+            pipeline.JsonLinesSink(out),
+            queue_size=8,
+        ).run()
+        assert report['stages']['ContactsResource.get']['out'] == 50
+        assert report['stages']['edit']['out'] == 45
+        assert len(out.getvalue().splitlines()) == 45
+        assert server.backend.contacts['7']['first_name'] == 'Edited'
+        assert server.backend.contacts['10']['first_name'] == 'Stub'
+        assert server.backend.calls['contact_list'] <= 6
+
+        db_path = str(tmpdir.join('contacts.db'))
+        pipeline.Pipeline(pipeline.PageSource(contacts.get, workers=2),
+                          pipeline.SqliteSink(db_path, batch=7)).run()
+        conn = sqlite3.connect(db_path)
+        assert conn.execute('SELECT COUNT(*) FROM records').fetchone()[0] == 50
+        row = conn.execute(
+            "SELECT record FROM records WHERE key = '3'").fetchone()
+        assert json.loads(row[0])['id'] == '3'
+        conn.close()
+
+
+def test_api_stage_failures():
+    with StubServer(StubBackend(contacts=0)) as server:
+        contacts = act.ContactsResource(server.config())
+        p = pipeline.Pipeline(
+            [{'email': 'ok@example.com', 'list_id': ['1']},
+             {'email': 'not-an-email', 'list_id': ['1']}],
+            pipeline.ApiStage(contacts.create, name='create'))
+        report = p.run()
+    assert report['stages']['create']['errors'] == 1
+    item, error = p.stats['create'].failures[0]
+    assert isinstance(error, pipeline.ApiCallFailed)
+    assert item['email'] == 'not-an-email'
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the CLI --profile option."""
+
+import pstats
+
+import click
+import marshmallow
+from click.testing import CliRunner
+
+from activecampaign_takehome import activecampaign_takehome as act
+from activecampaign_takehome import cli, profiling
+from activecampaign_takehome.stubserver import StubBackend, StubServer
+
+
+def test_profile_flag(tmpdir):
+    stats_path = str(tmpdir.join('run.pstats'))
+    originals = (act.Api._call, cli.pformat, click.echo)
+    with StubServer(StubBackend(contacts=3)) as server:
+        env = {'AC_BASE_URL': server.base_url,
+               'AC_API_KEY': server.backend.api_key}
+        result = CliRunner().invoke(
+            cli.main, ['--profile', '--profile-stats', stats_path,
+                       '--profile-memory', 'add-contact',
+                       '--email', 'p@example.com', '--first_name', 'P',
+                       '--last_name', 'Q', '--list_id', '1'],
+            env=env)
+    assert result.exit_code == 0, result.output
+    assert "'result_code': 1" in result.stdout
+    report = result.stderr
+    assert 'Profile:' in report
+    for phase in profiling.PHASES:
+        assert '  {}'.format(phase) in report
+    assert '1 calls' in report
+    assert 'Peak traced memory' in report
+    assert pstats.Stats(stats_path).total_calls > 0
+    # Everything is unwrapped again.
+    assert (act.Api._call, cli.pformat, click.echo) == originals
+    assert 'dump' not in marshmallow.Schema.__dict__
+
+
+def test_profiler_phases():
+    calls = []
+
+    class Target:
+        def work(self, n):
+            calls.append(n)
+            if n:
+                return self.work(n - 1)
+
+    profiler = profiling.Profiler(targets=[(Target, 'work', 'http')],
+                                  import_seconds=0.5)
+    profiler.start()
+    Target().work(3)
+    profiler.stop()
+    report = profiler.report()
+    assert calls == [3, 2, 1, 0]
+    assert report['phases']['http']['calls'] == 1
+    assert report['phases']['import']['seconds'] == 0.5
+    assert report['total'] >= 0.5
+    assert 'work' in Target.__dict__
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the list response normalizer."""
+
+import types
+
+import pytest
+
+from activecampaign_takehome import activecampaign_takehome as act
+from activecampaign_takehome import responses
+from activecampaign_takehome.stubserver import (StubBackend, StubConfig,
+                                                StubServer)
+from activecampaign_takehome.transport import InMemoryTransport
+
+
+PAYLOAD = {
+    '1': {'id': '8', 'email': 'b@example.com', 'sentcnt': '3',
+          'bounced_hard': ''},
+    '0': {'id': '7', 'email': 'a@example.com', 'sentcnt': '12',
+          'bounced_hard': '1'},
+    'result_code': 1,
+    'result_message': 'Success: Something is returned',
+    'result_output': 'json',
+}
+
+
+def test_normalize():
+    records = responses.normalize(PAYLOAD)
+    assert records.ok
+    assert records.result_message == 'Success: Something is returned'
+    assert [r['id'] for r in records] == ['7', '8']
+    assert records[0] is PAYLOAD['0']
+
+    failed = responses.normalize({
+        'result_code': 0, 'result_message': 'Failed: Nothing is returned'})
+    assert failed == [] and not failed.ok
+    assert responses.normalize('<xml>not authorized</xml>') == []
+
+    unordered = {'1': {'id': 'b'}, '0': {'id': 'a'}, '10': {'id': 'k'},
+                 'result_code': 1}
+    assert [r['id'] for r in responses.normalize(unordered)] == ['a', 'b', 'k']
+
+
+def test_coercion_and_projection():
+    records = responses.normalize(PAYLOAD, 'contact_list', coerce=True,
+                                  fields=['id', 'sentcnt', 'bounced_hard',
+                                          'phone'])
+    assert records == [
+        {'id': '7', 'sentcnt': 12, 'bounced_hard': 1, 'phone': None},
+        {'id': '8', 'sentcnt': 3, 'bounced_hard': None, 'phone': None},
+    ]
+    assert PAYLOAD['0']['sentcnt'] == '12'
+
+    records = responses.normalize(PAYLOAD,
+                                  coerce={'sentcnt': responses.to_float,
+                                          'email': responses.to_int})
+    assert records[0]['sentcnt'] == 12.0
+    assert records[0]['email'] == 'a@example.com'
+
+
+def test_stream():
+    stream = responses.Normalizer(stream=True, fields=['email'])(PAYLOAD)
+    assert isinstance(stream, types.GeneratorType)
+    assert list(stream) == [{'email': 'a@example.com'},
+                            {'email': 'b@example.com'}]
+
+
+def test_get_methods_normalize():
+    with StubServer(StubBackend(contacts=45, campaigns=2, messages=2,
+                                lists=3)) as server:
+        config = server.config()
+        contacts = act.ContactsResource(config)
+        page = contacts.get(page=3,
+                            normalize=responses.Normalizer(coerce=True))
+        assert isinstance(page, responses.RecordList)
+        assert [r['id'] for r in page] == ['41', '42', '43', '44', '45']
+        assert page[0]['sentcnt'] == 0
+        assert contacts.get(page=4, normalize=True) == []
+        assert 'result_code' in contacts.get(page=1)
+
+        assert len(act.CampaignResource(config).get(normalize=True)) == 2
+        assert [r['id']
+                for r in act.ListResource(
+                    config).get(normalize=True)] == ['1', '2', '3']
+        assert len(act.MessageResource(config).get_many(normalize=True)) == 2
+
+        emails = [r['email'] for r in responses.iter_pages(contacts.get,
+                                                           full=0)]
+        assert len(emails) == 45 and emails[0] == 'stub1@example.com'
+        assert server.backend.calls['contact_list'] == 7
+
+
+def failing_page(backend, page):
+    def handle(method, params, data):
+        if params.get(
+                'api_action') == 'contact_list' and str(
+                        params.get('page')) == str(page):
+            return {'result_code': 0,
+                    'result_message': 'Failed: Service unavailable'}
+        return backend.handle(method, params, data)
+    return handle
+
+
+def test_iter_pages_raises_on_failed_page():
+    backend = StubBackend(contacts=45)
+    config = StubConfig('http://stub.invalid', api_key=backend.api_key)
+    contacts = act.ContactsResource(config,
+                                    transport=InMemoryTransport(
+                                        failing_page(backend, 2)))
+    records = []
+    with pytest.raises(responses.ApiResultError, match='Service unavailable'):
+        for record in responses.iter_pages(contacts.get,
+                                           normalize=responses.Normalizer(
+                                               stream=True)):
+            records.append(record)
+    assert len(records) == 20
+
+    # Past the last page is not an error.
+    past_end = responses.normalize({
+        'result_code': 0, 'result_message': 'Failed: Nothing is returned'})
+    assert responses.checked(past_end) == []
+    with pytest.raises(responses.ApiResultError):
+        responses.checked(responses.normalize('<html>Not authorized</html>'))
+
+
+def test_normalizer_full():
+    assert responses.Normalizer().full('contact_list') is None
+    assert responses.Normalizer(fields=['id',
+                                        'email']).full('contact_list') == 0
+    assert responses.Normalizer(fields=['email',
+                                        'listslist']).full('contact_list') == 1
+    assert responses.Normalizer(fields=['lists']).full('campaign_list') == 0
+
+
+def test_get_fields():
+    backend = StubBackend(contacts=45)
+    sent = []
+
+    def handler(method, params, data):
+        sent.append(params)
+        return backend.handle(method, params, data)
+
+    config = StubConfig('http://stub.invalid', api_key=backend.api_key)
+    contacts = act.ContactsResource(config,
+                                    transport=InMemoryTransport(handler))
+    page = contacts.get(page=1,
+                        normalize=responses.Normalizer(fields=['id', 'email',
+                                                               'name']))
+    assert page[0] == {'id': '1', 'email': 'stub1@example.com',
+                       'name': 'Stub 1'}
+    assert sent[-1]['full'] == 0
+
+    records = list(responses.iter_pages(contacts.get,
+                                        normalize=responses.Normalizer(
+                                            fields=['email', 'listslist'])))
+    assert len(records) == 45
+    assert records[0] == {'email': 'stub1@example.com', 'listslist': '1'}
+    assert sent[-1]['full'] == 1
+
+    # An explicit `full` wins; without fields none is sent.
+    page = contacts.get(page=1, full=1,
+                        normalize=responses.Normalizer(fields=['id']))
+    assert page[0] == {'id': '1'}
+    assert sent[-1]['full'] == 1
+    contacts.get(page=1, normalize=True)
+    assert 'full' not in sent[-1]
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the event loop runner and the progress display."""
+
+import io
+import os
+import signal
+import time
+
+import pytest
+from click.testing import CliRunner
+
+from activecampaign_takehome import activecampaign_takehome as act
+from activecampaign_takehome import cli, importer
+from activecampaign_takehome.concurrency import outcome
+from activecampaign_takehome.runner import Progress, Runner
+from activecampaign_takehome.stubserver import (StubBackend, StubConfig,
+                                                StubServer)
+from activecampaign_takehome.transport import InMemoryTransport
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_progress_line():
+    clock = Clock()
+    stream = io.StringIO()
+    progress = Progress(total=100, label='calls', stream=stream, window=10,
+                        clock=clock)
+    for _ in range(20):
+        clock.now += 0.5
+        progress.update()
+    assert progress.rate == pytest.approx(2.0)
+    assert progress.eta == pytest.approx(40.0)
+    progress.update(ok=False)
+    assert progress.line() == ('21/100 calls (21%) | 2.1/s | ETA 0:00:37'
+                               ' | 1 failed')
+
+    progress.draw()
+    progress.close()
+    assert stream.getvalue().startswith('\r21/100 calls')
+    assert stream.getvalue().endswith('\n')
+
+    # Without a total: no ETA.
+    progress = Progress(label='contacts', stream=stream, clock=clock)
+    clock.now += 2
+    progress.update(n=10)
+    assert progress.line() == '10 contacts | 5.0/s'
+
+
+def test_runner_imap():
+    backend = StubBackend(contacts=0)
+    resource = act.ContactsResource(
+        StubConfig('http://stub.invalid', api_key=backend.api_key),
+        transport=InMemoryTransport(backend.handle))
+    contacts = [{'email': 'c{}@example.com'.format(i), 'list_id': ['1']}
+                for i in range(30)]
+    contacts.append({'email': 'c0@example.com'})
+    progress = Progress(stream=io.StringIO())
+    with Runner(progress) as runner:
+        report = importer.import_contacts(resource, contacts, max_workers=4,
+                                          imap=runner.imap)
+    assert (report.created, report.skipped['duplicate'],
+            report.failed) == (30, 1, 0)
+    assert (progress.done, progress.failed) == (30, 0)
+    assert not runner.interrupted
+    assert runner.loop is None
+
+    with pytest.raises(RuntimeError):
+        list(runner.imap(str, [1]))
+
+
+def test_ctrl_c_drains_calls_in_flight():
+    calls = []
+    runner = Runner(Progress(stream=io.StringIO()))
+
+    def call(item):
+        calls.append(item)
+        if item == 3:
+            os.kill(os.getpid(), signal.SIGINT)
+        deadline = time.monotonic() + 5
+        # The calls in flight outlast the interrupt.
+        while (item >= 3 and not runner.interrupted
+                and time.monotonic() < deadline):
+            time.sleep(0.01)
+        return {'result_code': 1}
+
+    with runner:
+        assert runner.signals
+        results = []
+        for item, future in runner.imap(call, range(100), max_workers=3):
+            assert outcome(future)[0]
+            results.append(item)
+        assert runner.interrupted
+        # Every call started was finished and reported; nothing after the
+        # interrupt.
+        assert sorted(results) == sorted(calls)
+        assert len(calls) < 10
+        assert 'Interrupted' in runner.progress.stream.getvalue()
+
+        # A second Ctrl-C aborts.
+        with pytest.raises(KeyboardInterrupt):
+            runner.interrupt()
+    assert signal.getsignal(signal.SIGINT) is signal.default_int_handler
+
+
+def test_ctrl_c_while_every_slot_is_busy():
+    calls = []
+    runner = Runner(Progress(stream=io.StringIO()))
+
+    def call(item):
+        calls.append(item)
+        if item == 0:
+            # Both slots are taken and the loop is waiting for one with item 2
+            # in hand.
+            time.sleep(0.1)
+            os.kill(os.getpid(), signal.SIGINT)
+        deadline = time.monotonic() + 5
+        while not runner.interrupted and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return {'result_code': 1}
+
+    with runner:
+        results = [item for item, _ in runner.imap(call, range(10),
+                                                   max_workers=2)]
+    assert runner.interrupted
+    assert sorted(calls) == sorted(results) == [0, 1]
+
+
+def test_delete_many_command_progress():
+    with StubServer(StubBackend(contacts=5)) as server:
+        env = {'AC_BASE_URL': server.base_url,
+               'AC_API_KEY': server.backend.api_key}
+        result = CliRunner().invoke(cli.main,
+                                    ['--progress', 'delete-many', 'contacts',
+                                     '1', '2', '3'], env=env)
+        assert result.exit_code == 0, result.output
+        assert '1/1 calls (100%)' in result.stderr
+        result = CliRunner().invoke(cli.main, ['delete-many', 'contacts', '4'],
+                                    env=env)
+        assert result.stderr == ''
+        assert sorted(server.backend.contacts) == ['5']
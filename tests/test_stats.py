@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the vectorized contact analytics."""
+
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from activecampaign_takehome import cli, export
+from activecampaign_takehome import activecampaign_takehome as act
+from activecampaign_takehome.stubserver import (StubBackend, StubServer,
+                                                make_contact)
+
+np = pytest.importorskip('numpy')
+stats = pytest.importorskip('activecampaign_takehome.stats')
+
+
+def contact(_id, list_ids, domain, sentcnt, hard=0, soft=0,
+            sdate='2018-07-11 09:18:35'):
+    record = make_contact(_id, list_ids[0])
+    record['lists'] = {list_id: dict(record['lists'][list_ids[0]],
+                                     listid=list_id) for list_id in list_ids}
+    record.update({
+        'email': 'c{}@{}'.format(_id, domain), 'email_domain': '',
+        'sentcnt': str(sentcnt), 'bounced_hard': str(hard),
+        'bounced_soft': str(soft),
+        'bouncescnt': hard + soft, 'sdate': sdate,
+    })
+    return record
+
+
+RECORDS = [
+    contact(1, ['1'], 'example.com', 10, hard=1),
+    contact(2, ['1', '2'], 'Example.com', 0, sdate='2019-01-02 00:00:00'),
+    contact(3, ['2'], 'other.org', 4, soft=2, sdate='0000-00-00 00:00:00'),
+    contact(4, ['10'], 'example.com', 150),
+]
+
+
+def test_contact_columns():
+    columns = stats.ContactColumns.from_records(RECORDS)
+    assert len(columns) == 4
+    assert columns.sentcnt.dtype == np.int64
+    assert columns.sdate.dtype == np.dtype('datetime64[s]')
+    assert np.isnat(columns.sdate[2])
+    assert columns.domain.categories == ['example.com', 'other.org']
+    assert columns.member_contact.tolist() == [0, 1, 1, 2, 3]
+
+
+def test_aggregates():
+    result = stats.contact_stats(stats.ContactColumns.from_records(RECORDS),
+                                 freq='Y', top=1)
+    assert result['contacts'] == 4
+    assert list(result['lists']) == ['1', '2', '10']
+    assert result['lists']['1'] == {
+        'contacts': 2, 'sent': 10, 'hard_bounces': 1, 'soft_bounces': 0,
+        'bounced_contacts': 1,
+        'bounce_rate': 0.1, 'bounced_contact_rate': 0.5}
+    assert result['lists']['2']['bounce_rate'] == 0.5
+    assert result['domains'] == {'example.com': {'contacts': 3, 'share': 0.75}}
+    assert result['sends']['total'] == 164
+    assert result['sends']['median'] == 7.0
+    assert result['sends']['histogram'] == {
+        '0': 1, '1': 0, '2-4': 1, '5-9': 0, '10-19': 1, '20-49': 0, '50-99': 0,
+        '100+': 1}
+    assert result['signups'] == {'2018': 2, '2019': 1}
+    assert 'signups per year:' in stats.format_stats(result, freq='Y')
+
+
+def test_weekly_signups_start_on_monday():
+    # Wednesday, Sunday, then the next Monday.
+    sdates = ['2018-07-11 09:00:00', '2018-07-15 23:59:59',
+              '2018-07-16 00:00:00']
+    records = [contact(i, ['1'], 'example.com', 0, sdate=sdate)
+               for i, sdate in enumerate(sdates, 1)]
+    histogram = stats.signup_histogram(
+        stats.ContactColumns.from_records(records), freq='W')
+    assert histogram == {'2018-07-09': 2, '2018-07-16': 1}
+
+
+def test_matches_export(tmpdir):
+    with StubServer(StubBackend(contacts=45)) as server:
+        resource = act.ContactsResource(server.config())
+        from_account = stats.contact_stats(
+            stats.ContactColumns.from_account(resource))
+        path = str(tmpdir.join('contacts.jsonl'))
+        export.export_contacts(server.config(), path, processes=1,
+                               pages_per_shard=2)
+    from_export = stats.contact_stats(stats.ContactColumns.from_export(path))
+    assert from_account == from_export
+    assert from_export['contacts'] == 45
+    assert from_export['domains'] == {'example.com': {'contacts': 45,
+                                                      'share': 1.0}}
+
+
+def test_contact_stats_command(tmpdir):
+    path = tmpdir.join('contacts.jsonl')
+    path.write(''.join(json.dumps(r) + '\n' for r in RECORDS))
+    result = CliRunner().invoke(cli.main, ['contact-stats', '--export',
+                                           str(path), '--json'])
+    assert result.exit_code == 0, result.output
+    assert json.loads(result.output)['lists']['10']['sent'] == 150
+    freq = next(p for p in cli.contact_stats.params if p.name == 'freq')
+    assert list(freq.type.choices) == list(stats.FREQUENCIES)
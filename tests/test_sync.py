@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the diff-based contact upsert."""
+
+import json
+
+from activecampaign_takehome import activecampaign_takehome as act
+from activecampaign_takehome import schemas, sync
+from activecampaign_takehome.stubserver import StubBackend, StubServer
+
+
+def test_contact_hash():
+    contact = {'email': 'A@example.com', 'first_name': 'A', 'tags': ['y', 'x'],
+               'list_id': ['2', '1']}
+    same = {'email': 'a@example.com', 'first_name': 'A', 'tags': ['x', 'y'],
+            'list_id': ['1', '2'], 'phone': None}
+    _hash = sync.contact_hash(contact)
+    assert _hash == sync.contact_hash(same)
+    assert _hash != sync.contact_hash(dict(contact, last_name='B'))
+    assert _hash != sync.contact_hash(dict(contact, list_id=['1']))
+    assert _hash != sync.contact_hash(dict(contact, tags=['x']))
+
+
+def test_contact_edit_schema():
+    serialized = schemas.ContactEditSchema().dump({
+        'id': '7', 'email': 'a@example.com', 'tags': ['x', 'y'],
+        'list_id': ['3']})
+    assert not serialized.errors
+    assert serialized.data['id'] == '7'
+    assert serialized.data['overwrite'] == '0'
+    assert serialized.data['p[3]'] == '3'
+    assert serialized.data['tags'] == 'x,y'
+
+    # An edit without lists only changes the fields passed.
+    serialized = schemas.ContactEditSchema().dump({'id': '7',
+                                                   'first_name': 'Seven'})
+    assert not serialized.errors
+    assert not any(key.startswith('p[') for key in serialized.data)
+    backend = StubBackend(contacts=1)
+    with StubServer(backend) as server:
+        resource = act.ContactsResource(server.config())
+        result = resource.edit({'id': '1', 'first_name': 'Seven'})
+        assert result['result_code'] == 1
+        assert backend.contacts['1']['first_name'] == 'Seven'
+
+
+def test_upsert_contacts(tmpdir):
+    contacts = [
+        {'email': 'one@example.com', 'first_name': 'One', 'list_id': ['1']},
+        {'email': 'two@example.com', 'first_name': 'Two', 'list_id': ['1']},
+    ]
+    snapshot = sync.ContactSnapshot(str(tmpdir.join('snapshot.db')))
+    with StubServer(StubBackend(contacts=0)) as server:
+        resource = act.ContactsResource(server.config())
+        report = sync.upsert_contacts(resource, contacts, snapshot,
+                                      max_workers=2)
+        assert report.as_dict() == {
+            'rows': 2, 'unchanged': 0, 'created': 2, 'updated': 0, 'failed': 0,
+            'calls': 2}
+
+        # Nothing changed: no calls at all.
+        report = sync.upsert_contacts(resource, contacts, snapshot)
+        assert report.unchanged == 2
+        assert report.calls == 0
+
+        contacts[1] = dict(contacts[1], first_name='Deux')
+        contacts.append({'email': 'three@example.com', 'list_id': ['1']})
+        preview = sync.upsert_contacts(resource, contacts, snapshot,
+                                       dry_run=True)
+        assert (preview.created, preview.updated) == (1, 1)
+
+        report = sync.upsert_contacts(resource, contacts, snapshot)
+        assert report.as_dict() == {
+            'rows': 3, 'unchanged': 1, 'created': 1, 'updated': 1, 'failed': 0,
+            'calls': 2}
+        backend = server.backend
+        assert backend.calls['contact_add'] == 3
+        assert backend.calls['contact_edit'] == 1
+        contact_id = snapshot.get('two@example.com')[0]
+        assert backend.contacts[contact_id]['first_name'] == 'Deux'
+
+        # Removed lists and tags are removed in the account too.
+        contacts[1] = dict(contacts[1], list_id=['1', '2'],
+                           tags=['vip', 'new'])
+        sync.upsert_contacts(resource, contacts, snapshot)
+        assert sorted(backend.contacts[contact_id]['lists']) == ['1', '2']
+        contacts[1] = dict(contacts[1], list_id=['2'], tags=['vip'])
+        report = sync.upsert_contacts(resource, contacts, snapshot)
+        assert report.updated == 1
+        assert list(backend.contacts[contact_id]['lists']) == ['2']
+        assert backend.contacts[contact_id]['tags'] == ['vip']
+    snapshot.close()
+
+
+def test_seed_from_export(tmpdir):
+    export_path = tmpdir.join('contacts.jsonl')
+    export_path.write(json.dumps({
+        'id': '12',
+        'contact_details': {'email': 'one@example.com', 'first_name': 'One'},
+        'lists': [{'listid': '1'}],
+    }) + '\n')
+    snapshot = sync.ContactSnapshot(str(tmpdir.join('snapshot.db')))
+    assert snapshot.seed_from_export(str(export_path)) == 1
+    contact_id, _hash = snapshot.get('ONE@example.com')
+    assert contact_id == '12'
+    assert _hash == sync.contact_hash({'email': 'one@example.com',
+                                       'first_name': 'One', 'list_id': ['1']})
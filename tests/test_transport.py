@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the HTTP transports."""
+
+import io
+import pathlib
+import tracemalloc
+from urllib.parse import urlencode
+
+import pytest
+import requests
+
+from activecampaign_takehome import activecampaign_takehome as act
+from activecampaign_takehome import transport
+from activecampaign_takehome.stubserver import (StubBackend, StubConfig,
+                                                StubServer)
+
+
+@pytest.fixture
+def stub_server():
+    with StubServer(StubBackend(contacts=3)) as server:
+        yield server
+
+
+@pytest.mark.parametrize('make_transport', [
+    lambda server: transport.RequestsTransport(),
+    lambda server: transport.RequestsTransport(requests.Session()),
+    lambda server: transport.ThreadLocalRequestsTransport(),
+    lambda server: transport.Urllib3Transport(maxsize=2),
+    lambda server: transport.InMemoryTransport(server.backend.handle),
+], ids=['requests', 'requests_session', 'requests_threadlocal', 'urllib3',
+        'inmemory'])
+def test_transports_round_trip(stub_server, make_transport):
+    t = make_transport(stub_server)
+    contacts = act.ContactsResource(stub_server.config(), transport=t)
+    result = contacts.get(ids=['1', '2'])
+    assert result['result_code'] == 1
+    assert [result['0']['id'], result['1']['id']] == ['1', '2']
+
+    result = contacts.create({
+        'email': 'new@example.com', 'first_name': 'New', 'last_name': 'User',
+        'tags': ['a', 'b'], 'list_id': ['1']})
+    assert result['result_code'] == 1
+    stored = stub_server.backend.contacts[str(result['subscriber_id'])]
+    assert stored['first_name'] == 'New'
+    t.close()
+
+
+def test_default_transport():
+    api = act.Api(StubConfig('http://127.0.0.1:1'))
+    assert isinstance(api.transport, transport.RequestsTransport)
+    assert api.transport.session is None
+
+
+def test_in_memory_transport_needs_no_network():
+    calls = []
+
+    def handler(method, params, data):
+        calls.append((method, params['api_action'], data))
+        return {'result_code': 1, 'result_message': 'ok',
+                'result_output': 'json'}
+
+    resource = act.MessageResource(
+        StubConfig('http://unreachable.invalid'),
+        transport=transport.InMemoryTransport(handler))
+    assert resource.delete('5')['result_code'] == 1
+    assert calls == [('GET', 'message_delete', None)]
+
+
+def test_response_json():
+    resp = transport.Response(200, b'{"result_code": 1}')
+    assert resp.json() == {'result_code': 1}
+    assert resp.text == '{"result_code": 1}'
+    assert transport.InMemoryResponse({'a': 1}).content == b'{"a": 1}'
+
+
+def test_streaming_form_encoding(tmpdir):
+    body = 'Ünïcode & spaces = 100%\n' * 5000
+    path = tmpdir.join('body.txt')
+    path.write_text(body, encoding='utf-8')
+    fields = {'subject': 'Hi there', 'p[1]': '1'}
+
+    form = transport.StreamingForm(fields, {'text': pathlib.Path(str(path))},
+                                   chunk_size=1000)
+    encoded = b''.join(form)
+    assert len(form) == len(encoded)
+    assert encoded == urlencode(dict(fields, text=body)).encode('ascii')
+    # Can be sent again, e.g. after a redirect.
+    assert b''.join(form) == encoded
+
+    with open(str(path), 'rb') as f:
+        form = transport.StreamingForm({}, {'text': f})
+        assert form.to_dict() == {'text': body}
+
+    unseekable = io.BufferedReader(io.BytesIO(b'abc def'))
+    unseekable.seekable = lambda: False
+    form = transport.StreamingForm(fields, {'text': unseekable})
+    assert len(form) == 0
+    assert form.to_dict()['text'] == 'abc def'
+
+
+def test_streaming_form_memory(tmpdir):
+    path = tmpdir.join('big.txt')
+    with open(str(path), 'w') as f:
+        for _ in range(20 * 1024):
+            f.write('x & y ' * 170 + '\n')
+    form = transport.StreamingForm({'subject': 'big'},
+                                   {'text': pathlib.Path(str(path))})
+    tracemalloc.start()
+    try:
+        total = len(form)
+        sent = sum(len(chunk) for chunk in form)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert sent == total > 20 * 1024 * 1024
+    assert peak < 2 * 1024 * 1024
+
+
+MESSAGE = {
+    'format': 'text',
+    'textconstructor': 'editor',
+    'subject': 'Big newsletter',
+    'fromemail': 'sender@example.com',
+    'fromname': 'Sender',
+    'reply2': 'reply@example.com',
+    'priority': '3',
+    'list_id': ['1'],
+}
+
+
+@pytest.mark.parametrize('make_transport', [
+    lambda server: transport.RequestsTransport(),
+    lambda server: transport.Urllib3Transport(),
+    lambda server: transport.InMemoryTransport(server.backend.handle),
+], ids=['requests', 'urllib3', 'inmemory'])
+def test_message_create_streams_body(stub_server, make_transport, tmpdir):
+    body = 'Line of the newsletter & more\n' * 10000
+    path = tmpdir.join('newsletter.txt')
+    path.write(body)
+    messages = act.MessageResource(stub_server.config(),
+                                   transport=make_transport(stub_server))
+
+    result = messages.create(dict(MESSAGE, text=pathlib.Path(str(path))))
+    assert result['result_code'] == 1
+    stored = stub_server.backend.messages[str(result['id'])]
+    assert stored['text'] == body
+    assert stored['subject'] == 'Big newsletter'
+
+    with open(str(path), 'r') as f:
+        result = messages.create(dict(MESSAGE, textconstructor='upload',
+                                      message_upload_text=f))
+    stored = stub_server.backend.messages[str(result['id'])]
+    assert stored['message_upload_text'] == body
+    assert stored['textconstructor'] == 'upload'
+
+
+@pytest.mark.parametrize('make_transport', [
+    lambda: transport.RequestsTransport(),
+    lambda: transport.Urllib3Transport(),
+], ids=['requests', 'urllib3'])
+def test_message_create_unseekable_body_is_chunked(stub_server,
+                                                   make_transport):
+    body = b'piped & unseekable\n' * 5000
+    source = io.BufferedReader(io.BytesIO(body))
+    source.seekable = lambda: False
+    messages = act.MessageResource(stub_server.config(),
+                                   transport=make_transport())
+
+    result = messages.create(dict(MESSAGE, text=source))
+    assert result['result_code'] == 1
+    stored = stub_server.backend.messages[str(result['id'])]
+    assert stored['text'] == body.decode()
+
+
+def test_rate_limited_transport(stub_server):
+    now = [100.0]
+    slept = []
+
+    def sleep(seconds):
+        slept.append(seconds)
+        now[0] += seconds
+
+    inner = transport.InMemoryTransport(stub_server.backend.handle)
+    limited = transport.RateLimitedTransport(inner, rate=2, burst=2,
+                                             clock=lambda: now[0], sleep=sleep)
+    resource = act.ContactsResource(stub_server.config(), transport=limited)
+    for _ in range(4):
+        assert resource.get()['result_code'] == 1
+    assert slept == [0.5, 0.5]
+    assert limited.waited == 1.0
+
+    now[0] += 10
+    limited.acquire()
+    limited.acquire()
+    assert len(slept) == 2
+    with pytest.raises(ValueError):
+        transport.RateLimitedTransport(inner, rate=0)
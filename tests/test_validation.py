@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the parallel import file validation."""
+
+import csv
+
+from click.testing import CliRunner
+
+from activecampaign_takehome import cli, validation
+
+
+def write_csv(path, rows):
+    with open(path, 'w', newline='') as f:
+        csv.writer(f).writerows(rows)
+
+
+def read_csv(path):
+    with open(path, newline='') as f:
+        return list(csv.reader(f))
+
+
+def test_validate_contact():
+    assert validation.validate_contact({'email': 'a@example.com',
+                                        'list_id': ['1', '12']}) == []
+    assert validation.validate_contact({'email': 'not-an-email',
+                                        'list_id': ['x1', '0']}) == [
+        ('email', 'Not a valid email address.'),
+        ('list_id', "Not a valid list ID: 'x1'."),
+        ('list_id', "Not a valid list ID: '0'."),
+    ]
+    assert validation.validate_contact({'list_id': []}) == [
+        ('email', 'Missing email address.'),
+        ('list_id', 'At least one list ID is required.'),
+    ]
+
+
+def test_validate_import(tmpdir):
+    source = str(tmpdir.join('contacts.csv'))
+    clean = str(tmpdir.join('clean.csv'))
+    errors = str(tmpdir.join('errors.csv'))
+    rows = [['email', 'first_name', 'list_id']]
+    for i in range(1, 101):
+        email = 'user{}@example.com'.format(i)
+        if i % 10 == 0:
+            email = 'user{}-at-example.com'.format(i)
+        rows.append([email, 'User {}'.format(i), '1;2' if i != 55 else 'two'])
+    rows.insert(20, [])
+    rows.append(['short@example.com'])
+    write_csv(source, rows)
+
+    report = validation.validate_import(source, clean, errors, processes=2,
+                                        chunk_size=7)
+    assert report['rows'] == 101
+    assert report['valid'] == 89
+    assert report['invalid'] == 12
+    assert report['errors_by_field'] == {'email': 10, 'list_id': 1, 'row': 1}
+
+    clean_rows = read_csv(clean)
+    assert clean_rows[0] == ['email', 'first_name', 'list_id']
+    assert len(clean_rows) == 90
+    assert clean_rows[1] == ['user1@example.com', 'User 1', '1;2']
+    assert [r[0] for r in clean_rows[1:]] == [
+        'user{}@example.com'.format(i) for i in range(1, 101)
+        if i % 10 and i != 55]
+
+    error_rows = read_csv(errors)
+    assert error_rows[0] == validation.ERROR_FIELDS
+    assert error_rows[1] == ['10', 'email', 'Not a valid email address.',
+                             'user10-at-example.com']
+    assert ['55', 'list_id', "Not a valid list ID: 'two'.",
+            'user55@example.com'] in error_rows
+    assert error_rows[-1] == ['101', 'row', 'Expected 3 values, got 1.', '']
+
+
+def test_validate_import_command(tmpdir):
+    source = str(tmpdir.join('contacts.csv'))
+    clean = str(tmpdir.join('clean.csv'))
+    errors = str(tmpdir.join('errors.csv'))
+    write_csv(source, [['email', 'list_id'], ['a@example.com', '1'],
+                       ['b@example.com', '2']])
+    args = ['validate-import', source, '--clean', clean, '--errors', errors,
+            '-p', '1']
+    result = CliRunner().invoke(cli.main, args)
+    assert result.exit_code == 0, result.output
+    assert '2 rows: 2 valid, 0 invalid' in result.stderr
+    assert len(read_csv(clean)) == 3
+
+    write_csv(source, [['email', 'list_id'], ['a@example', '1']])
+    result = CliRunner().invoke(cli.main, args)
+    assert result.exit_code == 1
+    assert 'email: 1' in result.stderr
+
+    write_csv(source, [['name'], ['a']])
+    result = CliRunner().invoke(cli.main, args)
+    assert result.exit_code == 2
+    assert 'needs a header row with an email column' in result.stderr
@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the SQLite work queue and its workers."""
+
+import threading
+import time
+
+import pytest
+from click.testing import CliRunner
+
+from activecampaign_takehome import activecampaign_takehome as act
+from activecampaign_takehome import cli, workqueue
+from activecampaign_takehome.stubserver import (StubBackend, StubConfig,
+                                                StubServer)
+from activecampaign_takehome.transport import InMemoryTransport, Transport
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def stub_client(backend):
+    return act.Client(StubConfig('http://stub.invalid',
+                                 api_key=backend.api_key),
+                      transport=InMemoryTransport(backend.handle))
+
+
+def test_leases(tmpdir):
+    clock = Clock()
+    queue = workqueue.WorkQueue(str(tmpdir.join('q.db')), lease_seconds=60,
+                                max_attempts=2, clock=clock)
+    job_id = queue.submit('delete', [str(i) for i in range(10)],
+                          params={'resource': 'contacts'}, chunk_size=4)
+    first = queue.claim('a')
+    second = queue.claim('b')
+    assert first.items == ['0', '1', '2', '3']
+    assert first.params == {'resource': 'contacts'}
+    assert first.attempts == 1
+    assert second.items == ['4', '5', '6', '7']
+
+    queue.heartbeat(second, 'b', done=2)
+    assert queue.status(job_id)[0]['items_done'] == 2
+    queue.complete(second, 'b', 4, [])
+
+    # 'a' goes silent: its lease expires and 'c' takes the chunk over.
+    clock.now += 61
+    retried = queue.claim('c')
+    assert (retried.id, retried.attempts) == (first.id, 2)
+    with pytest.raises(workqueue.LeaseLost):
+        queue.complete(first, 'a', 4, [])
+    queue.release(retried, 'c', 'boom')
+
+    third = queue.claim('c')
+    assert third.items == ['8', '9']
+    queue.complete(third, 'c', 1, [['9', 'Not found']])
+    assert queue.claim('c') is None
+
+    status = queue.status(job_id)[0]
+    keys = ('chunks', 'pending', 'leased', 'done', 'failed', 'items',
+            'items_done')
+    assert [status[k] for k in keys] == [3, 0, 0, 2, 1, 10, 5]
+    assert list(queue.failures(job_id)) == [
+        ('chunk {}'.format(first.id), 'boom'), ('9', 'Not found')]
+
+    with pytest.raises(ValueError):
+        queue.submit('export', [])
+    queue.close()
+
+
+def test_workers_share_the_queue(tmpdir):
+    path = str(tmpdir.join('q.db'))
+    csv_path = tmpdir.join('contacts.csv')
+    csv_path.write('email,first_name,list_id\n' + ''.join(
+        'c{}@example.com,C{},1\n'.format(i % 45, i) for i in range(50)))
+    backend = StubBackend(contacts=0, campaigns=1)
+    with workqueue.WorkQueue(path) as queue:
+        import_job = queue.submit('import',
+                                  workqueue.import_items(str(csv_path)),
+                                  chunk_size=10)
+        send = {'campaign_id': '1', 'message_id': '1', 'type': 'mime',
+                'action': 'send'}
+        send_job = queue.submit('send', ['c1@example.com', 'c2@example.com'],
+                                chunk_size=10, params=send)
+        bad_send = queue.submit('send', ['c1@example.com'],
+                                params=dict(send, campaign_id='9'))
+
+    counts = []
+
+    def work(name):
+        with workqueue.WorkQueue(path) as queue, \
+                stub_client(backend) as client:
+            counts.append(workqueue.Worker(queue, client, name=name,
+                                           max_workers=2,
+                                           heartbeat_interval=0.01).run())
+
+    threads = [threading.Thread(target=work, args=('w{}'.format(i),))
+               for i in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(backend.contacts) == 45
+    assert sum(c['chunks'] for c in counts) == 7
+    assert backend.calls['contact_add'] == 45
+    with workqueue.WorkQueue(path) as queue:
+        assert queue.status(import_job)[0]['items_done'] == 45
+        assert queue.status(send_job)[0]['items_done'] == 2
+        assert list(queue.failures(bad_send)) == [('c1@example.com',
+                                                   'Campaign not found')]
+
+
+class SlowTransport(Transport):
+    def __init__(self, backend, delay):
+        self.transport = InMemoryTransport(backend.handle)
+        self.delay = delay
+
+    def request(self, method, url, params=None, data=None, headers=None,
+                timeout=None):
+        time.sleep(self.delay)
+        return self.transport.request(method, url, params, data)
+
+
+def test_lease_renewed_during_slow_calls(tmpdir):
+    path = str(tmpdir.join('q.db'))
+    backend = StubBackend(contacts=2)
+    with workqueue.WorkQueue(path, lease_seconds=0.3) as queue:
+        job_id = queue.submit('delete', ['1'], params={'resource': 'contacts'})
+        client = act.Client(StubConfig('http://stub.invalid',
+                                       api_key=backend.api_key),
+                            transport=SlowTransport(backend, 1.0))
+        worker = workqueue.Worker(queue, client, name='slow',
+                                  heartbeat_interval=0.05)
+        thread = threading.Thread(target=worker.run_once)
+        thread.start()
+        time.sleep(0.6)
+        # The only call is still running, yet the lease is kept.
+        with workqueue.WorkQueue(path, lease_seconds=0.3) as other:
+            assert other.claim('other') is None
+        thread.join()
+        assert (worker.counts['chunks'], worker.counts['lost']) == (1, 0)
+        assert queue.status(job_id)[0]['done'] == 1
+    assert sorted(backend.contacts) == ['2']
+
+
+def test_handler_errors_are_retried(tmpdir):
+    queue = workqueue.WorkQueue(str(tmpdir.join('q.db')), max_attempts=2)
+    job_id = queue.submit('delete', ['1'], params={'resource': 'nope'})
+    backend = StubBackend(contacts=1)
+    with stub_client(backend) as client:
+        counts = workqueue.Worker(queue, client).run()
+    assert counts['errors'] == 2
+    status = queue.status(job_id)[0]
+    assert (status['failed'], status['pending']) == (1, 0)
+    assert 'AttributeError' in list(queue.failures(job_id))[0][1]
+
+
+def test_queue_commands(tmpdir):
+    path = str(tmpdir.join('q.db'))
+    ids = tmpdir.join('ids.txt')
+    ids.write('1\n2\n\n3\n')
+    with StubServer(StubBackend(contacts=5)) as server:
+        env = {'AC_BASE_URL': server.base_url,
+               'AC_API_KEY': server.backend.api_key}
+        runner = CliRunner()
+        result = runner.invoke(cli.main, ['submit-job', 'delete', str(ids),
+                                          '--queue', path], env=env)
+        assert result.exit_code == 2
+        result = runner.invoke(cli.main, ['submit-job', 'delete', str(ids),
+                                          '--queue', path,
+                                          '--resource', 'contacts',
+                                          '--chunk-size', '2'], env=env)
+        assert result.exit_code == 0, result.output
+        assert result.stdout == '1\n'
+        result = runner.invoke(cli.main, ['worker', '--queue', path,
+                                          '--lease', '10', '--timeout', '10'],
+                               env=env)
+        assert result.exit_code == 2
+        result = runner.invoke(cli.main, ['worker', '--queue', path,
+                                          '--name', 'w1'], env=env)
+        assert result.exit_code == 0, result.output
+        assert 'w1: 2 chunks, 3 items done' in result.stderr
+        assert sorted(server.backend.contacts) == ['4', '5']
+
+        result = runner.invoke(cli.main, ['queue-status', '--queue', path],
+                               env=env)
+        lines = result.stdout.split('\n')
+        assert lines[0].split() == cli.TABLE_COLUMNS['jobs']
+        assert lines[2].split() == ['1', 'delete', '2', '0', '0', '0', '2',
+                                    '0', '3', '0']
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the write-behind contact buffer."""
+
+import time
+
+from activecampaign_takehome import activecampaign_takehome as act
+from activecampaign_takehome import writebehind
+from activecampaign_takehome.stubserver import StubBackend, StubServer
+
+
+def contact(n):
+    return {'email': 'signup{}@example.com'.format(n), 'first_name': 'Signup',
+            'list_id': ['1']}
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+def test_flush_on_size_and_age(tmpdir):
+    with StubServer(StubBackend(contacts=0, latency=0.02)) as server:
+        resource = act.ContactsResource(server.config())
+        buffer = writebehind.ContactBuffer(resource,
+                                           str(tmpdir.join('spool.db')),
+                                           batch_size=5, max_age=0.3)
+
+        start = time.perf_counter()
+        for i in range(5):
+            buffer.submit(contact(i))
+        # Submitting does not wait for the API.
+        assert time.perf_counter() - start < 0.1
+        wait_until(lambda: server.backend.calls['contact_add'] == 5)
+
+        buffer.submit(contact(5))
+        time.sleep(0.1)
+        assert server.backend.calls['contact_add'] == 5
+        wait_until(lambda: server.backend.calls['contact_add'] == 6)
+        wait_until(lambda: buffer.metrics()['pending'] == 0)
+
+        metrics = buffer.metrics()
+        assert metrics['created'] == 6
+        assert metrics['reasons'] == {'size': 1, 'age': 1}
+        assert metrics['last_flush']['contacts'] == 1
+        buffer.close()
+
+
+def test_drain(tmpdir):
+    with StubServer(StubBackend(contacts=0)) as server:
+        resource = act.ContactsResource(server.config())
+        with writebehind.ContactBuffer(resource, str(tmpdir.join('spool.db')),
+                                       batch_size=100, max_age=60) as buffer:
+            for i in range(30):
+                buffer.submit(contact(i))
+            buffer.submit({'email': 'not-an-email', 'list_id': ['1']})
+            metrics = buffer.drain(timeout=10)
+            assert metrics['created'] == 30
+            assert metrics['rejected'] == 1
+            assert metrics['pending'] == 0
+            assert metrics['failed'] == 1
+            assert buffer.failures()[0][1]['email'] == 'not-an-email'
+        assert len(server.backend.contacts) == 30
+
+
+def test_spool_survives_restart(tmpdir):
+    spool = str(tmpdir.join('spool.db'))
+    with StubServer(StubBackend(contacts=0)) as server:
+        resource = act.ContactsResource(server.config())
+        buffer = writebehind.ContactBuffer(resource, spool, start=False)
+        for i in range(3):
+            buffer.submit(contact(i))
+        buffer.close(drain=False)
+        assert server.backend.calls['contact_add'] == 0
+
+        buffer = writebehind.ContactBuffer(resource, spool, batch_size=10,
+                                           max_age=0.05)
+        wait_until(lambda: server.backend.calls['contact_add'] == 3)
+        buffer.close()
+        emails = sorted(c['email'] for c in server.backend.contacts.values())
+        assert emails == ['signup0@example.com', 'signup1@example.com',
+                          'signup2@example.com']
+
+
+def test_unreachable_api_is_retried(tmpdir):
+    spool = str(tmpdir.join('spool.db'))
+    server = StubServer(StubBackend(contacts=0)).start()
+    config = server.config()
+    server.stop()
+
+    resource = act.ContactsResource(config, timeout=1)
+    buffer = writebehind.ContactBuffer(resource, spool, batch_size=2,
+                                       max_attempts=2, retry_delay=60,
+                                       start=False)
+    buffer.submit(contact(1))
+    metrics = buffer.drain()
+    assert metrics['retried'] == 1
+    assert metrics['pending'] == 1
+    metrics = buffer.drain()
+    assert metrics['gave_up'] == 1
+    assert metrics['failed'] == 1
+    assert 'ConnectionError' in buffer.failures()[0][2]
+    buffer.close()